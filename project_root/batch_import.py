@@ -0,0 +1,268 @@
+# batch_import.py
+#
+# 无界面批量导入：一批 .docx 题库（目录或清单）在子进程中并行完成
+# 预处理 → 分段 → 解析 → 校验，主进程作为唯一的写库方逐个写入 questions.db，
+# 避免多个进程争抢 SQLite 写锁。返回每个文件的题数、错误与耗时。
+# 试运行（dry_run）时只解析和校验，不写图片、缓存与数据库。
+
+import os
+import json
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import database.db_manager as db
+import preprocess_cache
+from config.requirements import EXPECT_COUNTS
+from pipeline import ImportPipeline, PipelineError, SECTION_NAMES
+
+# 目标级别已有题库时的处理方式
+ON_EXISTING = ("skip", "replace", "incremental")
+
+
+def load_manifest(path):
+    """
+    读取 JSON 清单：[{"file": "a.docx", "job": "工种", "level": "高级工"}, …]，
+    file 为相对路径时相对清单所在目录。返回任务列表 [{'file', 'job', 'level'}, …]。
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    tasks = []
+    for i, entry in enumerate(entries, 1):
+        missing = [k for k in ("file", "job", "level") if not entry.get(k)]
+        if missing:
+            raise ValueError(f"清单第 {i} 项缺少字段：{', '.join(missing)}")
+        tasks.append({
+            "file":  os.path.join(base, entry["file"]),
+            "job":   entry["job"].strip(),
+            "level": entry["level"].strip(),
+        })
+    return tasks
+
+
+def scan_directory(directory, job=None, level=None):
+    """
+    列出目录下的 .docx（跳过 Word 的 ~$ 临时文件），按文件名排序。
+    未指定 job / level 时从文件名“工种_级别.docx”中取（与导出文件名格式一致）。
+    """
+    tasks = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(".docx") or name.startswith("~$"):
+            continue
+        stem = os.path.splitext(name)[0]
+        file_job, _, file_level = stem.rpartition("_")
+        tasks.append({
+            "file":  os.path.join(directory, name),
+            "job":   job or file_job,
+            "level": level or file_level,
+        })
+    return tasks
+
+
+def _parse_file(file_path, level_id, level_name, use_cache, max_errors, dry_run=False):
+    """
+    子进程中执行：预处理、分段、解析、校验，不碰数据库。
+    返回 {'parsed', 'media_catalog', 'elapsed'}，失败时为 {'error', 'report', 'elapsed'}；
+    试运行时不回传解析结果，只返回 {'summary', 'elapsed'}（见 ImportPipeline.run）。
+    """
+    started = time.perf_counter()
+    pipeline = ImportPipeline(
+        file_path, level_id, level_name=level_name, use_cache=use_cache, max_errors=max_errors,
+        dry_run=dry_run
+    )
+    try:
+        if dry_run:
+            return {"summary": pipeline.run(), "elapsed": time.perf_counter() - started}
+        pre = pipeline.preprocess()
+        sections = pipeline.segment(pre)
+        parsed = pipeline.parse(sections, pre['media_catalog'])
+        pipeline.validate(parsed)
+    except PipelineError as e:
+        return {"error": str(e), "report": pipeline.artifacts.get('validate'),
+                "elapsed": time.perf_counter() - started}
+    return {"parsed": parsed, "media_catalog": pre['media_catalog'],
+            "elapsed": time.perf_counter() - started}
+
+
+def _entry(task):
+    return {
+        "file":       task["file"],
+        "job":        task["job"],
+        "level":      task["level"],
+        "level_id":   None,
+        "status":     "pending",   # imported / checked（试运行）/ skipped / failed
+        "counts":     {},
+        "errors":     {},
+        "validation": [],
+        "timings":    {},
+        "error":      None,
+    }
+
+
+def import_batch(tasks, workers=None, on_existing="skip", use_cache=True, max_errors=None,
+                 progress=None, dry_run=False):
+    """
+    批量导入。tasks：[{'file', 'job', 'level'}, …]（见 load_manifest / scan_directory）。
+    workers：解析进程数，默认 CPU 核数
+    on_existing：目标级别已有题库时 skip（跳过该文件）/ replace（删除旧题库后导入）/
+                 incremental（增量同步；同一级别对应多个文件时后一次同步会删掉前一个文件的题目，
+                 这些文件一律判为失败，不导入）；
+                 skip 模式下级别里是同一文件中断的导入时不跳过，从断点续传（见 ImportPipeline）
+    max_errors：单个文件解析阶段的错误上限，达到即放弃该文件（不写库）
+    progress：每处理完一个文件回调 progress(完成数, 总数, 条目)
+    dry_run：试运行，只解析并按级别校验每个文件，不写图片、缓存与数据库（不建工种 / 级别，
+             不检查已有题库，on_existing 不生效），成功的文件状态为 checked
+    返回汇总：
+      {'files': [{'file', 'job', 'level', 'level_id', 'status', 'counts', 'errors',
+                  'validation', 'timings', 'error'(, 'sync')(, 'resumed')}, …],
+       'imported', 'checked', 'skipped', 'failed', 'questions', 'elapsed'(, 'dry_run')}
+    questions 为写入的题数，试运行时为解析出的题数。
+    同一级别对应多个文件时（replace / skip 模式）依次追加写入，旧题库只在第一次写入前删除。
+    """
+    if on_existing not in ON_EXISTING:
+        raise ValueError(f"on_existing 须为 {' / '.join(ON_EXISTING)}")
+    started = time.perf_counter()
+    if not dry_run:
+        db.init_db()
+
+    entries = [_entry(task) for task in tasks]
+    done = 0
+
+    def finish(entry):
+        nonlocal done
+        done += 1
+        logging.info(f"[batch] {done}/{len(entries)} {entry['file']}: {entry['status']}")
+        if progress:
+            progress(done, len(entries), entry)
+
+    # 1. 主进程解析工种 / 级别 id，并按 on_existing 决定哪些文件需要导入
+    pending = []
+    existing = {}
+    per_level = Counter((e["job"], e["level"]) for e in entries)
+    for entry in entries:
+        if not os.path.exists(entry["file"]):
+            entry.update(status="failed", error=f"文件不存在: {entry['file']}")
+            finish(entry)
+            continue
+        if not entry["job"] or entry["level"] not in EXPECT_COUNTS:
+            entry.update(status="failed", error=f"无法确定工种 / 级别：{entry['job']!r} {entry['level']!r}")
+            finish(entry)
+            continue
+        if dry_run:
+            pending.append(entry)
+            continue
+        if on_existing == "incremental" and per_level[entry["job"], entry["level"]] > 1:
+            entry.update(status="failed", error=(
+                f"增量模式下同一级别只能对应一个文件，{entry['job']} {entry['level']} "
+                f"在本批中有 {per_level[entry['job'], entry['level']]} 个文件"
+            ))
+            finish(entry)
+            continue
+        level_id = db.get_level_id(db.get_job_id(entry["job"]), entry["level"])
+        entry["level_id"] = level_id
+        if level_id not in existing:
+            existing[level_id] = db.has_questions(level_id)
+        if existing[level_id] and on_existing == "skip" and not _resumable(entry):
+            entry.update(status="skipped", error="级别已有题库")
+            finish(entry)
+            continue
+        pending.append(entry)
+
+    # 2. 子进程并行解析，完成一个写一个（主进程是唯一的写库方）
+    cleared = set()
+    interrupted = False
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {
+                pool.submit(_parse_file, e["file"], e["level_id"], e["level"], use_cache, max_errors,
+                            dry_run): e
+                for e in pending
+            }
+            for fut in as_completed(futures):
+                entry = futures[fut]
+                try:
+                    out = fut.result()
+                except Exception as e:
+                    out = {"error": f"解析失败：{e}", "report": None, "elapsed": 0.0}
+                entry["timings"]["parse"] = round(out["elapsed"], 3)
+                if out.get("error"):
+                    report = out.get("report") or {}
+                    entry.update(status="failed", error=out["error"],
+                                 validation=report.get("stream_errors") or report.get("messages") or [])
+                elif dry_run:
+                    entry["timings"]["total"] = entry["timings"]["parse"]
+                    _fill(entry, out["summary"], "checked")
+                else:
+                    interrupted |= _write(entry, out, on_existing, existing, cleared)
+                finish(entry)
+
+    # 3. 续传 / 丢弃过中断的导入时回收无引用的图片；放在全部写完之后，
+    #    解析进程预处理出的图片此时都已入库，不会被误删
+    if interrupted:
+        db.collect_orphan_images()
+
+    summary = {
+        "files":     entries,
+        "imported":  sum(e["status"] == "imported" for e in entries),
+        "checked":   sum(e["status"] == "checked" for e in entries),
+        "skipped":   sum(e["status"] == "skipped" for e in entries),
+        "failed":    sum(e["status"] == "failed" for e in entries),
+        "questions": sum(sum(e["counts"].values()) for e in entries
+                         if e["status"] in ("imported", "checked")),
+        "elapsed":   round(time.perf_counter() - started, 3),
+    }
+    if dry_run:
+        summary["dry_run"] = True
+    return summary
+
+
+def _resumable(entry):
+    """级别的导入日志停在写库阶段，且源文件与本条目相同（可以续传）。"""
+    journal = db.get_import_journal(entry["level_id"])
+    return (journal is not None and journal["stage"] != "done"
+            and journal["file_digest"] == preprocess_cache.file_digest(entry["file"]))
+
+
+def _write(entry, out, on_existing, existing, cleared):
+    """
+    在主进程中把一个文件的解析结果写库，结果记入 entry。
+    返回写库前是否遇到了未完成的导入（需要回收图片）。
+    """
+    level_id = entry["level_id"]
+    started = time.perf_counter()
+    pipeline = ImportPipeline(
+        entry["file"], level_id, level_name=entry["level"],
+        incremental=on_existing == "incremental" and existing[level_id],
+        gc_media=False
+    )
+    try:
+        if on_existing == "replace" and existing[level_id] and level_id not in cleared:
+            db.delete_questions_by_level(level_id)
+            cleared.add(level_id)
+        summary = pipeline.commit(out["parsed"], out["media_catalog"])
+    except Exception as e:
+        logging.exception(f"[batch] 写库失败：{entry['file']}")
+        entry.update(status="failed", error=f"写库失败：{e}")
+        return pipeline.interrupted
+    finally:
+        entry["timings"]["write"] = round(time.perf_counter() - started, 3)
+        entry["timings"]["total"] = round(entry["timings"]["parse"] + entry["timings"]["write"], 3)
+
+    _fill(entry, summary, "imported")
+    if pipeline.resumed:
+        entry["resumed"] = pipeline.resumed
+    return pipeline.interrupted
+
+
+def _fill(entry, summary, status):
+    """把 ImportPipeline 的汇总（题数、解析错误、校验问题）记入 entry。"""
+    entry.update(
+        status=status,
+        counts={key: summary[key]["count"] for key in SECTION_NAMES},
+        errors={key: summary[key]["errors"] for key in SECTION_NAMES if summary[key]["errors"]},
+        validation=summary["validation"],
+    )
+    if "sync" in summary:
+        entry["sync"] = summary["sync"]
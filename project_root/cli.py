@@ -0,0 +1,165 @@
+# cli.py
+#
+# 命令行入口：
+#   python cli.py lint 试卷1.docx 试卷2.docx [--json]
+#     预检题库源文档的标签与格式（不写媒体库、不碰数据库），发现问题时退出码为 1。
+#   python cli.py import 目录或清单.json [--job 工种 --level 级别] [--workers N]
+#                        [--on-existing skip|replace|incremental] [--dry-run]
+#                        [--summary 汇总.json] [--json]
+#     无界面批量导入：多进程并行解析，主进程单独写库；有文件失败时退出码为 1。
+#     --dry-run 只解析并校验，不写图片、缓存与数据库。
+#     中断的导入（见 db.import_journal）重新导入同一文件时从断点续传。
+#   python cli.py gc-media [--grace 秒]
+#     回收媒体库中没有任何题目引用的图片文件（中断的导入留下的等）。
+
+import os
+import sys
+import json
+import logging
+import argparse
+import contextlib
+
+from validator.tag_linter import lint_document
+
+
+def cmd_lint(args):
+    reports = []
+    for path in args.files:
+        try:
+            reports.append(lint_document(path))
+        except Exception as e:
+            reports.append({"file": path, "paragraphs": 0, "blocks": 0,
+                            "issues": [], "elapsed": 0.0, "error": str(e)})
+
+    if args.json:
+        json.dump(reports, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        for rep in reports:
+            if rep.get("error"):
+                print(f"❌ {rep['file']}: 无法读取（{rep['error']}）")
+                continue
+            mark = "✅" if not rep["issues"] else "❌"
+            print(f"{mark} {rep['file']}: {rep['paragraphs']} 段，{rep['blocks']} 题，"
+                  f"{len(rep['issues'])} 处问题（{rep['elapsed']:.2f}s）")
+            for issue in rep["issues"]:
+                print(f"    {issue['message']}")
+
+    failed = any(rep["issues"] or rep.get("error") for rep in reports)
+    return 1 if failed else 0
+
+
+def cmd_import(args):
+    from batch_import import load_manifest, scan_directory, import_batch
+
+    os.makedirs("logs", exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join("logs", "batch_import.log"),
+        filemode="a",
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        encoding="utf-8"
+    )
+
+    if os.path.isdir(args.source):
+        tasks = scan_directory(args.source, job=args.job, level=args.level)
+    else:
+        tasks = load_manifest(args.source)
+    if not tasks:
+        print(f"❌ 未找到待导入的 .docx：{args.source}", file=sys.stderr)
+        return 1
+
+    def progress(done, total, entry):
+        if args.json:
+            return
+        if entry["status"] in ("imported", "checked"):
+            n = sum(entry["counts"].values())
+            if entry["status"] == "checked":
+                timing = f"解析 {entry['timings']['parse']:.2f}s，未写库"
+            else:
+                timing = f"解析 {entry['timings']['parse']:.2f}s，写库 {entry['timings']['write']:.2f}s"
+            if entry.get("resumed"):
+                timing += f"，续传：跳过上次已写入的 {entry['resumed']} 题"
+            print(f"✅ [{done}/{total}] {entry['file']} → {entry['job']} {entry['level']}：{n} 题（{timing}）")
+            # 试运行用于导入前检查，逐条列出解析错误
+            if entry["status"] == "checked":
+                for errors in entry["errors"].values():
+                    for err in errors:
+                        print(f"    ❌ {err}")
+            for msg in entry["validation"]:
+                print(f"    ⚠️ {msg}")
+        else:
+            mark = "⏭️" if entry["status"] == "skipped" else "❌"
+            print(f"{mark} [{done}/{total}] {entry['file']}：{entry['error']}")
+
+    # --json 时标准输出只留汇总，初始化数据库等提示转到标准错误
+    with contextlib.redirect_stdout(sys.stderr if args.json else sys.stdout):
+        summary = import_batch(
+            tasks, workers=args.workers, on_existing=args.on_existing,
+            use_cache=not args.no_cache, max_errors=args.max_errors, progress=progress,
+            dry_run=args.dry_run
+        )
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    if args.json:
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.dry_run:
+        print(f"试运行 {len(summary['files'])} 个文件：解析成功 {summary['checked']}，"
+              f"失败 {summary['failed']}；共 {summary['questions']} 题，未写入数据库，"
+              f"用时 {summary['elapsed']:.2f}s")
+    else:
+        print(f"共 {len(summary['files'])} 个文件：导入 {summary['imported']}，跳过 {summary['skipped']}，"
+              f"失败 {summary['failed']}；写入 {summary['questions']} 题，用时 {summary['elapsed']:.2f}s")
+    return 1 if summary["failed"] else 0
+
+
+def cmd_gc_media(args):
+    import database.db_manager as db
+
+    db.init_db()
+    grace = db.ORPHAN_GRACE_SECONDS if args.grace is None else args.grace
+    removed = db.collect_orphan_images(grace=grace)
+    print(f"已回收 {removed} 个无引用的图片文件")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="题库管理命令行工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_lint = sub.add_parser("lint", help="预检源文档的标签配对、题头与答案格式")
+    p_lint.add_argument("files", nargs="+", help="待检查的 .docx 文件")
+    p_lint.add_argument("--json", action="store_true", help="以 JSON 输出检查结果")
+    p_lint.set_defaults(func=cmd_lint)
+
+    p_imp = sub.add_parser("import", help="批量导入目录或清单中的题库文档")
+    p_imp.add_argument("source", help="含 .docx 的目录，或 JSON 清单 [{\"file\", \"job\", \"level\"}, …]")
+    p_imp.add_argument("--job", help="目录模式下统一使用的工种（默认取文件名“工种_级别.docx”）")
+    p_imp.add_argument("--level", help="目录模式下统一使用的级别")
+    p_imp.add_argument("--workers", type=int, default=None, help="解析进程数（默认 CPU 核数）")
+    p_imp.add_argument("--on-existing", choices=["skip", "replace", "incremental"], default="skip",
+                       help="级别已有题库时：跳过 / 删除重建 / 增量更新（默认跳过）")
+    p_imp.add_argument("--max-errors", type=int, default=None, help="单个文件的解析错误上限，达到即放弃该文件")
+    p_imp.add_argument("--no-cache", action="store_true", help="不读写预处理缓存")
+    p_imp.add_argument("--dry-run", action="store_true", help="试运行：只解析并校验，不写图片、缓存与数据库")
+    p_imp.add_argument("--summary", help="把 JSON 汇总写入该文件")
+    p_imp.add_argument("--json", action="store_true", help="以 JSON 输出汇总")
+    p_imp.set_defaults(func=cmd_import)
+
+    p_gc = sub.add_parser("gc-media", help="回收没有任何题目引用的图片文件")
+    p_gc.add_argument("--grace", type=int, default=None,
+                      help="只回收闲置超过该秒数的文件（默认 600，避免误删正在导入的图片）")
+    p_gc.set_defaults(func=cmd_gc_media)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,99 @@
 import sqlite3
 import os
+import re
+import json
+import hashlib
+import itertools
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from media_store import remove_images, list_images
+from database.records import record_factory, record_type
 
 # 数据库文件路径
 DB_PATH = "questions.db"
 
-def init_db():
+# ---------------- 连接管理 ----------------
+# 每个线程持有一条长连接（sqlite3 连接不能跨线程共享）：
+# GUI 主线程、ParseWorker / ExportWorker 所在的 QThread 各自独立，
+# pragma 只在建连时设置一次，语句缓存随连接复用。
+_local = threading.local()
+STATEMENT_CACHE_SIZE = 256
+
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, timeout=30, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.execute("PRAGMA journal_mode = WAL")    # 读写互不阻塞，便于后台线程写库时 GUI 查询
+    conn.execute("PRAGMA synchronous = NORMAL")  # WAL 下足够安全，显著减少 fsync
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA busy_timeout = 30000")
+    return conn
+
+
+def get_connection():
+    """
+    返回当前线程的长连接，首次调用（或 DB_PATH 变化）时创建。
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = _open_connection(DB_PATH)
+        _local.conn = conn
+        _local.path = DB_PATH
+    return conn
+
+
+def close_connection():
+    """
+    关闭当前线程的连接；后台线程结束前调用，避免连接随线程泄漏。
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction():
     """
-    初始化数据库并创建必要的表。
+    显式事务：with transaction() as conn: …
+    正常退出提交，异常时回滚并继续抛出。以 BEGIN IMMEDIATE 开始，写锁在事务开头取得；
+    若当前线程已处于事务中，则并入外层事务，由外层负责提交 / 回滚。
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.executescript("""
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+# SQLite 单条语句的绑定参数上限（旧版本默认 999），IN 列表按此分块
+MAX_SQL_VARIABLES = 900
+
+
+def chunked(values, size=MAX_SQL_VARIABLES):
+    """
+    把序列切成不超过 size 个元素的列表依次产出，用于拼接 IN (?, ?, …)。
+    """
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# ---------------- 数据库结构迁移 ----------------
+# 有序迁移列表：(版本号, 说明, SQL)。版本号记在 PRAGMA user_version 中，
+# init_db() 启动时按顺序执行所有高于当前版本的迁移，旧的 questions.db 原地升级。
+# 已发布的迁移不要再修改，结构变化一律追加新版本。
+MIGRATIONS = [
+    (1, "基础表", """
     CREATE TABLE IF NOT EXISTS jobs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL UNIQUE
@@ -54,10 +137,269 @@ def init_db():
         content TEXT,
         FOREIGN KEY (question_id) REFERENCES questions(id)
     );
-    """)
-    conn.commit()
-    conn.close()
-    print("✅ 本地 SQLite 数据库已初始化并建表（如尚未存在）")
+    """),
+    (2, "常用查询索引", """
+    -- 按级别取题 / 计数 / 删除；(level_id) 上的索引自带 rowid 顺序，可直接按 id 分页
+    CREATE INDEX IF NOT EXISTS idx_questions_level
+        ON questions(level_id);
+    -- 按级别 + 题型 + 认定点统计与校验（覆盖索引，无需回表）
+    CREATE INDEX IF NOT EXISTS idx_questions_level_type_code
+        ON questions(level_id, question_type, recognition_code);
+    -- 按认定点抽题
+    CREATE INDEX IF NOT EXISTS idx_questions_code
+        ON questions(recognition_code, question_type);
+    -- 媒体按题目聚合；图片路径上的索引用于引用计数
+    CREATE INDEX IF NOT EXISTS idx_question_images_question
+        ON question_images(question_id, image_path);
+    CREATE INDEX IF NOT EXISTS idx_question_images_path
+        ON question_images(image_path);
+    CREATE INDEX IF NOT EXISTS idx_question_formulas_question
+        ON question_formulas(question_id);
+    CREATE INDEX IF NOT EXISTS idx_job_levels_job
+        ON job_levels(job_id, level_name);
+    """),
+    (3, "题目全文检索（FTS5）", """
+    -- trigram 分词支持中文任意子串检索；rowid 即 questions.id
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        recognition_code,
+        content_text,
+        options,
+        answer_explanation,
+        scoring_criteria,
+        tokenize = 'trigram'
+    );
+    INSERT INTO questions_fts(rowid, recognition_code, content_text, options,
+                              answer_explanation, scoring_criteria)
+        SELECT id, recognition_code, content_text,
+               coalesce(option_a, '') || ' ' || coalesce(option_b, '') || ' ' ||
+               coalesce(option_c, '') || ' ' || coalesce(option_d, ''),
+               answer_explanation, scoring_criteria
+        FROM questions;
+
+    -- 触发器保持与 questions 同步
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts(rowid, recognition_code, content_text, options,
+                                  answer_explanation, scoring_criteria)
+        VALUES (new.id, new.recognition_code, new.content_text,
+                coalesce(new.option_a, '') || ' ' || coalesce(new.option_b, '') || ' ' ||
+                coalesce(new.option_c, '') || ' ' || coalesce(new.option_d, ''),
+                new.answer_explanation, new.scoring_criteria);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_delete AFTER DELETE ON questions BEGIN
+        DELETE FROM questions_fts WHERE rowid = old.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_update AFTER UPDATE ON questions BEGIN
+        DELETE FROM questions_fts WHERE rowid = old.id;
+        INSERT INTO questions_fts(rowid, recognition_code, content_text, options,
+                                  answer_explanation, scoring_criteria)
+        VALUES (new.id, new.recognition_code, new.content_text,
+                coalesce(new.option_a, '') || ' ' || coalesce(new.option_b, '') || ' ' ||
+                coalesce(new.option_c, '') || ' ' || coalesce(new.option_d, ''),
+                new.answer_explanation, new.scoring_criteria);
+    END;
+    """),
+    (4, "级别统计表（触发器维护）", """
+    -- 每个 (级别, 题型, 认定点) 一行：题数与判断题 √ / × 数；
+    -- 汇总、计数、题量校验直接读这里，不再扫描 questions
+    CREATE TABLE IF NOT EXISTS level_stats (
+        level_id INTEGER NOT NULL,
+        question_type TEXT NOT NULL,
+        recognition_code TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        true_count INTEGER NOT NULL DEFAULT 0,
+        false_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (level_id, question_type, recognition_code)
+    ) WITHOUT ROWID;
+    DELETE FROM level_stats;
+    INSERT INTO level_stats (level_id, question_type, recognition_code,
+                             total, true_count, false_count)
+        SELECT level_id, coalesce(question_type, ''), coalesce(recognition_code, ''), COUNT(*),
+               SUM(question_type = '判断' AND answer = '√'),
+               SUM(question_type = '判断' AND answer = '×')
+        FROM questions
+        GROUP BY 1, 2, 3;
+
+    CREATE TRIGGER IF NOT EXISTS trg_level_stats_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO level_stats (level_id, question_type, recognition_code,
+                                 total, true_count, false_count)
+        VALUES (new.level_id, coalesce(new.question_type, ''), coalesce(new.recognition_code, ''), 1,
+                CASE WHEN new.question_type = '判断' AND new.answer = '√' THEN 1 ELSE 0 END,
+                CASE WHEN new.question_type = '判断' AND new.answer = '×' THEN 1 ELSE 0 END)
+        ON CONFLICT (level_id, question_type, recognition_code) DO UPDATE SET
+            total       = total + 1,
+            true_count  = true_count + excluded.true_count,
+            false_count = false_count + excluded.false_count;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_level_stats_delete AFTER DELETE ON questions BEGIN
+        UPDATE level_stats SET
+            total       = total - 1,
+            true_count  = true_count
+                        - (CASE WHEN old.question_type = '判断' AND old.answer = '√' THEN 1 ELSE 0 END),
+            false_count = false_count
+                        - (CASE WHEN old.question_type = '判断' AND old.answer = '×' THEN 1 ELSE 0 END)
+        WHERE level_id = old.level_id
+          AND question_type = coalesce(old.question_type, '')
+          AND recognition_code = coalesce(old.recognition_code, '');
+        DELETE FROM level_stats
+        WHERE level_id = old.level_id
+          AND question_type = coalesce(old.question_type, '')
+          AND recognition_code = coalesce(old.recognition_code, '')
+          AND total <= 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_level_stats_update
+    AFTER UPDATE OF level_id, question_type, recognition_code, answer ON questions BEGIN
+        UPDATE level_stats SET
+            total       = total - 1,
+            true_count  = true_count
+                        - (CASE WHEN old.question_type = '判断' AND old.answer = '√' THEN 1 ELSE 0 END),
+            false_count = false_count
+                        - (CASE WHEN old.question_type = '判断' AND old.answer = '×' THEN 1 ELSE 0 END)
+        WHERE level_id = old.level_id
+          AND question_type = coalesce(old.question_type, '')
+          AND recognition_code = coalesce(old.recognition_code, '');
+        DELETE FROM level_stats
+        WHERE level_id = old.level_id
+          AND question_type = coalesce(old.question_type, '')
+          AND recognition_code = coalesce(old.recognition_code, '')
+          AND total <= 0;
+        INSERT INTO level_stats (level_id, question_type, recognition_code,
+                                 total, true_count, false_count)
+        VALUES (new.level_id, coalesce(new.question_type, ''), coalesce(new.recognition_code, ''), 1,
+                CASE WHEN new.question_type = '判断' AND new.answer = '√' THEN 1 ELSE 0 END,
+                CASE WHEN new.question_type = '判断' AND new.answer = '×' THEN 1 ELSE 0 END)
+        ON CONFLICT (level_id, question_type, recognition_code) DO UPDATE SET
+            total       = total + 1,
+            true_count  = true_count + excluded.true_count,
+            false_count = false_count + excluded.false_count;
+    END;
+    """),
+    (5, "级别统计：缺少解析的 × 判断题数", """
+    -- 题量校验需要的最后一项统计，整级校验只读 level_stats
+    ALTER TABLE level_stats ADD COLUMN false_unexplained INTEGER NOT NULL DEFAULT 0;
+    UPDATE level_stats SET false_unexplained = (
+        SELECT COUNT(*) FROM questions q
+        WHERE q.level_id = level_stats.level_id
+          AND coalesce(q.question_type, '') = level_stats.question_type
+          AND coalesce(q.recognition_code, '') = level_stats.recognition_code
+          AND q.question_type = '判断' AND q.answer = '×'
+          AND coalesce(q.answer_explanation, '') = ''
+    );
+
+    DROP TRIGGER IF EXISTS trg_level_stats_insert;
+    DROP TRIGGER IF EXISTS trg_level_stats_delete;
+    DROP TRIGGER IF EXISTS trg_level_stats_update;
+    CREATE TRIGGER trg_level_stats_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO level_stats (level_id, question_type, recognition_code,
+                                 total, true_count, false_count, false_unexplained)
+        VALUES (new.level_id, coalesce(new.question_type, ''), coalesce(new.recognition_code, ''), 1,
+                CASE WHEN new.question_type = '判断' AND new.answer = '√' THEN 1 ELSE 0 END,
+                CASE WHEN new.question_type = '判断' AND new.answer = '×' THEN 1 ELSE 0 END,
+                CASE WHEN new.question_type = '判断' AND new.answer = '×'
+                          AND coalesce(new.answer_explanation, '') = '' THEN 1 ELSE 0 END)
+        ON CONFLICT (level_id, question_type, recognition_code) DO UPDATE SET
+            total             = total + 1,
+            true_count        = true_count + excluded.true_count,
+            false_count       = false_count + excluded.false_count,
+            false_unexplained = false_unexplained + excluded.false_unexplained;
+    END;
+    CREATE TRIGGER trg_level_stats_delete AFTER DELETE ON questions BEGIN
+        UPDATE level_stats SET
+            total             = total - 1,
+            true_count        = true_count
+                              - (CASE WHEN old.question_type = '判断' AND old.answer = '√' THEN 1 ELSE 0 END),
+            false_count       = false_count
+                              - (CASE WHEN old.question_type = '判断' AND old.answer = '×' THEN 1 ELSE 0 END),
+            false_unexplained = false_unexplained
+                              - (CASE WHEN old.question_type = '判断' AND old.answer = '×'
+                                      AND coalesce(old.answer_explanation, '') = '' THEN 1 ELSE 0 END)
+        WHERE level_id = old.level_id
+          AND question_type = coalesce(old.question_type, '')
+          AND recognition_code = coalesce(old.recognition_code, '');
+        DELETE FROM level_stats
+        WHERE level_id = old.level_id
+          AND question_type = coalesce(old.question_type, '')
+          AND recognition_code = coalesce(old.recognition_code, '')
+          AND total <= 0;
+    END;
+    CREATE TRIGGER trg_level_stats_update
+    AFTER UPDATE OF level_id, question_type, recognition_code, answer, answer_explanation
+    ON questions BEGIN
+        UPDATE level_stats SET
+            total             = total - 1,
+            true_count        = true_count
+                              - (CASE WHEN old.question_type = '判断' AND old.answer = '√' THEN 1 ELSE 0 END),
+            false_count       = false_count
+                              - (CASE WHEN old.question_type = '判断' AND old.answer = '×' THEN 1 ELSE 0 END),
+            false_unexplained = false_unexplained
+                              - (CASE WHEN old.question_type = '判断' AND old.answer = '×'
+                                      AND coalesce(old.answer_explanation, '') = '' THEN 1 ELSE 0 END)
+        WHERE level_id = old.level_id
+          AND question_type = coalesce(old.question_type, '')
+          AND recognition_code = coalesce(old.recognition_code, '');
+        DELETE FROM level_stats
+        WHERE level_id = old.level_id
+          AND question_type = coalesce(old.question_type, '')
+          AND recognition_code = coalesce(old.recognition_code, '')
+          AND total <= 0;
+        INSERT INTO level_stats (level_id, question_type, recognition_code,
+                                 total, true_count, false_count, false_unexplained)
+        VALUES (new.level_id, coalesce(new.question_type, ''), coalesce(new.recognition_code, ''), 1,
+                CASE WHEN new.question_type = '判断' AND new.answer = '√' THEN 1 ELSE 0 END,
+                CASE WHEN new.question_type = '判断' AND new.answer = '×' THEN 1 ELSE 0 END,
+                CASE WHEN new.question_type = '判断' AND new.answer = '×'
+                          AND coalesce(new.answer_explanation, '') = '' THEN 1 ELSE 0 END)
+        ON CONFLICT (level_id, question_type, recognition_code) DO UPDATE SET
+            total             = total + 1,
+            true_count        = true_count + excluded.true_count,
+            false_count       = false_count + excluded.false_count,
+            false_unexplained = false_unexplained + excluded.false_unexplained;
+    END;
+    """),
+    (6, "导入日志（断点续传）", """
+    CREATE TABLE IF NOT EXISTS import_journal (
+        level_id     INTEGER PRIMARY KEY,
+        file_digest  TEXT NOT NULL,
+        file_path    TEXT,
+        write_order  TEXT NOT NULL,             -- section（按题型）/ document（按文档顺序）
+        stage        TEXT NOT NULL,             -- persist（写库中）/ done
+        committed    INTEGER NOT NULL DEFAULT 0,
+        first_id     INTEGER,
+        last_id      INTEGER,
+        started_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(level_id) REFERENCES job_levels(id)
+    );
+    """),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version():
+    return get_connection().execute("PRAGMA user_version").fetchone()[0]
+
+
+def init_db():
+    """
+    初始化数据库：按版本顺序执行尚未应用的迁移（建表、建索引等）。
+    每个迁移与版本号更新在同一事务中完成，失败则回滚、保持原版本。
+    """
+    conn = get_connection()
+    current = get_schema_version()
+    for version, desc, sql in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            conn.executescript(
+                f"BEGIN IMMEDIATE;\n{sql}\nPRAGMA user_version = {version};\nCOMMIT;"
+            )
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            logging.exception(f"[db] 迁移 v{version}（{desc}）失败")
+            raise
+        logging.info(f"[db] 已应用迁移 v{version}：{desc}")
+        current = version
+    print(f"✅ 本地 SQLite 数据库已就绪（结构版本 v{current}）")
 
 def insert_question(
     level_id,
@@ -79,144 +421,708 @@ def insert_question(
     """
     将一条题目插入 questions 表中，返回新插入的 question_id。
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO questions (
-            level_id,
-            recognition_code,
-            level_code,
-            question_type_code,
-            difficulty_coefficient,
-            question_type,
-            content_text,
-            option_a,
-            option_b,
-            option_c,
-            option_d,
-            answer,
-            has_formula,
-            answer_explanation,
-            scoring_criteria
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        level_id, recognition_code, level_code, question_type_code,
-        difficulty_coefficient, question_type, content_text,
-        option_a, option_b, option_c, option_d,
-        answer, has_formula, answer_explanation, scoring_criteria
-    ))
-    conn.commit()
-    qid = cursor.lastrowid
-    conn.close()
-    return qid
+    with transaction() as conn:
+        cursor = conn.execute("""
+            INSERT INTO questions (
+                level_id,
+                recognition_code,
+                level_code,
+                question_type_code,
+                difficulty_coefficient,
+                question_type,
+                content_text,
+                option_a,
+                option_b,
+                option_c,
+                option_d,
+                answer,
+                has_formula,
+                answer_explanation,
+                scoring_criteria
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            level_id, recognition_code, level_code, question_type_code,
+            difficulty_coefficient, question_type, content_text,
+            option_a, option_b, option_c, option_d,
+            answer, has_formula, answer_explanation, scoring_criteria
+        ))
+        return cursor.lastrowid
 
 def insert_question_image(question_id: int, image_path: str) -> None:
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO question_images(question_id, image_path) VALUES (?, ?)",
-        (question_id, image_path)
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO question_images(question_id, image_path) VALUES (?, ?)",
+            (question_id, image_path)
+        )
 
 def insert_question_formula(question_id: int, formula_type: str, content: str) -> None:
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO question_formulas(question_id, formula_type, content) VALUES (?, ?, ?)",
-        (question_id, formula_type, content)
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO question_formulas(question_id, formula_type, content) VALUES (?, ?, ?)",
+            (question_id, formula_type, content)
+        )
 
 def get_job_id(job_name):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM jobs WHERE name = ?", (job_name,))
-    row = cursor.fetchone()
+    conn = get_connection()
+    row = conn.execute("SELECT id FROM jobs WHERE name = ?", (job_name,)).fetchone()
     if row:
-        job_id = row[0]
-    else:
-        cursor.execute("INSERT INTO jobs (name) VALUES (?)", (job_name,))
-        job_id = cursor.lastrowid
-        conn.commit()
-    conn.close()
-    return job_id
+        return row[0]
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO jobs (name) VALUES (?)", (job_name,))
+        return conn.execute("SELECT id FROM jobs WHERE name = ?", (job_name,)).fetchone()[0]
 
 def get_level_id(job_id, level_name):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id FROM job_levels WHERE job_id = ? AND level_name = ?",
-        (job_id, level_name)
-    )
-    row = cursor.fetchone()
+    conn = get_connection()
+    sql = "SELECT id FROM job_levels WHERE job_id = ? AND level_name = ?"
+    row = conn.execute(sql, (job_id, level_name)).fetchone()
     if row:
-        level_id = row[0]
-    else:
-        cursor.execute(
+        return row[0]
+    with transaction() as conn:
+        # 事务内再查一次，避免两个线程同时创建同一级别
+        row = conn.execute(sql, (job_id, level_name)).fetchone()
+        if row:
+            return row[0]
+        cursor = conn.execute(
             "INSERT INTO job_levels (job_id, level_name) VALUES (?, ?)",
             (job_id, level_name)
         )
-        level_id = cursor.lastrowid
-        conn.commit()
-    conn.close()
-    return level_id
+        return cursor.lastrowid
 
 def has_questions(level_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(1) FROM questions WHERE level_id = ?", (level_id,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count > 0
+    row = get_connection().execute(
+        "SELECT 1 FROM level_stats WHERE level_id = ? LIMIT 1", (level_id,)
+    ).fetchone()
+    return row is not None
 
 def count_questions(level_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(1) FROM questions WHERE level_id = ?", (level_id,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    # 读 level_stats（按认定点汇总的行数远少于题数），不扫描 questions
+    return get_connection().execute(
+        "SELECT coalesce(SUM(total), 0) FROM level_stats WHERE level_id = ?", (level_id,)
+    ).fetchone()[0]
 
-def delete_questions_by_level(level_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def fetch_level_stats(level_id, types=None):
+    """
+    读取级别统计：返回 QuestionRecord 列表，字段
+    question_type, recognition_code, total, true_count, false_count（判断题 √ / × 数），
+    false_unexplained（缺少解析的 × 判断题数），按题型、认定点排序。types 可限定题型列表。
+    """
+    where, params = _level_clause(level_id, types)
+    cursor = get_connection().cursor()
+    cursor.row_factory = record_factory
+    return cursor.execute(f"""
+        SELECT question_type, recognition_code, total, true_count, false_count, false_unexplained
+        FROM level_stats
+        WHERE {where}
+        ORDER BY question_type, recognition_code
+    """, params).fetchall()
+
+def _delete_questions(cursor, where, params):
+    """
+    在当前事务中删除满足 where 的题目及其图片、公式记录，
+    返回删除后不再被任何题目引用的图片路径（由调用方在提交后删除文件）。
+    """
+    subquery = f"SELECT id FROM questions WHERE {where}"
     cursor.execute(
-        "SELECT image_path FROM question_images WHERE question_id IN "
-        "(SELECT id FROM questions WHERE level_id = ?)",
-        (level_id,)
+        f"SELECT DISTINCT image_path FROM question_images WHERE question_id IN ({subquery})", params
     )
     img_paths = [row[0] for row in cursor.fetchall()]
 
-    cursor.execute(
-        "DELETE FROM question_images WHERE question_id IN "
-        "(SELECT id FROM questions WHERE level_id = ?)",
-        (level_id,)
-    )
-    cursor.execute(
-        "DELETE FROM question_formulas WHERE question_id IN "
-        "(SELECT id FROM questions WHERE level_id = ?)",
-        (level_id,)
-    )
-    cursor.execute(
-        "DELETE FROM questions WHERE level_id = ?",
+    cursor.execute(f"DELETE FROM question_images WHERE question_id IN ({subquery})", params)
+    cursor.execute(f"DELETE FROM question_formulas WHERE question_id IN ({subquery})", params)
+    cursor.execute(f"DELETE FROM questions WHERE {where}", params)
+
+    # 引用计数归零的图片才需要删除文件
+    return [
+        path for path in img_paths
+        if cursor.execute(
+            "SELECT 1 FROM question_images WHERE image_path = ? LIMIT 1", (path,)
+        ).fetchone() is None
+    ]
+
+
+def delete_questions_by_level(level_id):
+    """
+    删除某级别下的全部题目及其图片、公式记录，连同该级别的导入日志。
+    图片文件按内容寻址、可被多个级别共用，question_images 中的行即引用计数：
+    只有删除后不再被任何题目引用的图片文件才会从磁盘移除。
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        orphans = _delete_questions(cursor, "level_id = ?", (level_id,))
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'questions';")
+        cursor.execute("DELETE FROM import_journal WHERE level_id = ?", (level_id,))
+
+    remove_images(orphans)
+
+# ---------------- 导入日志（断点续传） ----------------
+# 每个级别一行，记录最近一次全新导入：源文件摘要、写库顺序、阶段，
+# 以及已提交的题数（按写库顺序的前 committed 题）与这些题目的 id 范围。
+# 题目按检查点分批提交，日志的推进与该批题目在同一事务内，二者始终一致；
+# 导入中断（程序崩溃、写库出错）后 stage 停在 persist，重新导入同一文件时据此续传。
+
+# 未被引用的图片文件至少闲置这么久（秒）才会被回收，避免误删其他导入刚写入、尚未入库的图片
+ORPHAN_GRACE_SECONDS = 600
+
+
+def get_import_journal(level_id):
+    """
+    返回级别的导入日志（字段见 import_journal 表），没有时返回 None。
+    """
+    cursor = get_connection().cursor()
+    cursor.row_factory = record_factory
+    return cursor.execute(
+        "SELECT level_id, file_digest, file_path, write_order, stage, committed, "
+        "first_id, last_id, started_at, updated_at FROM import_journal WHERE level_id = ?",
         (level_id,)
-    )
-    cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'questions';")
-    conn.commit()
-    conn.close()
+    ).fetchone()
+
+
+def begin_import_journal(level_id, file_digest, file_path, write_order):
+    """
+    开始记录一次全新导入（覆盖该级别上一次的日志）。
+    """
+    with transaction() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO import_journal
+                (level_id, file_digest, file_path, write_order, stage, committed)
+            VALUES (?, ?, ?, ?, 'persist', 0)
+        """, (level_id, file_digest, file_path, write_order))
+
+
+def advance_import_journal(level_id, qids):
+    """
+    记录一个检查点：又有 len(qids) 题已写入。应与写入这批题目放在同一事务中。
+    """
+    if not qids:
+        return
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE import_journal SET
+                committed  = committed + ?,
+                first_id   = coalesce(first_id, ?),
+                last_id    = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE level_id = ?
+        """, (len(qids), qids[0], qids[-1], level_id))
+
+
+def finish_import_journal(level_id):
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE import_journal SET stage = 'done', updated_at = CURRENT_TIMESTAMP "
+            "WHERE level_id = ?",
+            (level_id,)
+        )
+
+
+def discard_import(level_id):
+    """
+    丢弃级别中未完成的导入：删除日志记录的已提交题目（id 范围内）及其图片、公式，
+    再删除日志。已完成的导入不受影响。返回删除的题数。
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        row = cursor.execute(
+            "SELECT first_id, last_id FROM import_journal WHERE level_id = ? AND stage != 'done'",
+            (level_id,)
+        ).fetchone()
+        if row is None:
+            return 0
+        first_id, last_id = row
+        orphans, removed = [], 0
+        if first_id is not None:
+            where = "level_id = ? AND id BETWEEN ? AND ?"
+            params = (level_id, first_id, last_id)
+            removed = cursor.execute(f"SELECT COUNT(*) FROM questions WHERE {where}", params).fetchone()[0]
+            orphans = _delete_questions(cursor, where, params)
+        cursor.execute("DELETE FROM import_journal WHERE level_id = ?", (level_id,))
+
+    remove_images(orphans)
+    logging.info(f"[db] 已丢弃级别 {level_id} 未完成的导入：删除 {removed} 题")
+    return removed
+
+
+def collect_orphan_images(grace=ORPHAN_GRACE_SECONDS, keep=()):
+    """
+    回收媒体库中没有任何题目引用的图片文件（中断的导入留下的、已删除题目遗留的），
+    只处理闲置超过 grace 秒的文件；keep 中的路径（如正在导入的文档的图片）一律保留。
+    返回删除的数量。
+    """
+    candidates = list_images(older_than=time.time() - grace)
+    if not candidates:
+        return 0
+    referenced = {
+        os.path.normpath(row[0]) for row in
+        get_connection().execute("SELECT DISTINCT image_path FROM question_images")
+    }
+    referenced.update(os.path.normpath(path) for path in keep)
+    removed = remove_images([path for path in candidates if os.path.normpath(path) not in referenced])
+    if removed:
+        logging.info(f"[db] 已回收 {removed} 个无引用的图片文件")
+    return removed
+
+# questions 表中参与增量比对的内容列（不含 id / level_id / created_at）
+QUESTION_CONTENT_FIELDS = (
+    "recognition_code",
+    "level_code",
+    "question_type_code",
+    "difficulty_coefficient",
+    "question_type",
+    "content_text",
+    "option_a",
+    "option_b",
+    "option_c",
+    "option_d",
+    "answer",
+    "has_formula",
+    "answer_explanation",
+    "scoring_criteria",
+)
+
+
+def resolve_media_refs(media_refs, media_catalog):
+    """
+    把解析器返回的 temp_id 列表解析为 (图片路径列表, [(公式类型, 内容), …])，
+    找不到的 temp_id 忽略。
+    """
+    images, formulas = [], []
+    for temp_id in media_refs:
+        m = media_catalog.get(temp_id)
+        if not m:
+            logging.warning(f"未找到 media temp_id={temp_id}")
+            continue
+        if m['type'] == 'image':
+            images.append(m['path'])
+        else:
+            formulas.append((m['type'], m['content']))
+    return images, formulas
+
+
+# 占位符里的 temp_id 随文档中前面媒体的增减而漂移，比对时去掉编号
+_PLACEHOLDER_ID = re.compile(r'\[(IMAGE|MATH)_\d+\]')
+
+
+def question_fingerprint(qdict, images, formulas):
+    """
+    计算题目指纹：内容列 + 图片路径（内容寻址）+ 公式内容，任何一项变化指纹即不同。
+    文本中的 [IMAGE_n] / [MATH_n] 只保留类型，媒体本身由后两项按顺序比对。
+    """
+    payload = [
+        _PLACEHOLDER_ID.sub(r'[\1]', v) if isinstance(v, str) else v
+        for v in (qdict.get(f) for f in QUESTION_CONTENT_FIELDS)
+    ]
+    payload.append(list(images))
+    payload.append([list(f) for f in formulas])
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _ordinal_keys(records):
+    """
+    为 (认定点, 题型) 相同的题目按出现顺序编号，生成增量比对用的键：
+    (recognition_code, question_type, 序号)。
+    """
+    seen = {}
+    keys = []
+    for rec in records:
+        base = (rec["recognition_code"], rec["question_type"])
+        seen[base] = seen.get(base, 0) + 1
+        keys.append(base + (seen[base],))
+    return keys
+
+
+def sync_level_questions(level_id, items, media_catalog):
+    """
+    增量导入：把新解析出的题目与库中该级别已有题目逐条比对，
+    只对有差异的行执行 INSERT / UPDATE / DELETE，未变化的题目保持原 id。
+    items：解析器返回的 [(qdict, media_refs), …]，按文档顺序
+    整个比对与写入在同一事务中完成，失败则整体回滚。
+    返回 {'inserted': n, 'updated': n, 'deleted': n, 'unchanged': n,
+          'changed_ids': [新增或更新的 question_id, …]}
+    """
+    cols = ", ".join(QUESTION_CONTENT_FIELDS)
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        # 1) 读取库中现有题目及其媒体，按 id 顺序计算键与指纹
+        cursor.row_factory = record_factory
+        cursor.execute(
+            f"SELECT id, {cols} FROM questions WHERE level_id = ? ORDER BY id",
+            (level_id,)
+        )
+        old_rows = cursor.fetchall()
+        cursor.row_factory = None
+        old_images, old_formulas = {}, {}
+        cursor.execute(
+            "SELECT question_id, image_path FROM question_images WHERE question_id IN "
+            "(SELECT id FROM questions WHERE level_id = ?) ORDER BY id",
+            (level_id,)
+        )
+        for qid, path in cursor.fetchall():
+            old_images.setdefault(qid, []).append(path)
+        cursor.execute(
+            "SELECT question_id, formula_type, content FROM question_formulas WHERE question_id IN "
+            "(SELECT id FROM questions WHERE level_id = ?) ORDER BY id",
+            (level_id,)
+        )
+        for qid, ftype, content in cursor.fetchall():
+            old_formulas.setdefault(qid, []).append((ftype, content))
+
+        old = {}
+        for key, row in zip(_ordinal_keys(old_rows), old_rows):
+            qid = row["id"]
+            old[key] = (qid, question_fingerprint(
+                row, old_images.get(qid, []), old_formulas.get(qid, [])
+            ))
+
+        # 2) 逐条比对新题目
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'changed_ids': []}
+        released_images = []
+        new_keys = _ordinal_keys([qdict for qdict, _ in items])
+        for key, (qdict, media_refs) in zip(new_keys, items):
+            images, formulas = resolve_media_refs(media_refs, media_catalog)
+            fp = question_fingerprint(qdict, images, formulas)
+            values = [qdict.get(f) for f in QUESTION_CONTENT_FIELDS]
+
+            if key in old:
+                qid, old_fp = old.pop(key)
+                if old_fp == fp:
+                    stats['unchanged'] += 1
+                    continue
+                assignments = ", ".join(f"{f} = ?" for f in QUESTION_CONTENT_FIELDS)
+                cursor.execute(f"UPDATE questions SET {assignments} WHERE id = ?", values + [qid])
+                released_images += old_images.get(qid, [])
+                cursor.execute("DELETE FROM question_images WHERE question_id = ?", (qid,))
+                cursor.execute("DELETE FROM question_formulas WHERE question_id = ?", (qid,))
+                stats['updated'] += 1
+            else:
+                placeholders = ", ".join("?" for _ in range(len(QUESTION_CONTENT_FIELDS) + 1))
+                cursor.execute(
+                    f"INSERT INTO questions (level_id, {cols}) VALUES ({placeholders})",
+                    [level_id] + values
+                )
+                qid = cursor.lastrowid
+                stats['inserted'] += 1
+
+            cursor.executemany(
+                "INSERT INTO question_images(question_id, image_path) VALUES (?, ?)",
+                [(qid, path) for path in images]
+            )
+            cursor.executemany(
+                "INSERT INTO question_formulas(question_id, formula_type, content) VALUES (?, ?, ?)",
+                [(qid, ftype, content) for ftype, content in formulas]
+            )
+            stats['changed_ids'].append(qid)
+
+        # 3) 新文档中已不存在的题目
+        for qid, _ in old.values():
+            released_images += old_images.get(qid, [])
+            cursor.execute("DELETE FROM question_images WHERE question_id = ?", (qid,))
+            cursor.execute("DELETE FROM question_formulas WHERE question_id = ?", (qid,))
+            cursor.execute("DELETE FROM questions WHERE id = ?", (qid,))
+            stats['deleted'] += 1
+
+        # 同步后级别内容与新文档一致，之前中断的全新导入（若有）不再需要续传
+        cursor.execute("DELETE FROM import_journal WHERE level_id = ? AND stage != 'done'", (level_id,))
+
+        # 被替换 / 删除的图片若已无任何引用，提交后删除文件
+        orphans = [
+            path for path in set(released_images)
+            if cursor.execute(
+                "SELECT 1 FROM question_images WHERE image_path = ? LIMIT 1", (path,)
+            ).fetchone() is None
+        ]
+
+    remove_images(orphans)
+    return stats
+
+
+def bulk_insert_questions(items, media_catalog, batch_size=500, on_batch=None):
+    """
+    批量写库：在同一个事务内，用 executemany 分批插入题目、图片与公式。
+    items：可迭代的 (qdict, media_refs)，可把五个解析器的结果串起来按写库顺序传入
+    batch_size：每批 executemany 的题目数
+    on_batch(done, rows)：每批写入后回调，rows 为 [(question_id, qdict), …]，用于进度 / 预览
+    任何一步失败都会回滚整个事务，库中不会留下半批数据。
+    返回新 question_id 列表，与 items 顺序一致。
+    """
+    cols = ", ".join(("id", "level_id") + QUESTION_CONTENT_FIELDS)
+    placeholders = ", ".join("?" for _ in range(len(QUESTION_CONTENT_FIELDS) + 2))
+    qids = []
+    with transaction() as conn:
+        cursor = conn.cursor()
+        # transaction() 以 BEGIN IMMEDIATE 开始，写锁在事务开头即取得，
+        # id 段由本事务独占，可以显式分配
+        cursor.execute(
+            "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'questions'), 0), "
+            "COALESCE((SELECT MAX(id) FROM questions), 0))"
+        )
+        next_id = cursor.fetchone()[0] + 1
+
+        it = iter(items)
+        while True:
+            batch = list(itertools.islice(it, batch_size))
+            if not batch:
+                break
+            q_rows, img_rows, formula_rows = [], [], []
+            for qdict, media_refs in batch:
+                qid = next_id
+                next_id += 1
+                q_rows.append(
+                    [qid, qdict.get("level_id")] + [qdict.get(f) for f in QUESTION_CONTENT_FIELDS]
+                )
+                images, formulas = resolve_media_refs(media_refs, media_catalog)
+                img_rows += [(qid, path) for path in images]
+                formula_rows += [(qid, ftype, content) for ftype, content in formulas]
+                qids.append(qid)
+
+            cursor.executemany(f"INSERT INTO questions ({cols}) VALUES ({placeholders})", q_rows)
+            cursor.executemany(
+                "INSERT INTO question_images(question_id, image_path) VALUES (?, ?)", img_rows
+            )
+            cursor.executemany(
+                "INSERT INTO question_formulas(question_id, formula_type, content) VALUES (?, ?, ?)",
+                formula_rows
+            )
+            if on_batch:
+                on_batch(len(qids), [(row[0], qdict) for row, (qdict, _) in zip(q_rows, batch)])
+
+    return qids
+
+
+# 短关键词（不足 3 字，trigram 索引无法命中）退化为 LIKE 时检索的列
+_SEARCH_LIKE_COLUMNS = (
+    "recognition_code", "content_text", "option_a", "option_b", "option_c",
+    "option_d", "answer_explanation", "scoring_criteria",
+)
+
+
+def _search_clause(query, level_id=None, types=None):
+    """
+    把检索条件翻译成 (FROM 子句, WHERE 子句, 参数, 排序表达式)；query 无有效词时返回 None。
+    不少于 3 个字的词走 FTS5 trigram 索引，更短的词（如两个汉字）退化为对 questions 的 LIKE 过滤。
+    """
+    terms = query.split()
+    if not terms:
+        return None
+    long_terms = [t for t in terms if len(t) >= 3]
+    short_terms = [t for t in terms if len(t) < 3]
+
+    where, params = [], []
+    if long_terms:
+        # 每个词作为短语加引号，避免用户输入被当作 FTS 语法
+        source = "questions_fts JOIN questions q ON q.id = questions_fts.rowid"
+        where.append("questions_fts MATCH ?")
+        params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in long_terms))
+        rank = "bm25(questions_fts)"
+    else:
+        source = "questions q"
+        rank = "0"
+    for t in short_terms:
+        like = "%" + t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        where.append(
+            "(" + " OR ".join(f"q.{c} LIKE ? ESCAPE '\\'" for c in _SEARCH_LIKE_COLUMNS) + ")"
+        )
+        params += [like] * len(_SEARCH_LIKE_COLUMNS)
+    if level_id is not None:
+        where.append("q.level_id = ?")
+        params.append(level_id)
+    # 与 _level_clause 一致：None 表示不限题型，空列表表示一个题型都不选（无结果）
+    if types is not None:
+        if not types:
+            where.append("0")
+        else:
+            where.append(f"q.question_type IN ({','.join('?' for _ in types)})")
+            params += list(types)
+    return source, " AND ".join(where), params, rank
+
+
+def search_questions(query, level_id=None, types=None, limit=200, offset=0):
+    """
+    全文检索题目：在认定点、题干、选项、解析、评分标准中查找，按相关度（bm25）排序。
+    query：空白分隔的多个关键词，需全部命中；不少于 3 个字的词走 FTS5 trigram 索引，
+           更短的词（如两个汉字）退化为对 questions 的 LIKE 过滤
+    level_id：限定级别；None 表示跨所有工种 / 级别
+    types：限定题型列表，如 ["单选", "判断"]；None 表示不限
+    limit / offset：分页；limit 为 None 表示不限条数
+    返回 QuestionRecord 列表，字段同 fetch_questions_by_level，另附 level_id 与 rank（越小越相关）。
+    """
+    clause = _search_clause(query, level_id, types)
+    if clause is None:
+        return []
+    source, where, params, rank = clause
+
+    sql = f"""
+        SELECT
+          q.id,
+          q.recognition_code,
+          q.level_code,
+          q.question_type_code,
+          q.difficulty_coefficient,
+          q.question_type,
+          q.content_text,
+          q.option_a,
+          q.option_b,
+          q.option_c,
+          q.option_d,
+          q.answer,
+          q.answer_explanation,
+          q.scoring_criteria,
+          q.level_id,
+          {rank} AS rank
+        FROM {source}
+        WHERE {where}
+        ORDER BY rank, q.id
+        LIMIT ? OFFSET ?
+    """
+    params += [-1 if limit is None else limit, offset]
+    cursor = get_connection().cursor()
+    cursor.row_factory = record_factory
+    return cursor.execute(sql, params).fetchall()
+
+
+def search_question_ids(query, level_id=None, types=None):
+    """
+    与 search_questions 条件相同，只按相关度顺序返回 id 列表（导出时解析勾选集合用）。
+    """
+    clause = _search_clause(query, level_id, types)
+    if clause is None:
+        return []
+    source, where, params, rank = clause
+    rows = get_connection().execute(
+        f"SELECT q.id, {rank} AS rank FROM {source} WHERE {where} ORDER BY rank, q.id", params
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def count_search_results(query, level_id=None, types=None):
+    """
+    与 search_questions 条件相同，返回 {题型: 命中数}。
+    """
+    clause = _search_clause(query, level_id, types)
+    if clause is None:
+        return {}
+    source, where, params, _ = clause
+    rows = get_connection().execute(
+        f"SELECT q.question_type, COUNT(*) FROM {source} WHERE {where} GROUP BY q.question_type",
+        params
+    ).fetchall()
+    return dict(rows)
+
+
+# ---------------- 题量校验统计 ----------------
+
+def fetch_code_stats(level_id, expected=None):
+    """
+    按认定点汇总单选 / 多选 / 判断题数及判断题 √ / × / 缺解析数：一条 GROUP BY，只读 level_stats。
+    expected：{'单选': n, '多选': n, '判断': n}，提供时用 HAVING 只返回不满足要求的认定点
+    返回 QuestionRecord 列表，字段 recognition_code, single, multiple, judgment,
+    true_count, false_count, false_unexplained，按认定点排序；只统计含这三种题型的认定点。
+    """
+    having, params = "", [level_id]
+    if expected is not None:
+        having = """
+        HAVING single != ? OR multiple != ? OR judgment != ?
+            OR (? > 0 AND (true_count < 1 OR false_count < 1 OR false_unexplained > 0))"""
+        params += [expected.get("单选", 0), expected.get("多选", 0),
+                   expected.get("判断", 0), expected.get("判断", 0)]
+    cursor = get_connection().cursor()
+    cursor.row_factory = record_factory
+    return cursor.execute(f"""
+        SELECT
+          recognition_code,
+          SUM(CASE WHEN question_type = '单选' THEN total ELSE 0 END) AS single,
+          SUM(CASE WHEN question_type = '多选' THEN total ELSE 0 END) AS multiple,
+          SUM(CASE WHEN question_type = '判断' THEN total ELSE 0 END) AS judgment,
+          SUM(true_count)        AS true_count,
+          SUM(false_count)       AS false_count,
+          SUM(false_unexplained) AS false_unexplained
+        FROM level_stats
+        WHERE level_id = ? AND question_type IN ('单选', '多选', '判断')
+        GROUP BY recognition_code{having}
+        ORDER BY recognition_code
+    """, params).fetchall()
+
+
+def count_codes(level_id):
+    """
+    级别下含单选 / 多选 / 判断题的认定点个数（题量校验的检查范围）。
+    """
+    return get_connection().execute("""
+        SELECT COUNT(DISTINCT recognition_code) FROM level_stats
+        WHERE level_id = ? AND question_type IN ('单选', '多选', '判断')
+    """, (level_id,)).fetchone()[0]
+
+
+# ---------------- 按级别分页浏览 ----------------
+
+def _level_clause(level_id, types=None, code=None):
+    """
+    级别浏览的过滤条件：题型列表与认定点前缀都下推到 SQL，返回 (WHERE 子句, 参数)。
+    只用到 level_id / question_type / recognition_code 三列，questions 与 level_stats 通用。
+    """
+    where, params = ["level_id = ?"], [level_id]
+    if types is not None:
+        if not types:
+            where.append("0")
+        else:
+            where.append(f"question_type IN ({','.join('?' for _ in types)})")
+            params += list(types)
+    if code:
+        where.append("recognition_code LIKE ? ESCAPE '\\'")
+        params.append(code.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    return " AND ".join(where), params
+
+
+def fetch_question_page(level_id, types=None, code=None, after_id=0, limit=200):
+    """
+    按 id 游标（keyset）分页读取级别下的题目列表，只取列表展示需要的字段。
+    types：题型列表，None 表示不限、空列表表示一题都不要
+    code： 认定点前缀（如 "BG01"），None 表示不限
+    after_id：上一页最后一条的 id，首页传 0
+    返回 QuestionRecord 列表（字段 id, recognition_code, question_type, content_text），按 id 升序。
+    """
+    where, params = _level_clause(level_id, types, code)
+    cursor = get_connection().cursor()
+    cursor.row_factory = record_factory
+    return cursor.execute(f"""
+        SELECT id, recognition_code, question_type, content_text
+        FROM questions
+        WHERE {where} AND id > ?
+        ORDER BY id
+        LIMIT ?
+    """, params + [after_id, limit]).fetchall()
+
+
+def fetch_question_ids(level_id, types=None, code=None):
+    """
+    与 fetch_question_page 条件相同，返回全部匹配题目的 id（升序）。
+    """
+    where, params = _level_clause(level_id, types, code)
+    rows = get_connection().execute(
+        f"SELECT id FROM questions WHERE {where} ORDER BY id", params
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def count_questions_by_type(level_id, types=None, code=None):
+    """
+    与 fetch_question_page 条件相同，返回 {题型: 题数}；读 level_stats，不扫描 questions。
+    """
+    where, params = _level_clause(level_id, types, code)
+    rows = get_connection().execute(
+        f"SELECT question_type, SUM(total) FROM level_stats WHERE {where} GROUP BY question_type",
+        params
+    ).fetchall()
+    return dict(rows)
 
-    for path in img_paths:
-        try:
-            os.remove(path)
-        except:
-            pass
 
 def fetch_questions_by_level(level_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    """
+    返回级别下全部题目（QuestionRecord 列表，可按 dict 方式读取字段），按 id 升序。
+    """
+    cursor = get_connection().cursor()
+    cursor.row_factory = record_factory
     cursor.execute("""
         SELECT
           id,
@@ -235,169 +1141,119 @@ def fetch_questions_by_level(level_id):
           scoring_criteria
         FROM questions
         WHERE level_id = ?
+        ORDER BY id
     """, (level_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    result = []
-    for (qid, rec_code, level_code, question_type_code, difficulty_coefficient,
-         qt, text, a, b, c, d, ans, exp, score) in rows:
-        result.append({
-            "id":                     qid,
-            "recognition_code":       rec_code,
-            "level_code":             level_code,
-            "question_type_code":     question_type_code,
-            "difficulty_coefficient": difficulty_coefficient,
-            "question_type":          qt,
-            "content_text":           text,
-            "option_a":               a,
-            "option_b":               b,
-            "option_c":               c,
-            "option_d":               d,
-            "answer":                 ans,
-            "answer_explanation":     exp,
-            "scoring_criteria":       score
-        })
-    return result
+    return cursor.fetchall()
 
 def fetch_jobs():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute("SELECT name FROM jobs ORDER BY name")
     rows = cursor.fetchall()
-    conn.close()
     return [row[0] for row in rows]
 
-def fetch_questions_by_codes(codes: list[str]):
+# 每个认定点取哪一题：ROW_NUMBER() 窗口内的排序表达式
+_PICK_ORDER = {
+    "first":  "id",
+    # 以 seed 偏移后的二次散列打乱 id（线性散列的相对顺序与 seed 无关），同一 seed 结果固定
+    "random": "((id + ?) * 2654435761 % 2147483647) * ((id + ?) * 2654435761 % 2147483647)"
+              " % 2147483647, id",
+}
+
+
+def fetch_questions_by_codes(codes: list[str], pick="first", seed=0, types=None):
+    """
+    按认定点各取一题，在 SQL 里用 ROW_NUMBER() 选出，只传回被选中的行（走 idx_questions_code）。
+    pick：选题规则，"first" 取 id 最小的一题；"random" 按 seed 伪随机取一题，同一 seed 结果稳定
+    types：只在这些题型中选，如 ["单选"]；None 表示不限
+    返回 QuestionRecord 列表，顺序同传入的 codes；没有题目的认定点跳过。
+    """
     if not codes:
         return []
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    placeholders = ",".join("?" for _ in codes)
-    query = f"""
-        SELECT
-          recognition_code,
-          level_code,
-          question_type_code,
-          difficulty_coefficient,
-          question_type,
-          content_text,
-          option_a,
-          option_b,
-          option_c,
-          option_d,
-          answer,
-          answer_explanation,
-          scoring_criteria
-        FROM questions
-        WHERE recognition_code IN ({placeholders})
-    """
-    cursor.execute(query, codes)
-    rows = cursor.fetchall()
-    conn.close()
+    if pick not in _PICK_ORDER:
+        raise ValueError(f"未知的选题规则: {pick}")
+    cursor = get_connection().cursor()
+    cursor.row_factory = record_factory
+    type_filter = ""
+    if types:
+        type_filter = f"AND question_type IN ({','.join('?' for _ in types)})"
+    order_params = [seed % 1000003] * 2 if pick == "random" else []
 
     mapping = {}
-    for (rec_code, level_code, question_type_code, difficulty_coefficient,
-         qt, text, a, b, c, d, ans, exp, score) in rows:
-        mapping.setdefault(rec_code, []).append({
-            "recognition_code":       rec_code,
-            "level_code":             level_code,
-            "question_type_code":     question_type_code,
-            "difficulty_coefficient": difficulty_coefficient,
-            "question_type":          qt,
-            "content_text":           text,
-            "option_a":               a,
-            "option_b":               b,
-            "option_c":               c,
-            "option_d":               d,
-            "answer":                 ans,
-            "answer_explanation":     exp,
-            "scoring_criteria":       score
-        })
-
-    result = []
-    for code in codes:
-        items = mapping.get(code, [])
-        if items:
-            result.append(items[0])
-    return result
+    for chunk in chunked(list(dict.fromkeys(codes)), MAX_SQL_VARIABLES - len(types or ()) - 2):
+        placeholders = ",".join("?" for _ in chunk)
+        query = f"""
+            SELECT
+              recognition_code,
+              level_code,
+              question_type_code,
+              difficulty_coefficient,
+              question_type,
+              content_text,
+              option_a,
+              option_b,
+              option_c,
+              option_d,
+              answer,
+              answer_explanation,
+              scoring_criteria
+            FROM (
+              SELECT *, ROW_NUMBER() OVER (
+                  PARTITION BY recognition_code ORDER BY {_PICK_ORDER[pick]}
+              ) AS rn
+              FROM questions
+              WHERE recognition_code IN ({placeholders}) {type_filter}
+            )
+            WHERE rn = 1
+        """
+        cursor.execute(query, order_params + chunk + list(types or ()))
+        for rec in cursor.fetchall():
+            mapping[rec["recognition_code"]] = rec
+
+    return [mapping[code] for code in codes if code in mapping]
 
 def fetch_questions_by_ids(ids: list[int]):
     """
-    根据 questions.id 列表查询详情，返回完整记录，并附带图片路径与公式图片路径。
+    根据 questions.id 列表查询详情，返回 QuestionRecord 列表，并附带图片路径（image_paths）
+    与公式内容（formula_image_paths）。
+    id 列表按 MAX_SQL_VARIABLES 分块，每块一条语句同时取回题目、图片与公式
+    （图片 / 公式在 SQL 里用 json_group_array 聚合），结果顺序同传入的 ids。
     """
     if not ids:
         return []
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    placeholders = ",".join("?" for _ in ids)
+    cursor = get_connection().cursor()
 
-    # 1) 查询主表字段
-    query = f"""
-        SELECT
-          id,
-          recognition_code,
-          level_code,
-          question_type_code,
-          difficulty_coefficient,
-          question_type,
-          content_text,
-          option_a,
-          option_b,
-          option_c,
-          option_d,
-          answer,
-          answer_explanation,
-          scoring_criteria
-        FROM questions
-        WHERE id IN ({placeholders})
-    """
-    cursor.execute(query, ids)
-    rows = cursor.fetchall()
+    by_id = {}
+    for chunk in chunked(list(dict.fromkeys(ids))):
+        placeholders = ",".join("?" for _ in chunk)
+        cursor.execute(f"""
+            SELECT
+              q.id,
+              q.recognition_code,
+              q.level_code,
+              q.question_type_code,
+              q.difficulty_coefficient,
+              q.question_type,
+              q.content_text,
+              q.option_a,
+              q.option_b,
+              q.option_c,
+              q.option_d,
+              q.answer,
+              q.answer_explanation,
+              q.scoring_criteria,
+              (SELECT json_group_array(image_path) FROM (
+                 SELECT image_path FROM question_images
+                 WHERE question_id = q.id ORDER BY id)) AS image_paths,
+              (SELECT json_group_array(content) FROM (
+                 SELECT content FROM question_formulas
+                 WHERE question_id = q.id ORDER BY id)) AS formula_image_paths
+            FROM questions q
+            WHERE q.id IN ({placeholders})
+        """, chunk)
 
-    # 2) 查询所有图片路径
-    cursor.execute(f"""
-        SELECT question_id, image_path
-        FROM question_images
-        WHERE question_id IN ({placeholders})
-    """, ids)
-    images_map = {}
-    for qid, path in cursor.fetchall():
-        images_map.setdefault(qid, []).append(path)
-
-    # 3) 查询所有公式“内容” —— 这里 content 实际就是你存的公式图片路径
-    cursor.execute(f"""
-        SELECT question_id, content
-        FROM question_formulas
-        WHERE question_id IN ({placeholders})
-    """, ids)
-    formulas_map = {}
-    for qid, content in cursor.fetchall():
-        formulas_map.setdefault(qid, []).append(content)
-
-    conn.close()
-
-    # 4) 组装结果
-    result = []
-    for (qid, rec_code, lvl_c, qt_c, diff, qt, text,
-         a, b, c, d, ans, exp, score) in rows:
-        result.append({
-            "id":                     qid,
-            "recognition_code":       rec_code,
-            "level_code":             lvl_c,
-            "question_type_code":     qt_c,
-            "difficulty_coefficient": diff,
-            "question_type":          qt,
-            "content_text":           text,
-            "option_a":               a,
-            "option_b":               b,
-            "option_c":               c,
-            "option_d":               d,
-            "answer":                 ans,
-            "answer_explanation":     exp,
-            "scoring_criteria":       score,
-            # 把查询到的两组路径放到这两个字段里
-            "image_paths":            images_map.get(qid, []),
-            "formula_image_paths":    formulas_map.get(qid, []),
-        })
-    return result
+        # 图片路径与公式内容（MathML）由 JSON 数组还原为列表
+        Record = record_type(col[0] for col in cursor.description)
+        for row in cursor.fetchall():
+            by_id[row[0]] = Record(*row[:-2], json.loads(row[-2]), json.loads(row[-1]))
 
+    return [by_id[qid] for qid in dict.fromkeys(ids) if qid in by_id]
@@ -0,0 +1,115 @@
+# database/records.py
+
+# 题目记录：按列名集合动态生成带 __slots__ 的只读类，
+# 每行只存一组属性值，不再为每题构造 14~16 个键的 dict。
+# 同时提供 dict 风格的访问（q["content_text"]、q.get(...)、keys()、dict(q)），
+# 原先按 dict 读取题目的代码（解析器、校验器、导出模板）无需改动。
+
+_RECORD_TYPES = {}
+
+
+class QuestionRecord:
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __init__(self, *values):
+        if len(values) != len(self._fields):
+            raise TypeError(f"需要 {len(self._fields)} 个字段值，实际 {len(values)} 个")
+        for name, value in zip(self._fields, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"QuestionRecord 只读，不能修改字段 {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"QuestionRecord 只读，不能删除字段 {name}")
+
+    # ---------- dict 兼容接口 ----------
+    def __getitem__(self, key):
+        if key not in self._index:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._index else default
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def items(self):
+        return tuple((name, getattr(self, name)) for name in self._fields)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self._fields}
+
+    def replace(self, **changes):
+        """
+        返回修改了部分字段的新记录（字段集合不变）。
+        """
+        unknown = set(changes) - set(self._fields)
+        if unknown:
+            raise KeyError(", ".join(sorted(unknown)))
+        return type(self)(*(changes.get(name, getattr(self, name)) for name in self._fields))
+
+    def __eq__(self, other):
+        if isinstance(other, (QuestionRecord, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"QuestionRecord({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # 动态生成的类无法按名字 pickle，按 (字段名, 值) 重建（多进程解析时需要）
+        return _rebuild, (self._fields, self.values())
+
+
+def record_type(fields):
+    """
+    返回字段为 fields（有序列名元组）的记录类，同一组字段只生成一次。
+    """
+    fields = tuple(fields)
+    cls = _RECORD_TYPES.get(fields)
+    if cls is None:
+        cls = type("QuestionRecord", (QuestionRecord,), {
+            "__slots__": fields,
+            "_fields":   fields,
+            "_index":    {name: i for i, name in enumerate(fields)},
+        })
+        _RECORD_TYPES[fields] = cls
+    return cls
+
+
+def make_record(mapping):
+    """
+    由 dict（或任意有 keys() 的映射）构造记录，字段顺序同 mapping。
+    """
+    fields = tuple(mapping.keys())
+    return record_type(fields)(*(mapping[name] for name in fields))
+
+
+def record_factory(cursor, row):
+    """
+    sqlite3 row_factory：按查询列名（含 AS 别名）把每行直接构造成记录。
+    用法：cursor.row_factory = record_factory
+    """
+    return record_type(col[0] for col in cursor.description)(*row)
+
+
+def _rebuild(fields, values):
+    return record_type(fields)(*values)
@@ -3,7 +3,34 @@
 import re
 from clean_utils import clean_inline_blocks
 
+# 数据库题型名 → 预览用的类别键
+_CATEGORY_BY_TYPE = {
+    "单选": "single_choice",
+    "多选": "multiple_choice",
+    "判断": "judgment",
+    "简答": "short_answer",
+    "计算": "calculation"
+}
+
+
+def _preview_fields(q):
+    """
+    兼容两种输入：预览用 dict（类别 / question_text / code / rubric），
+    以及解析器、数据库返回的题目记录（question_type / content_text / recognition_code …）。
+    """
+    if "类别" in q or "question_text" in q:
+        return q
+    return {
+        "类别":           _CATEGORY_BY_TYPE.get(q.get("question_type"), q.get("question_type", "")),
+        "question_text":  q.get("content_text") or "",
+        "code":           q.get("recognition_code") or "N/A",
+        "answer":         q.get("answer") or "未设置",
+        "correct_answer": q.get("answer") or "(未提供参考答案)",
+    }
+
+
 def format_question_preview(q, job, level):
+    q = _preview_fields(q)
     type_map = {
         "single_choice": "单项选择题",
         "multiple_choice": "多项选择题",
@@ -0,0 +1,72 @@
+# media_store.py
+
+import os
+import hashlib
+import logging
+
+# 图片统一存放目录：文件名即内容的 sha256 摘要，相同图片只存一份
+IMAGE_DIR = os.path.join("media", "images")
+
+
+def image_path_for(blob, ext=".png"):
+    """
+    按内容摘要计算图片在媒体库中的路径（不写盘）。
+    """
+    digest = hashlib.sha256(blob).hexdigest()
+    return os.path.join(IMAGE_DIR, f"{digest}{(ext or '.png').lower()}")
+
+
+def store_image(blob, ext=".png"):
+    """
+    把图片写入内容寻址的媒体库，返回相对路径。
+    同内容的文件已存在时直接复用，不再重复写盘；
+    先写临时文件再原子替换，避免并发导入时读到半截文件。
+    """
+    path = image_path_for(blob, ext)
+    if os.path.exists(path):
+        # 刷新修改时间：无引用图片的回收按闲置时间判断，正在导入的图片不会被误删
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    os.makedirs(IMAGE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(blob)
+    os.replace(tmp_path, path)
+    logging.info(f"[media_store] 新增图片 {path}")
+    return path
+
+
+def remove_images(paths):
+    """
+    删除调用方已确认无人引用的图片文件，文件不存在时忽略。
+    返回实际删除的数量。
+    """
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def list_images(older_than=None):
+    """
+    列出媒体库中的图片文件（跳过写入中的临时文件）；
+    older_than 为时间戳时只列出修改时间早于它的文件。
+    """
+    if not os.path.isdir(IMAGE_DIR):
+        return []
+    paths = []
+    for entry in os.scandir(IMAGE_DIR):
+        if not entry.is_file() or entry.name.endswith(".tmp"):
+            continue
+        if older_than is not None and entry.stat().st_mtime >= older_than:
+            continue
+        paths.append(os.path.join(IMAGE_DIR, entry.name))
+    return paths
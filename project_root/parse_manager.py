@@ -16,108 +16,49 @@ logging.basicConfig(
 import database.db_manager as db
 db.init_db()
 
-def process_document(file_path, level_id=1, preview_signal=None):
+def process_document(file_path, level_id=1, preview_signal=None, stream=True, use_cache=True,
+                     incremental=False, level_name=None, progress=None, max_errors=None,
+                     workers=None, pipelined=False, dry_run=False):
     """
     解析 Word 文档，按题型分段并调用解析器，
     然后将题目与媒体写入数据库，返回写库汇总。
+    实际工作由 pipeline.ImportPipeline 分阶段完成，这里只是一次性跑完全部阶段。
     
     preview_signal：用于发送实时预览的信号
+    stream：True 时走流式预处理（iter_document），段落边产出边分段，
+            不加载 python-docx Document；False 时沿用 preprocess_document
+    use_cache：按文件内容哈希读写预处理缓存，重复导入同一文件时跳过预处理与分段
+    incremental：增量导入，只对与库中已有题目有差异的行执行增删改（见 db.sync_level_questions），
+                 汇总中额外返回 "sync" 统计
+    level_name：级别名称，提供时导入后按 EXPECT_COUNTS 校验整个级别，报告放在汇总的 "report" 中，
+                问题文本放在 "validation" 中
+    progress：进度回调 progress(int, str)
+    max_errors：解析时流式校验的错误上限，达到即中止导入（不写库，返回 None）
+    workers：解析进程数，大题库可设为 CPU 核数；小文件仍走单进程（见 pipeline.PARALLEL_MIN_BLOCKS）
+    pipelined：True 时读取、解析、写库三个阶段经有界队列并发进行（见 ImportPipeline.run_pipelined），
+               题目按文档顺序写入；增量模式下不生效
+    dry_run：试运行，只预处理（内存中，不写图片与缓存）、解析和校验，不写数据库；
+             汇总带 "dry_run": True，"report" 为本文件解析结果的校验报告
     """
-    if not os.path.exists(file_path):
-        logging.error(f"文件不存在: {file_path}")
-        return None
-
-    # 延迟导入，避免循环依赖
-    from preprocessor import preprocess_document
-    from utils import process_docx_from_paragraphs
-    from parser import single_choice, multiple_choice, judgment, short_answer, calculation
-
-    # 1. 文档预处理
-    pre_output = preprocess_document(file_path)
-    paragraphs = pre_output.get('paragraphs', [])
-    media_list = pre_output.get('media', [])
-
-    if not paragraphs:
-        logging.error("预处理失败，未生成段落")
-        return None
-
-    logging.info(f"预处理：共生成 {len(paragraphs)} 个段落，媒体 {len(media_list)} 条")
-
-    # 建立 temp_id → 媒体元数据 映射
-    media_catalog = {m['temp_id']: m for m in media_list}
-
-    # 2. 按题型分段
-    sections = process_docx_from_paragraphs(paragraphs)
-
-    # —— 保留原有 Debug 输出来排查分段正确性 —— 
-    for key, section in sections.items():
-        logging.info(f"[DEBUG] {key} 共 {len(section)} 个单元，示例前 3 个：")
-        for i, unit in enumerate(section[:3]):
-            txt = unit if isinstance(unit, str) else getattr(unit, 'text', str(unit))
-            logging.info(f"  单元 {i}: {txt[:50]!r}")
-    # —— Debug 结束 —— 
-
-    # 3. 调用各解析器，获取 (items, errors)
-    sc_items, sc_errors = single_choice.parse(
-        sections.get("single_choice", []), level_id, media_catalog
-    )
-    mc_items, mc_errors = multiple_choice.parse(
-        sections.get("multiple_choice", []), level_id, media_catalog
+    from pipeline import ImportPipeline, PipelineError
+
+    pipeline = ImportPipeline(
+        file_path, level_id,
+        level_name=level_name,
+        stream=stream,
+        use_cache=use_cache,
+        incremental=incremental,
+        progress=progress,
+        preview=preview_signal.emit if preview_signal else None,
+        max_errors=max_errors,
+        workers=workers,
+        dry_run=dry_run,
     )
-    jd_items, jd_errors = judgment.parse(
-        sections.get("judgment", []), level_id, media_catalog
-    )
-    sa_items, sa_errors = short_answer.parse(
-        sections.get("short_answer", []), level_id, media_catalog
-    )
-    cl_items, cl_errors = calculation.parse(
-        sections.get("calculation", []), level_id, media_catalog
-    )
-
-    # 4. 写库：题目 + 媒体
-    def write_items(items):
-        for qdict, media_refs in items:
-            # 插入题目，获取新 question_id
-            qid = db.insert_question(**qdict)
-            # 插入对应媒体
-            for temp_id in media_refs:
-                m = media_catalog.get(temp_id)
-                if not m:
-                    logging.warning(f"未找到 media temp_id={temp_id}")
-                    continue
-                if m['type'] == 'image':
-                    db.insert_question_image(qid, m['path'])
-                    logging.info(f"[INFO] 已写入图片：question_id={qid}, path={m['path']}")
-                else:
-                    db.insert_question_formula(qid, m['type'], m['content'])
-                    logging.info(f"[INFO] 已写入公式：question_id={qid}, type={m['type']}")
-
-            # 如果提供了 preview_signal，则发送实时预览内容
-            if preview_signal:
-                preview_text = f"题目 {qid}: {qdict.get('content_text', '')[:50]}"  # 获取题目的前50个字符作为预览
-                preview_signal.emit(preview_text)  # 发出预览信号
-
-    # 分题型写库
-    write_items(sc_items)
-    write_items(mc_items)
-    write_items(jd_items)
-    write_items(sa_items)
-    write_items(cl_items)
-
-    # 写库完成日志
-    logging.info(
-        f"写库完成：单选{len(sc_items)} 多选{len(mc_items)} "
-        f"判断{len(jd_items)} 简答{len(sa_items)} 计算{len(cl_items)}"
-    )
-
-    # 5. 返回写库汇总
-    return {
-        "single_choice":   {"count": len(sc_items),   "errors": sc_errors},
-        "multiple_choice": {"count": len(mc_items),   "errors": mc_errors},
-        "judgment":        {"count": len(jd_items),   "errors": jd_errors},
-        "short_answer":    {"count": len(sa_items),   "errors": sa_errors},
-        "calculation":     {"count": len(cl_items),   "errors": cl_errors}
-    }
+    try:
+        return pipeline.run_pipelined() if pipelined else pipeline.run()
+    except PipelineError as e:
+        logging.error(str(e))
+        return None
 
 if __name__ == "__main__":
     # 命令行快速测试
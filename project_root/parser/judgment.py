@@ -1,33 +1,26 @@
 # parser/judgment.py
 
-import re
-from parser.base_parser import BaseParser
+from parser.lexer import lex
+from database.records import make_record
 
 def parse_block(q_unit, level_id, media_catalog=None):
     """
-    解析单条判断题，返回 question_dict 和 media_refs。
+    解析单条判断题（QuestionBlock 或行列表），返回 question_dict 和 media_refs。
     """
-    # 1. 头部解析
-    header = q_unit[0]
-    header_text = header.text if hasattr(header, 'text') else str(header)
-    m = re.search(r'\[T\]([A-Z]{2}\d{3})\s+(\d+)\s+(\d+)\s+(\d+)', header_text)
-    if not m:
-        raise ValueError(f"头部解析失败: {header_text}")
-    recognition_code, lvl_code, qtype_code, diff_coef = m.groups()
-    lvl_code, qtype_code, diff_coef = map(int, (lvl_code, qtype_code, diff_coef))
+    return _build(lex(q_unit), level_id, media_catalog)
 
-    # 2. 内容块解析
-    blocks = BaseParser().parse_content_blocks(q_unit)
+def _build(tokens, level_id, media_catalog=None):
+    # 1. 题头字段（词法阶段已解析）
+    recognition_code, lvl_code, qtype_code, diff_coef = tokens.require_header()
 
-    # 3. 清洗题干（去掉首行）
-    lines = blocks['T'].splitlines()
-    question_text = '\n'.join(lines[1:]).strip() if len(lines) > 1 else ''
+    # 2. 清洗题干（去掉首行）
+    question_text = tokens.stem()
 
-    # 4. 答案与解析
-    answer_text        = blocks['D']
-    answer_explanation = blocks['S']
+    # 3. 答案与解析
+    answer_text        = tokens.spans['D']
+    answer_explanation = tokens.spans['S']
 
-    # 5. 构造 question_dict
+    # 4. 构造返回值
     question_dict = {
         'level_id': level_id,
         'recognition_code': recognition_code,
@@ -46,44 +39,46 @@ def parse_block(q_unit, level_id, media_catalog=None):
         'scoring_criteria': None
     }
 
-    # 6. 提取媒体引用
-    full_text = "\n".join(
-        para if isinstance(para, str) else (para.text or "")
-        for para in q_unit
-    )
-    media_refs = [int(x) for x in re.findall(r'\[IMAGE_(\d+)\]', full_text)]
-    media_refs += [int(x) for x in re.findall(r'\[MATH_(\d+)\]', full_text)]
+    # 5. 媒体引用（词法阶段已收集）
+    # 以只读记录返回，后续校验、写库按 dict 方式读取即可
+    return make_record(question_dict), tokens.media_refs
 
-    return question_dict, media_refs
-
-def parse(paragraphs, level_id=1, media_catalog=None):
+def parse(paragraphs, level_id=1, media_catalog=None, on_item=None, on_error=None, offset=0):
     """
     解析判断题列表，对每道题：
     - 检查答案必须是“√”或“×”
     - 如果答案是“×”，必须有解析
+    paragraphs：分段产出的 QuestionBlock 列表（也接受按行切好的题块列表）。
+    on_item(qdict) / on_error(msg)：可选钩子，每解析出一题 / 每记录一条错误立即调用，
+    供流式校验使用；钩子抛出的异常（如达到错误上限）会中止解析。
+    offset：paragraphs 在本题型中的起始序号（分块并行解析时使用，只影响错误信息里的“第 n 题”）。
     """
     items, errors = [], []
 
-    # 逐题解析，并附带认定点编码的错误收集
-    for idx, unit in enumerate(paragraphs):
-        header = unit[0]
-        header_text = header.text if hasattr(header, 'text') else str(header)
-        m_code = re.search(r'\[T\]([A-Z]{2}\d{3})', header_text)
-        rec_code = m_code.group(1) if m_code else f"第{idx+1}题"
+    def report(msg):
+        errors.append(msg)
+        if on_error:
+            on_error(msg)
+
+    # 逐题解析，并附带认定点编码的错误收集；格式校验紧随每题进行
+    for idx, unit in enumerate(paragraphs, offset):
+        tokens = lex(unit)
+        rec_code = tokens.code or f"第{idx+1}题"
 
         try:
-            qdict, media_refs = parse_block(unit, level_id, media_catalog)
+            qdict, media_refs = _build(tokens, level_id, media_catalog)
             items.append((qdict, media_refs))
         except Exception as e:
-            errors.append(f"解析错误：判断题{rec_code} {e}")
-    
-    # 对每道题再做格式校验
-    for qdict, _ in items:
+            report(f"解析错误：判断题{rec_code} {e}")
+            continue
+
         code = qdict['recognition_code']
         ans  = qdict['answer']
         if ans not in ("√", "×"):
-            errors.append(f"{code} 判断题: 非法答案 '{ans}'")
+            report(f"{code} 判断题: 非法答案 '{ans}'")
         if ans == "×" and not qdict.get('answer_explanation'):
-            errors.append(f"{code} 判断题: 错误选项缺少解析")
+            report(f"{code} 判断题: 错误选项缺少解析")
+        if on_item:
+            on_item(qdict)
 
     return items, errors
@@ -0,0 +1,220 @@
+# parser/lexer.py
+
+# 题块词法分析：把一个题块（行列表）单遍扫描成解析器需要的全部片段——
+# 题头字段、[T]/[D]/[S] 标签内容、选项、媒体引用。
+# 所有正则在模块加载时编译一次；五个题型解析器共用同一个结果，
+# 不再各自对每行重复跑题头、标签、选项、占位符的正则。
+# 分段器（utils.iter_question_blocks）产出的 QuestionBlock 已带题头与媒体引用，
+# 对它做词法分析时只需再切标签和选项。
+
+import re
+
+# 题头："[T]BG010 5 1 5"
+_HEADER = re.compile(r'\[T\]([A-Z]{2}\d{3})\s+(\d+)\s+(\d+)\s+(\d+)')
+# 题头格式不完整时仍尽量取出认定点，用于错误信息
+_HEADER_CODE = re.compile(r'\[T\]([A-Z]{2}\d{3})')
+# 行内成对标签 [T]…[T/]：(标签名, 结束标签, 正则)，按 T、D、S 的顺序优先
+_INLINE = tuple(
+    (tag, f'[{tag}/]', re.compile(rf'\[{tag}\](.*?)\[{tag}/\]', re.S))
+    for tag in ('T', 'D', 'S')
+)
+# 选项片段："A.内容" / "A、内容"
+_OPTION = re.compile(r'^([A-D])[、\.]\s*(.+)$')
+_OPTION_START = re.compile(r'^[A-D][、\.]\s*')
+_OPTION_LETTERS = frozenset('ABCD')
+# 媒体占位符
+_MEDIA = re.compile(r'\[(IMAGE|MATH)_(\d+)\]')
+
+# 跨行标签：(开始/结束标签, 标签名, 是否结束)，判断顺序同 BaseParser
+_MARKERS = (
+    ('[T]', 'T', False), ('[T/]', 'T', True),
+    ('[D]', 'D', False), ('[D/]', 'D', True),
+    ('[S]', 'S', False), ('[S/]', 'S', True),
+)
+
+
+def _text(para):
+    return para.text if hasattr(para, 'text') else str(para)
+
+
+def parse_header(text):
+    """
+    解析题头行，返回 (header, code)：
+    header 为 (认定点, 级别代码, 题型代码, 难度系数)，题头不完整时为 None；
+    code 为认定点，题头不完整时也尽量取出，否则为 None。
+    """
+    m = _HEADER.search(text)
+    if m:
+        code, lvl, qtype, diff = m.groups()
+        return (code, int(lvl), int(qtype), int(diff)), code
+    mc = _HEADER_CODE.search(text)
+    return None, (mc.group(1) if mc else None)
+
+
+def media_refs(lines):
+    """
+    按出现顺序收集 [IMAGE_n] 与 [MATH_n] 的临时 id，返回 [IMAGE…, MATH…]。
+    """
+    images, maths = [], []
+    for line in lines:
+        if '_' in line:
+            for kind, num in _MEDIA.findall(line):
+                (images if kind == 'IMAGE' else maths).append(int(num))
+    return images + maths
+
+
+class QuestionBlock:
+    """
+    分段产出的题块记录，题头与媒体引用在分段时只解析一次，下游解析器直接使用：
+      index       题块序号（从 1 开始，含无法识别题型而被丢弃的块）
+      section     sections 键（single_choice 等）
+      header      (认定点, 级别代码, 题型代码, 难度系数)，后三项为 int；题头不完整时为 None
+      code        认定点（题头不完整时也尽量给出，否则为 None）
+      first_para / last_para  题块在段落流中的起止下标（从 0 开始，含两端）
+      lines       题块的行（tuple，首行为题头）
+      media_refs  [IMAGE 临时 id…, MATH 临时 id…]
+    """
+    __slots__ = ("index", "section", "header", "code", "first_para", "last_para",
+                 "lines", "media_refs")
+
+    def __init__(self, index, section, header, code, first_para, last_para, lines, media_refs):
+        self.index = index
+        self.section = section
+        self.header = header
+        self.code = code
+        self.first_para = first_para
+        self.last_para = last_para
+        self.lines = lines
+        self.media_refs = media_refs
+
+    # 兼容按行列表读取题块的代码（unit[0]、len(unit)、for line in unit）
+    def __getitem__(self, i):
+        return self.lines[i]
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def to_list(self):
+        """紧凑的 JSON 友好形式，供预处理缓存使用。"""
+        return [self.index, self.section, self.header and list(self.header), self.code,
+                self.first_para, self.last_para, list(self.lines), self.media_refs]
+
+    @classmethod
+    def from_list(cls, data):
+        index, section, header, code, first_para, last_para, lines, media_refs = data
+        return cls(index, section, header and tuple(header), code,
+                   first_para, last_para, tuple(lines), media_refs)
+
+    def __repr__(self):
+        return f"QuestionBlock({self.index}, {self.section}, {self.code}, 段落 {self.first_para}-{self.last_para})"
+
+
+class Tokens:
+    """
+    一个题块的词法结果：
+      header      题头匹配到的 (认定点, 级别代码, 题型代码, 难度系数)，后三项为 int；题头无效时为 None
+      header_text 题头原文
+      code        认定点（题头不完整时也尽量给出，否则为 None）
+      spans       {'T': 题干, 'D': 答案, 'S': 解析/评分标准}
+      options     {'A': 内容, …}（同一字母后出现的覆盖先出现的）
+      media_refs  [IMAGE 临时 id…, MATH 临时 id…]
+    """
+    __slots__ = ("header", "header_text", "code", "spans", "options", "media_refs")
+
+    def require_header(self):
+        if self.header is None:
+            raise ValueError(f"头部解析失败: {self.header_text}")
+        return self.header
+
+    def stem(self, drop_options=False):
+        """
+        题干：[T] 内容去掉首行（题头），选择题再去掉选项行。
+        """
+        lines = self.spans['T'].splitlines()[1:]
+        if drop_options:
+            lines = [line for line in lines if not _OPTION_START.match(line)]
+        return '\n'.join(lines).strip()
+
+
+def scan_spans(paragraphs):
+    """
+    只切分 [T]/[D]/[S] 标签内容（BaseParser.parse_content_blocks 的实现）：
+    行内成对标签优先；跨行标签从开始行累积到结束行；未闭合的缓冲在末尾 flush。
+    """
+    return lex(paragraphs).spans
+
+
+def lex(q_unit):
+    """
+    单遍扫描题块，返回 Tokens。
+    q_unit：QuestionBlock（题头、媒体引用直接取用），或行字符串 / 带 .text 的段落组成的列表。
+    """
+    if isinstance(q_unit, QuestionBlock):
+        lines = q_unit.lines
+    else:
+        lines = [para if para.__class__ is str else _text(para) for para in q_unit]
+
+    spans = {'T': '', 'D': '', 'S': ''}
+    options = {}
+    current = None
+    buffer = []
+
+    for raw in lines:
+        text = raw.strip()
+
+        if '[' in text:
+            # 1. 行内成对标签
+            for tag, closing, pattern in _INLINE:
+                if closing in text:
+                    m = pattern.search(text)
+                    if m:
+                        spans[tag] = m.group(1).strip()
+                        current = None
+                        buffer = []
+                        break
+            else:
+                # 2. 跨行标签开始/结束
+                for marker, tag, closing in _MARKERS:
+                    if marker in text:
+                        part = text.replace(marker, '').strip()
+                        if closing:
+                            buffer.append(part)
+                            spans[tag] = '\n'.join(buffer).strip()
+                            current = None
+                            buffer = []
+                        else:
+                            current = tag
+                            buffer = [part]
+                        break
+                else:
+                    if current:
+                        buffer.append(text)
+        elif current:
+            buffer.append(text)
+
+        # 3. 选项（按制表符切开的片段；片段只可能从行首或制表符后开始）
+        if '\t' in text or text[:1] in _OPTION_LETTERS:
+            for seg in text.split('\t'):
+                if seg[:1] in _OPTION_LETTERS and _OPTION_START.match(seg):
+                    m = _OPTION.match(seg.strip())
+                    if m:
+                        options[m.group(1)] = m.group(2)
+
+    # 4. flush 未闭合的多行 buffer
+    if current and buffer:
+        spans[current] = '\n'.join(buffer).strip()
+
+    tokens = Tokens()
+    tokens.header_text = lines[0] if lines else ''
+    if isinstance(q_unit, QuestionBlock):
+        tokens.header, tokens.code = q_unit.header, q_unit.code
+        tokens.media_refs = list(q_unit.media_refs)
+    else:
+        tokens.header, tokens.code = parse_header(tokens.header_text)
+        tokens.media_refs = media_refs(lines)
+    tokens.spans = spans
+    tokens.options = options
+    return tokens
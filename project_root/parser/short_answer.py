@@ -1,26 +1,22 @@
 # parser/short_answer.py
 
-import re
-from parser.base_parser import BaseParser
+from parser.lexer import lex
+from database.records import make_record
 
 def parse_block(q_unit, level_id, media_catalog=None):
-    # 1. 头部解析
-    header = q_unit[0]
-    header_text = header.text if hasattr(header, 'text') else str(header)
-    m = re.search(r'\[T\]([A-Z]{2}\d{3})\s+(\d+)\s+(\d+)\s+(\d+)', header_text)
-    if not m:
-        raise ValueError(f"头部解析失败: {header_text}")
-    recognition_code, lvl_code, qtype_code, diff_coef = m.groups()
-    lvl_code, qtype_code, diff_coef = map(int, (lvl_code, qtype_code, diff_coef))
+    # q_unit：QuestionBlock 或行列表
+    return _build(lex(q_unit), level_id, media_catalog)
 
-    # 2. 拼接并清洗题干
-    blocks = BaseParser().parse_content_blocks(q_unit)
-    lines = blocks['T'].splitlines()
-    question_text = '\n'.join(lines[1:]).strip() if len(lines) > 1 else ''
+def _build(tokens, level_id, media_catalog=None):
+    # 1. 题头字段（词法阶段已解析）
+    recognition_code, lvl_code, qtype_code, diff_coef = tokens.require_header()
+
+    # 2. 清洗题干（去掉首行）
+    question_text = tokens.stem()
 
     # 3. 答案与评分标准
-    answer_text      = blocks['D']
-    scoring_standard = blocks['S']
+    answer_text      = tokens.spans['D']
+    scoring_standard = tokens.spans['S']
 
     # 4. 构造返回值
     question_dict = {
@@ -41,32 +37,33 @@ def parse_block(q_unit, level_id, media_catalog=None):
         'scoring_criteria': scoring_standard
     }
 
-    # 5. 提取媒体引用
-    full_text = "\n".join(
-        para if isinstance(para, str) else (para.text or "")
-        for para in q_unit
-    )
-    media_refs = [int(x) for x in re.findall(r'\[IMAGE_(\d+)\]', full_text)]
-    media_refs += [int(x) for x in re.findall(r'\[MATH_(\d+)\]', full_text)]
-
-    return question_dict, media_refs
+    # 5. 媒体引用（词法阶段已收集）
+    # 以只读记录返回，后续校验、写库按 dict 方式读取即可
+    return make_record(question_dict), tokens.media_refs
 
-def parse(paragraphs, level_id=1, media_catalog=None):
+def parse(paragraphs, level_id=1, media_catalog=None, on_item=None, on_error=None, offset=0):
     """
     解析简答题，并在出错时附带认定点编码。
+    paragraphs：分段产出的 QuestionBlock 列表（也接受按行切好的题块列表）。
+    on_item(qdict) / on_error(msg)：可选钩子，每解析出一题 / 每记录一条错误立即调用，
+    供流式校验使用；钩子抛出的异常（如达到错误上限）会中止解析。
+    offset：paragraphs 在本题型中的起始序号（分块并行解析时使用，只影响错误信息里的“第 n 题”）。
     """
     items, errors = [], []
-    for idx, unit in enumerate(paragraphs):
-        # 预提取认定点编码
-        header = unit[0]
-        header_text = header.text if hasattr(header, 'text') else str(header)
-        m_code = re.search(r'\[T\]([A-Z]{2}\d{3})', header_text)
-        rec_code = m_code.group(1) if m_code else f"第{idx+1}题"
+    for idx, unit in enumerate(paragraphs, offset):
+        # 词法扫描一次，认定点编码与题块内容都取自同一结果
+        tokens = lex(unit)
+        rec_code = tokens.code or f"第{idx+1}题"
 
         try:
-            qdict, media_refs = parse_block(unit, level_id, media_catalog)
+            qdict, media_refs = _build(tokens, level_id, media_catalog)
             items.append((qdict, media_refs))
         except Exception as e:
             errors.append(f"解析错误：简答题{rec_code} {e}")
+            if on_error:
+                on_error(errors[-1])
+            continue
+        if on_item:
+            on_item(qdict)
 
     return items, errors
@@ -1,56 +1,35 @@
 # parser/single_choice.py
 
 import re
-from parser.base_parser import BaseParser
+from parser.lexer import lex
+from database.records import make_record
+
+# 答案格式
+_ANSWER = re.compile(r"[A-D]")
 
 def parse_block(q_unit, level_id, media_catalog=None):
-    # 1. 解析头部编码与三位数字
-    header = q_unit[0]
-    header_text = header if isinstance(header, str) else header.text or ""
-    m = re.search(r'\[T\]([A-Z]{2}\d{3})\s+(\d+)\s+(\d+)\s+(\d+)', header_text)
-    if not m:
-        raise ValueError(f"头部解析失败: {header_text}")
-    recognition_code, lvl_code, qtype_code, diff_coef = m.groups()
-    lvl_code, qtype_code, diff_coef = map(int, (lvl_code, qtype_code, diff_coef))
+    # q_unit：QuestionBlock 或行列表
+    return _build(lex(q_unit), level_id, media_catalog)
 
-    # 2. 拼接原始题干+选项
-    blocks = BaseParser().parse_content_blocks(q_unit)
-    raw = blocks['T']
+def _build(tokens, level_id, media_catalog=None):
+    # 1. 题头字段（词法阶段已解析）
+    recognition_code, lvl_code, qtype_code, diff_coef = tokens.require_header()
 
-    # 3. 去掉首行，再剥离选项行，只保留题干
-    lines = raw.splitlines()
-    body = lines[1:] if len(lines) > 1 else []
-    stem = [line for line in body if not re.match(r'^[A-D][、\.]\s*', line)]
-    question_text = '\n'.join(stem).strip()
+    # 2. 题干：删除首行，剥离选项行
+    question_text = tokens.stem(drop_options=True)
 
-    # 4. 提取选项
-    option_pattern = re.compile(r'^([A-D])[、\.]\s*(.+)$')
-    option_a = option_b = option_c = option_d = None
-    segments = []
-    for para in q_unit:
-        text = para if isinstance(para, str) else para.text or ""
-        for seg in text.strip().split('\t'):
-            if re.match(r'^[A-D][、\.]\s*', seg):
-                segments.append(seg.strip())
-    for seg in segments:
-        m2 = option_pattern.match(seg)
-        if not m2:
-            continue
-        letter, content = m2.groups()
-        if letter == 'A': option_a = content
-        elif letter == 'B': option_b = content
-        elif letter == 'C': option_c = content
-        elif letter == 'D': option_d = content
+    # 3. 选项（词法阶段已按制表符切好）
+    options = tokens.options
 
-    # 5. 答案
-    answer_text = blocks['D']
+    # 4. 答案
+    answer_text = tokens.spans['D']
 
-    # 5.1 增加格式校验：单选答案必须是单个字母
-    if not re.fullmatch(r"[A-D]", answer_text):
+    # 4.1 格式校验：单选答案必须是单个字母
+    if not _ANSWER.fullmatch(answer_text):
         # 这里直接抛给上层 parse() 捕获并记录到 errors
         raise ValueError(f"答案格式错误（应为单个字母），实际 '{answer_text}'")
 
-    # 6. 构造返回值
+    # 5. 构造返回值
     question_dict = {
         'level_id': level_id,
         'recognition_code': recognition_code,
@@ -59,42 +38,43 @@ def parse_block(q_unit, level_id, media_catalog=None):
         'difficulty_coefficient': diff_coef,
         'question_type': "单选",
         'content_text': question_text,
-        'option_a': option_a,
-        'option_b': option_b,
-        'option_c': option_c,
-        'option_d': option_d,
+        'option_a': options.get('A'),
+        'option_b': options.get('B'),
+        'option_c': options.get('C'),
+        'option_d': options.get('D'),
         'answer': answer_text,
         'has_formula': 0,
         'answer_explanation': None,
         'scoring_criteria': None
     }
 
-    # 7. 提取媒体引用
-    full_text = "\n".join(
-        para if isinstance(para, str) else (para.text or "")
-        for para in q_unit
-    )
-    media_refs = [int(x) for x in re.findall(r'\[IMAGE_(\d+)\]', full_text)]
-    media_refs += [int(x) for x in re.findall(r'\[MATH_(\d+)\]', full_text)]
+    # 6. 媒体引用（词法阶段已收集）
+    # 以只读记录返回，后续校验、写库按 dict 方式读取即可
+    return make_record(question_dict), tokens.media_refs
 
-    return question_dict, media_refs
-
-def parse(paragraphs, level_id=1, media_catalog=None):
+def parse(paragraphs, level_id=1, media_catalog=None, on_item=None, on_error=None, offset=0):
     """
     解析单选题，并在出错时附带认定点编码。
+    paragraphs：分段产出的 QuestionBlock 列表（也接受按行切好的题块列表）。
+    on_item(qdict) / on_error(msg)：可选钩子，每解析出一题 / 每记录一条错误立即调用，
+    供流式校验使用；钩子抛出的异常（如达到错误上限）会中止解析。
+    offset：paragraphs 在本题型中的起始序号（分块并行解析时使用，只影响错误信息里的“第 n 题”）。
     """
     items, errors = [], []
-    for idx, unit in enumerate(paragraphs):
-        # 预提取认定点编码
-        header = unit[0]
-        header_text = header if isinstance(header, str) else header.text or ""
-        m_code = re.search(r'\[T\]([A-Z]{2}\d{3})', header_text)
-        rec_code = m_code.group(1) if m_code else f"第{idx+1}题"
+    for idx, unit in enumerate(paragraphs, offset):
+        # 词法扫描一次，认定点编码与题块内容都取自同一结果
+        tokens = lex(unit)
+        rec_code = tokens.code or f"第{idx+1}题"
 
         try:
-            qdict, media_refs = parse_block(unit, level_id, media_catalog)
+            qdict, media_refs = _build(tokens, level_id, media_catalog)
             items.append((qdict, media_refs))
         except Exception as e:
             # 将错误信息与认定点一起记录
             errors.append(f"解析错误：单选题{rec_code} {e}")
+            if on_error:
+                on_error(errors[-1])
+            continue
+        if on_item:
+            on_item(qdict)
     return items, errors
@@ -0,0 +1,771 @@
+# pipeline.py
+
+import os
+import queue
+import logging
+import itertools
+import threading
+
+import database.db_manager as db
+
+# 题型键、中文名，顺序即解析与写库顺序
+SECTION_NAMES = {
+    "single_choice":   "单选",
+    "multiple_choice": "多选",
+    "judgment":        "判断",
+    "short_answer":    "简答",
+    "calculation":     "计算"
+}
+
+
+# 题块总数不足该值时即使指定了 workers 也走单进程解析（进程启动与传输开销不划算）
+PARALLEL_MIN_BLOCKS = 2000
+# 并行解析时每个任务的题块数上下限
+PARALLEL_CHUNK_MIN = 200
+PARALLEL_CHUNK_MAX = 2000
+
+# 流水线模式下每解析这么多题汇报一次进度
+PROGRESS_EVERY = 50
+
+# 流水线模式下阶段之间的有界队列容量：待解析题块 / 待写入题目
+BLOCK_QUEUE_SIZE = 256
+WRITE_QUEUE_SIZE = 1024
+# 全新导入每写入这么多题提交一次并记入导入日志（检查点），中断后从最近的检查点续传
+CHECKPOINT_SIZE = 1000
+
+# 队列结束标记：正常结束 / 中止（写库线程回滚）
+_END = object()
+_ABORT = object()
+
+
+class PipelineError(Exception):
+    """导入流水线无法继续（文件不存在、未识别到题目等）。"""
+
+
+class _WriteAborted(Exception):
+    """流水线模式下写库线程收到中止标记，回滚整个事务。"""
+
+
+def _put(q, item, stop):
+    """放入有界队列；stop 被置位（下游已退出）时放弃并返回 False。"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """从队列取出一项；队列为空且 stop 已置位（上游已退出）时返回 _END。"""
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _END
+
+
+def _section_parsers():
+    # 延迟导入，避免循环依赖
+    from parser import single_choice, multiple_choice, judgment, short_answer, calculation
+    return {
+        "single_choice":   single_choice.parse,
+        "multiple_choice": multiple_choice.parse,
+        "judgment":        judgment.parse,
+        "short_answer":    short_answer.parse,
+        "calculation":     calculation.parse
+    }
+
+
+def _parse_chunk(key, blocks, level_id, offset):
+    """
+    进程池中执行：解析某题型的一段题块。
+    除 (items, errors) 外返回 order：按发生顺序记录每次回调是题目（True）还是错误（False），
+    主进程据此按原顺序重放校验钩子，结果与单进程解析一致。
+    """
+    order = []
+    items, errors = _section_parsers()[key](
+        blocks, level_id, None,
+        on_item=lambda q: order.append(True),
+        on_error=lambda msg: order.append(False),
+        offset=offset
+    )
+    return items, errors, order
+
+
+def _replay(items, errors, order, on_item, on_error):
+    """按 order 记录的顺序把一段解析结果重放给校验钩子。"""
+    it_items = (q for q, _ in items)
+    it_errors = iter(errors)
+    for is_item in order:
+        if is_item:
+            on_item(next(it_items))
+        else:
+            on_error(next(it_errors))
+
+
+class ImportPipeline:
+    """
+    题库导入流水线，按顺序执行五个阶段：
+      preprocess → segment → parse → validate → persist
+    每个阶段通过 progress(百分比, 文本) 汇报真实进度，返回本阶段产物并记入 self.artifacts，
+    调用方可以单独驱动某个阶段，也可以直接 run() 得到写库汇总。
+    """
+
+    # 各阶段在总进度条上占的区间
+    STAGE_RANGES = {
+        "preprocess": (0, 30),
+        "segment":    (30, 40),
+        "parse":      (40, 70),
+        "validate":   (70, 75),
+        "persist":    (75, 99),
+        # 流水线模式：读取、解析、写库并发进行，按读取 / 解析进度汇报，写库收尾部分计入 persist
+        "stream":     (0, 75),
+    }
+
+    def __init__(self, file_path, level_id=1, level_name=None, stream=True, use_cache=True,
+                 incremental=False, progress=None, preview=None, batch_size=500,
+                 max_errors=None, validators=None, workers=None, dry_run=False,
+                 checkpoint_size=CHECKPOINT_SIZE, gc_media=True):
+        """
+        level_name：级别名称（如“高级工”），提供时 validate 阶段按 EXPECT_COUNTS 校验题量
+        stream / use_cache / incremental：含义同 parse_manager.process_document
+        progress：进度回调 progress(int, str)
+        preview： 预览回调 preview(str)，写库时逐题发送
+        batch_size：写库时每批 executemany 的题目数
+        max_errors：解析阶段流式校验的错误上限，达到即中止导入（尚未写库）；None 表示不限
+        validators：额外挂到解析阶段的校验器列表，每个需提供 on_item(qdict) 与 on_error(msg)
+        workers：解析进程数；大于 1 且题块数不少于 PARALLEL_MIN_BLOCKS 时分块交给进程池并行解析，
+                 结果按文档顺序合并；默认单进程
+        dry_run：试运行，只解析与校验：预处理在内存中完成（不写图片、不写预处理缓存），
+                 不写数据库，校验报告只针对本文件的解析结果
+        checkpoint_size：全新导入时每多少题提交一次并记入导入日志（见 db.import_journal），
+                 中断后重新导入同一文件会跳过已提交的题目；None 表示整个导入一个事务、不记日志
+        gc_media：续传 / 丢弃过中断的导入时，写库完成后回收无引用的图片；
+                 批量导入时其他文件的图片尚未入库，由 batch_import 在全部写完后统一回收
+        """
+        self.file_path = file_path
+        self.level_id = level_id
+        self.level_name = level_name
+        self.stream = stream
+        self.use_cache = use_cache
+        self.incremental = incremental
+        self.progress = progress
+        self.preview = preview
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.validators = list(validators or [])
+        self.workers = workers
+        self.dry_run = dry_run
+        self.checkpoint_size = checkpoint_size
+        self.stream_validator = None
+        self.gc_media = gc_media
+        self.journal = False      # 本次写库是否记导入日志
+        self.resumed = 0          # 续传时跳过的已提交题数
+        self.interrupted = False  # 写库前发现了未完成的导入（已续传或丢弃）
+        self.artifacts = {}
+
+    def _report(self, stage, fraction, message):
+        lo, hi = self.STAGE_RANGES[stage]
+        pct = lo + int((hi - lo) * min(max(fraction, 0.0), 1.0))
+        logging.info(f"[pipeline] {stage} {pct}% {message}")
+        if self.progress:
+            self.progress(pct, message)
+
+    # ---------------- 1. 预处理 ----------------
+    def preprocess(self):
+        """
+        返回 {'digest', 'paragraphs', 'media_catalog', 'sections', 'cached'(, 'streaming')}。
+        命中缓存时 sections 已就绪；流式模式下 paragraphs 为惰性生成器，
+        media_catalog 在 segment 阶段消费段落时逐步填充，读取进度也在那时汇报。
+        """
+        import preprocess_cache
+        from preprocessor import preprocess_document, iter_document, stream_paragraphs
+
+        if not os.path.exists(self.file_path):
+            raise PipelineError(f"文件不存在: {self.file_path}")
+
+        self._report("preprocess", 0, "正在预处理文档…")
+        digest = cached = None
+        if self.use_cache:
+            digest = preprocess_cache.file_digest(self.file_path)
+            cached = preprocess_cache.load(digest)
+
+        if cached:
+            result = {
+                'digest':        digest,
+                'paragraphs':    cached['paragraphs'],
+                'media_catalog': cached['media_catalog'],
+                'sections':      cached['sections'],
+                'cached':        True,
+            }
+            self._report("preprocess", 1, f"预处理缓存命中：媒体 {len(result['media_catalog'])} 条")
+        elif self.stream:
+            media_catalog = {}
+            sink = [] if self.use_cache and not self.dry_run else None
+            step = [-1]
+
+            # 段落在 segment 阶段才被逐个读出，读取进度按 document.xml 的已读比例每 5% 汇报一次
+            def on_position(done, total):
+                k = done * 20 // max(total, 1)
+                if k != step[0]:
+                    step[0] = k
+                    self._report("preprocess", k / 20, "正在流式读取文档…")
+
+            result = {
+                'digest':        digest,
+                'paragraphs':    stream_paragraphs(
+                    iter_document(self.file_path, write_media=not self.dry_run, on_position=on_position),
+                    media_catalog, sink=sink
+                ),
+                'media_catalog': media_catalog,
+                'sections':      None,
+                'cached':        False,
+                'streaming':     True,
+                'sink':          sink,
+            }
+        else:
+            pre = preprocess_document(self.file_path, write_media=not self.dry_run)
+            if not pre.get('paragraphs'):
+                raise PipelineError("预处理失败，未生成段落")
+            result = {
+                'digest':        digest,
+                'paragraphs':    pre['paragraphs'],
+                'media_catalog': {m['temp_id']: m for m in pre.get('media', [])},
+                'sections':      None,
+                'cached':        False,
+            }
+            self._report(
+                "preprocess", 1,
+                f"预处理完成：段落 {len(pre['paragraphs'])} 个，媒体 {len(result['media_catalog'])} 条"
+            )
+
+        self.artifacts['preprocess'] = result
+        return result
+
+    # ---------------- 2. 分段 ----------------
+    def segment(self, pre):
+        """
+        按题型分段，返回 sections（题型键 → QuestionBlock 列表）；新预处理结果顺带写入缓存。
+        """
+        import preprocess_cache
+        from utils import process_docx_from_paragraphs
+
+        # 流式预处理时文档在这里才被读取，预处理进度由读取回调汇报，读完再进入分段区间
+        if not pre.get('streaming'):
+            self._report("segment", 0, "正在按题型分段…")
+        sections = pre['sections']
+        if sections is None:
+            sections = process_docx_from_paragraphs(pre['paragraphs'])
+            if not any(sections.values()):
+                raise PipelineError("未识别到题目，请检查文档中的 [T] 题头")
+            if self.use_cache and not self.dry_run:
+                paragraphs = pre.get('sink')
+                if paragraphs is None:
+                    paragraphs = pre['paragraphs']
+                preprocess_cache.store(pre['digest'], paragraphs, pre['media_catalog'], sections)
+
+        for key, section in sections.items():
+            logging.info(f"[DEBUG] {key} 共 {len(section)} 个单元，示例前 3 个：")
+            for i, block in enumerate(section[:3]):
+                logging.info(f"  单元 {i}（段落 {block.first_para}-{block.last_para}）: {block.lines[0][:50]!r}")
+
+        total = sum(len(v) for v in sections.values())
+        self._report(
+            "segment", 1,
+            f"分段完成：共 {total} 题，媒体 {len(pre['media_catalog'])} 条"
+        )
+        self.artifacts['segment'] = sections
+        return sections
+
+    # ---------------- 3. 解析 ----------------
+    def parse(self, sections, media_catalog):
+        """
+        依次调用五个题型解析器，返回 {题型键: {'items': [(qdict, media_refs), …], 'errors': [...]}}。
+        指定 workers 且题块足够多时改为多进程并行解析，合并后的结果与单进程相同。
+        提供 level_name 或 max_errors 时挂上流式校验器，边解析边累计各认定点的统计；
+        错误数达到 max_errors 时抛出 PipelineError，导入在写库前中止。
+        """
+        from validator.requirements_validator import ValidationAborted
+
+        on_item, on_error = self._hooks()
+        n_blocks = sum(len(sections.get(key, [])) for key in SECTION_NAMES)
+        try:
+            if self.workers and self.workers > 1 and n_blocks >= PARALLEL_MIN_BLOCKS:
+                parsed = self._parse_parallel(sections, n_blocks, on_item, on_error)
+            else:
+                parsed = self._parse_serial(sections, media_catalog, on_item, on_error)
+        except ValidationAborted as e:
+            self.artifacts['validate'] = e.report
+            raise PipelineError(str(e)) from e
+        self._report(
+            "parse", 1,
+            f"解析完成：成功 {sum(len(v['items']) for v in parsed.values())} 题，"
+            f"失败 {sum(len(v['errors']) for v in parsed.values())} 条"
+        )
+        self.artifacts['parse'] = parsed
+        return parsed
+
+    def _hooks(self):
+        """
+        组装解析阶段的校验钩子，返回 (on_item, on_error)；没有任何校验器时为 (None, None)。
+        提供 level_name 或 max_errors 时创建流式校验器（self.stream_validator）排在最前。
+        """
+        from validator.requirements_validator import StreamingValidator
+
+        hooks = list(self.validators)
+        if self.level_name or self.max_errors is not None:
+            self.stream_validator = StreamingValidator(self.level_name, self.max_errors)
+            hooks.insert(0, self.stream_validator)
+        if not hooks:
+            return None, None
+
+        def on_item(qdict):
+            for v in hooks:
+                v.on_item(qdict)
+
+        def on_error(msg):
+            for v in hooks:
+                v.on_error(msg)
+
+        return on_item, on_error
+
+    def _parse_serial(self, sections, media_catalog, on_item, on_error):
+        parsers = _section_parsers()
+        parsed = {}
+        for idx, (key, name) in enumerate(SECTION_NAMES.items()):
+            self._report("parse", idx / len(SECTION_NAMES), f"正在解析{name}…")
+            items, errors = parsers[key](
+                sections.get(key, []), self.level_id, media_catalog,
+                on_item=on_item, on_error=on_error
+            )
+            parsed[key] = {'items': items, 'errors': errors}
+        return parsed
+
+    def _parse_parallel(self, sections, n_blocks, on_item, on_error):
+        """
+        各题型按块切分后提交到进程池；按提交顺序（即文档顺序）取回结果、拼接，
+        并在主进程重放校验钩子。校验中止时取消尚未开始的任务。
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        size = min(max(n_blocks // (self.workers * 4), PARALLEL_CHUNK_MIN), PARALLEL_CHUNK_MAX)
+        parsed = {key: {'items': [], 'errors': []} for key in SECTION_NAMES}
+        self._report("parse", 0, f"正在并行解析（{self.workers} 个进程）…")
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = []
+            for key in SECTION_NAMES:
+                blocks = sections.get(key, [])
+                for start in range(0, len(blocks), size):
+                    chunk = blocks[start:start + size]
+                    fut = pool.submit(_parse_chunk, key, chunk, self.level_id, start)
+                    futures.append((key, len(chunk), fut))
+            done = 0
+            try:
+                for key, n, fut in futures:
+                    items, errors, order = fut.result()
+                    if on_item:
+                        _replay(items, errors, order, on_item, on_error)
+                    parsed[key]['items'] += items
+                    parsed[key]['errors'] += errors
+                    done += n
+                    self._report("parse", done / n_blocks,
+                                 f"正在解析{SECTION_NAMES[key]}… {done}/{n_blocks}")
+            except BaseException:
+                for _, _, fut in futures:
+                    fut.cancel()
+                raise
+        return parsed
+
+    # ---------------- 4. 校验 ----------------
+    def validate(self, parsed):
+        """
+        写库前按 EXPECT_COUNTS 对解析结果做题量校验（需提供 level_name），
+        返回结构化报告（见 validator.requirements_validator）；未提供 level_name 时返回 None。
+        解析阶段已挂流式校验器时直接取其累计结果，不再扫描题目。
+        """
+        from validator.requirements_validator import validate_items
+
+        self._report("validate", 0, "正在校验题量…")
+        report = None
+        if self.level_name and self.stream_validator:
+            report = self.stream_validator.finish()
+        elif self.level_name:
+            report = validate_items(
+                (qdict for key in SECTION_NAMES for qdict, _ in parsed[key]['items']),
+                self.level_name
+            )
+        n = len(report['issues']) if report else 0
+        self._report("validate", 1, f"校验完成：{n} 条问题")
+        self.artifacts['validate'] = report
+        return report
+
+    # ---------------- 5. 写库 ----------------
+    def persist(self, parsed, media_catalog):
+        """
+        写入题目与媒体。增量模式返回 sync 统计，否则返回写入的 question_id 列表。
+        """
+        items = [it for key in SECTION_NAMES for it in parsed[key]['items']]
+        self._report("persist", 0, "正在写入数据库…")
+
+        if self.incremental:
+            result = db.sync_level_questions(self.level_id, items, media_catalog)
+            message = (
+                f"增量导入：新增{result['inserted']}题，更新{result['updated']}题，"
+                f"删除{result['deleted']}题，未变{result['unchanged']}题"
+            )
+            if self.preview:
+                self.preview(message)
+            self._report("persist", 1, message)
+            self.artifacts['persist'] = result
+            return result
+
+        def on_batch(done, rows):
+            if self.preview:
+                for qid, qdict in rows:
+                    self.preview(f"题目 {qid}: {qdict.get('content_text', '')[:50]}")
+            self._report("persist", done / max(len(items), 1), f"已写入 {done}/{len(items)} 题")
+
+        skip = self._begin_journal("section")
+        qids = self._write(items[skip:], media_catalog, on_batch)
+        self._finish_journal()
+        self._collect_media(media_catalog)
+
+        self._report("persist", 1, self._persisted_message(qids))
+        self.artifacts['persist'] = qids
+        return qids
+
+    def _persisted_message(self, qids):
+        if self.resumed:
+            return f"写库完成：续传 {len(qids)} 题（跳过上次已写入的 {self.resumed} 题）"
+        return f"写库完成：共 {len(qids)} 题"
+
+    def _file_digest(self):
+        pre = self.artifacts.get('preprocess')
+        if pre and pre.get('digest'):
+            return pre['digest']
+        import preprocess_cache
+        return preprocess_cache.file_digest(self.file_path)
+
+    def _begin_journal(self, write_order, digest=None):
+        """
+        全新导入写库前查看导入日志：同一文件、同一写库顺序（section / document）的未完成导入
+        从断点续传，返回应跳过的已提交题数；其他未完成导入（文件已改动、换了导入方式）
+        先丢弃已写入的部分再从头导入。随后开始（或继续）记录本次导入。
+        """
+        self.journal = bool(self.checkpoint_size) and not self.incremental and not self.dry_run
+        self.resumed = 0
+        self.interrupted = False
+        if not self.journal:
+            return 0
+        digest = digest or self._file_digest()
+        journal = db.get_import_journal(self.level_id)
+        if journal and journal["stage"] != "done":
+            if journal["file_digest"] == digest and journal["write_order"] == write_order:
+                self.resumed = journal["committed"]
+                logging.info(
+                    f"[pipeline] 断点续传：上次已写入 {self.resumed} 题（{journal['updated_at']}），"
+                    f"从第 {self.resumed + 1} 题继续"
+                )
+                if self.preview:
+                    self.preview(f"断点续传：跳过已写入的 {self.resumed} 题")
+            else:
+                removed = db.discard_import(self.level_id)
+                logging.warning(
+                    f"[pipeline] 上次导入（{journal['file_path']}）未完成且无法续传，已删除其写入的 {removed} 题"
+                )
+            self.interrupted = True
+        if not self.resumed:
+            db.begin_import_journal(self.level_id, digest, self.file_path, write_order)
+        return self.resumed
+
+    def _finish_journal(self):
+        if self.journal:
+            db.finish_import_journal(self.level_id)
+
+    def _collect_media(self, media_catalog):
+        """
+        中断的导入可能留下没有题目引用的图片，续传 / 丢弃后回收。
+        放在写库完成之后：本次导入用到的图片此时已有引用，另外再排除本次媒体目录中的全部路径。
+        """
+        if self.interrupted and self.gc_media:
+            keep = [m['path'] for m in media_catalog.values() if m['type'] == 'image']
+            db.collect_orphan_images(keep=keep)
+
+    def _write(self, items, media_catalog, on_batch):
+        """
+        全新导入写库。不记日志时整个导入一个事务，失败整体回滚；
+        否则每 checkpoint_size 题一个事务，题目与日志的推进一起提交，
+        中断时只回滚最后一个未提交的检查点。on_batch 收到的 done 含续传跳过的题数。
+        items 可以是惰性迭代器（流水线模式下边解析边写）。
+        """
+        if not self.journal:
+            return db.bulk_insert_questions(
+                items, media_catalog, batch_size=self.batch_size,
+                on_batch=lambda done, rows: on_batch(self.resumed + done, rows)
+            )
+        qids = []
+        it = iter(items)
+        for first in it:
+            base = self.resumed + len(qids)
+            chunk = itertools.chain((first,), itertools.islice(it, self.checkpoint_size - 1))
+            with db.transaction():
+                ids = db.bulk_insert_questions(
+                    chunk, media_catalog, batch_size=self.batch_size,
+                    on_batch=lambda done, rows: on_batch(base + done, rows)
+                )
+                db.advance_import_journal(self.level_id, ids)
+            qids += ids
+        return qids
+
+    # ---------------- 串联 ----------------
+    def run(self):
+        """
+        执行全部阶段，返回写库汇总：
+          {题型键: {'count': n, 'errors': [...]}, …,
+           'report': 整级校验报告或 None, 'validation': [报告中的问题文本…], ('sync': {...})}
+        试运行时跳过写库，汇总另带 'dry_run': True，report 为本文件解析结果的校验报告。
+        """
+        pre = self.preprocess()
+        sections = self.segment(pre)
+        media_catalog = pre['media_catalog']
+        parsed = self.parse(sections, media_catalog)
+        self.validate(parsed)
+        if self.dry_run:
+            self._report("persist", 1, "试运行：未写入数据库")
+            return self._summary(parsed, None)
+        return self.commit(parsed, media_catalog)
+
+    def commit(self, parsed, media_catalog):
+        """
+        写库并返回汇总（run() 的最后一步）。解析可以在别处完成（例如批量导入时在子进程中），
+        再由唯一的写库方调用本方法；返回值同 run()。
+        """
+        persisted = self.persist(parsed, media_catalog)
+        return self._summary(parsed, persisted)
+
+    def _summary(self, parsed, persisted):
+        summary = {
+            key: {"count": len(parsed[key]['items']), "errors": parsed[key]['errors']}
+            for key in SECTION_NAMES
+        }
+        # 写库后对整个级别题库再校验一次（一条分组 SQL），库中原有题目也计算在内；
+        # 试运行未写库，报告取自 validate 阶段对本文件解析结果的校验
+        report = None
+        if self.dry_run:
+            report = self.artifacts.get('validate')
+        elif self.level_name:
+            from validator.requirements_validator import validate_level
+            report = validate_level(self.level_id, self.level_name)
+        summary["report"] = report
+        summary["validation"] = report["messages"] if report else []
+        if self.incremental and not self.dry_run:
+            summary["sync"] = persisted
+        if self.dry_run:
+            summary["dry_run"] = True
+        logging.info(
+            ("试运行完成：" if self.dry_run else "写库完成：") + " ".join(
+                f"{name}{summary[key]['count']}" for key, name in SECTION_NAMES.items()
+            )
+        )
+        return summary
+
+    # ---------------- 流水线模式 ----------------
+    def run_pipelined(self):
+        """
+        流水线模式：预处理 + 分段（读取线程）→ 解析（当前线程）→ 写库（写库线程），
+        阶段之间用有界队列连接，磁盘、CPU 与 SQLite I/O 重叠进行，
+        第一批题目在全文解析完之前就已写入并发出预览。
+        写库按检查点分批提交（见 _write）：解析中止（达到 max_errors）时丢弃已写入的部分，
+        其他错误（解析器异常、写库失败）保留已提交的检查点，重新导入同一文件时续传。
+        题目按文档顺序写入（run() 按题型顺序）；workers 在此模式下不生效。
+        增量模式需要完整的解析结果才能比对、试运行没有写库阶段，都自动改用 run()。返回值同 run()。
+        """
+        if self.incremental or self.dry_run:
+            logging.info("[pipeline] 增量导入 / 试运行不使用流水线模式，改为分阶段执行")
+            return self.run()
+
+        import preprocess_cache
+        from preprocessor import iter_document, stream_paragraphs
+        from utils import iter_question_blocks
+        from validator.requirements_validator import ValidationAborted
+
+        if not os.path.exists(self.file_path):
+            raise PipelineError(f"文件不存在: {self.file_path}")
+
+        self._report("preprocess", 0, "流水线导入：边读取、边解析、边写库…")
+        digest = cached = None
+        if self.use_cache or self.checkpoint_size:
+            digest = preprocess_cache.file_digest(self.file_path)
+        if self.use_cache:
+            cached = preprocess_cache.load(digest)
+        media_catalog = cached['media_catalog'] if cached else {}
+        skip = self._begin_journal("document", digest)
+
+        stop = threading.Event()      # 读取线程应退出（解析中止或写库失败）
+        blocks_q = queue.Queue(BLOCK_QUEUE_SIZE)
+        write_q = queue.Queue(WRITE_QUEUE_SIZE)
+        failures = []                 # 后台线程的异常
+        qids = []
+        written = [0]                 # 已写入题数（写库线程更新，解析线程汇报进度时读取）
+        position = [0.0]              # 读取进度（document.xml 已读比例），读取线程更新
+        total_blocks = [None]         # 题块总数，缓存命中时一开始即知，否则读取完才知道
+
+        def on_position(done, total):
+            position[0] = done / max(total, 1)
+
+        def reader():
+            try:
+                if cached:
+                    # 缓存按题型分组，按题块序号恢复文档顺序，写库顺序与未命中缓存时一致（续传依赖这一点）
+                    blocks = sorted(
+                        (b for key in SECTION_NAMES for b in cached['sections'].get(key, [])),
+                        key=lambda b: b.index
+                    )
+                    total_blocks[0] = len(blocks)
+                    for block in blocks:
+                        if not _put(blocks_q, block, stop):
+                            return
+                    _put(blocks_q, _END, stop)
+                    return
+                sink = [] if self.use_cache else None
+                sections = {key: [] for key in SECTION_NAMES}
+                paragraphs = stream_paragraphs(
+                    iter_document(self.file_path, on_position=on_position), media_catalog, sink=sink
+                )
+                for block in iter_question_blocks(paragraphs):
+                    sections[block.section].append(block)
+                    if not _put(blocks_q, block, stop):
+                        return
+                total_blocks[0] = sum(len(v) for v in sections.values())
+                _put(blocks_q, _END, stop)
+                if self.use_cache and any(sections.values()):
+                    preprocess_cache.store(digest, sink, media_catalog, sections)
+            except BaseException as e:
+                failures.append(e)
+                stop.set()
+
+        def on_batch(done, rows):
+            written[0] = done
+            if self.preview:
+                for qid, qdict in rows:
+                    self.preview(f"题目 {qid}: {qdict.get('content_text', '')[:50]}")
+
+        def queued_items():
+            while True:
+                it = write_q.get()
+                if it is _END:
+                    return
+                if it is _ABORT:
+                    raise _WriteAborted()
+                yield it
+
+        def writer():
+            try:
+                qids.extend(self._write(queued_items(), media_catalog, on_batch))
+            except _WriteAborted:
+                pass
+            except BaseException as e:
+                failures.append(e)
+                stop.set()
+            finally:
+                db.close_connection()
+
+        on_item, on_error = self._hooks()
+        parsers = _section_parsers()
+        parsed = {key: {'items': [], 'errors': []} for key in SECTION_NAMES}
+        seen = dict.fromkeys(SECTION_NAMES, 0)
+        threads = [threading.Thread(target=writer, name="import-writer", daemon=True),
+                   threading.Thread(target=reader, name="import-reader", daemon=True)]
+        for t in threads:
+            t.start()
+
+        aborted = None
+        completed = False             # 解析循环正常走完（任何异常、中断都不算）
+        n = 0
+        queued = 0                    # 本次放入写库队列的题数（不含续传跳过的）
+        try:
+            while True:
+                block = _get(blocks_q, stop)
+                if block is _END:
+                    break
+                key = block.section
+                items, errors = parsers[key](
+                    [block], self.level_id, media_catalog,
+                    on_item=on_item, on_error=on_error, offset=seen[key]
+                )
+                seen[key] += 1
+                parsed[key]['items'] += items
+                parsed[key]['errors'] += errors
+                for it in items:
+                    # 续传：前 skip 题已在上次导入中提交
+                    if skip:
+                        skip -= 1
+                        continue
+                    if not _put(write_q, it, stop):
+                        break
+                    queued += 1
+                if stop.is_set():
+                    break
+                n += 1
+                if n % PROGRESS_EVERY == 0:
+                    total = total_blocks[0]
+                    self._report(
+                        "stream", n / total if total else position[0],
+                        f"已解析 {n} 题，已写入 {written[0]} 题"
+                    )
+            completed = True
+        except ValidationAborted as e:
+            aborted = e
+            self.artifacts['validate'] = e.report
+        finally:
+            # 正常结束提交，否则（校验中止、解析线程上的任何异常、后台线程出错）让写库线程回滚；
+            # 随后通知读取线程退出
+            ok = completed and aborted is None and not failures and n > 0
+            end = _END if ok else _ABORT
+            while threads[0].is_alive():
+                try:
+                    write_q.put(end, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            # 等待写库线程写完队列中剩余的题目，期间汇报写库进度
+            last = None
+            while threads[0].is_alive():
+                threads[0].join(0.2)
+                done = written[0] - self.resumed
+                if ok and queued and done != last:
+                    last = done
+                    self._report("persist", done / queued, f"已写入 {written[0]} 题")
+            if not ok:
+                stop.set()
+            threads[1].join()
+            if not ok and self.journal:
+                if aborted is not None or n == 0:
+                    # 文档未通过校验 / 没有题目：与不分批提交时一样，不在库中留下任何题目
+                    db.discard_import(self.level_id)
+                else:
+                    logging.warning("[pipeline] 导入中断：已提交的检查点保留，重新导入同一文件时从断点续传")
+
+        if failures:
+            raise failures[0]
+        if aborted is not None:
+            raise PipelineError(str(aborted)) from aborted
+        if n == 0:
+            raise PipelineError("未识别到题目，请检查文档中的 [T] 题头")
+        # 解析循环与写库都已完整结束，才把导入日志标记为完成
+        self._finish_journal()
+
+        self.artifacts['preprocess'] = {
+            'digest': digest, 'paragraphs': None, 'media_catalog': media_catalog,
+            'sections': None, 'cached': bool(cached),
+        }
+        self.artifacts['parse'] = parsed
+        self.artifacts['validate'] = self.stream_validator.finish() if self.level_name else None
+        self.artifacts['persist'] = qids
+        self._collect_media(media_catalog)
+        self._report("persist", 1, self._persisted_message(qids))
+        return self._summary(parsed, qids)
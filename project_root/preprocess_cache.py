@@ -0,0 +1,125 @@
+# preprocess_cache.py
+
+import os
+import gzip
+import json
+import hashlib
+import logging
+
+from parser.lexer import QuestionBlock
+
+# 预处理 / 分段逻辑有变动时递增，旧缓存自动失效
+PREPROCESSOR_VERSION = 2
+
+CACHE_DIR = os.path.join("cache", "preprocess")
+# 缓存目录总大小上限（字节），超出后按最近使用时间淘汰（LRU）
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    分块计算文件内容的 sha256，作为缓存键。
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_path(digest):
+    return os.path.join(CACHE_DIR, f"{digest}.v{PREPROCESSOR_VERSION}.json.gz")
+
+
+def load(digest):
+    """
+    读取缓存，命中时返回：
+      {'paragraphs': [...], 'media_catalog': {temp_id: 媒体元数据},
+       'sections': {题型键: [QuestionBlock, …]}}
+    未命中、版本不符或引用的图片文件已被清理时返回 None。
+    """
+    path = _cache_path(digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"[cache] 缓存损坏，忽略：{path} {e}")
+        return None
+    if data.get("version") != PREPROCESSOR_VERSION:
+        return None
+
+    media_catalog = {m['temp_id']: m for m in data.get("media", [])}
+    for m in media_catalog.values():
+        if m['type'] != 'image':
+            continue
+        # 顺带刷新图片的修改时间：本次导入要引用它们，无引用图片的回收按闲置时间判断，不会误删
+        try:
+            os.utime(m['path'])
+        except OSError:
+            logging.info(f"[cache] 图片已不存在，缓存作废：{m['path']}")
+            return None
+
+    # 更新访问时间，供 LRU 淘汰参考
+    os.utime(path, None)
+    logging.info(f"[cache] 命中预处理缓存：{digest}")
+    return {
+        'paragraphs':    data.get("paragraphs", []),
+        'media_catalog': media_catalog,
+        'sections':      {
+            key: [QuestionBlock.from_list(b) for b in blocks]
+            for key, blocks in data.get("sections", {}).items()
+        },
+    }
+
+
+def store(digest, paragraphs, media_catalog, sections, max_bytes=CACHE_MAX_BYTES):
+    """
+    以紧凑 JSON + gzip 写入缓存（先写临时文件再原子替换），随后按大小上限淘汰旧缓存。
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(digest)
+    payload = {
+        "version":    PREPROCESSOR_VERSION,
+        "paragraphs": list(paragraphs),
+        "media":      list(media_catalog.values()),
+        "sections":   {key: [b.to_list() for b in blocks] for key, blocks in sections.items()},
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    logging.info(f"[cache] 写入预处理缓存：{path}")
+    evict(max_bytes)
+
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    """
+    缓存目录超出 max_bytes 时，按最近使用时间从旧到新删除，返回删除的文件数。
+    """
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        logging.info(f"[cache] LRU 淘汰 {removed} 个缓存文件")
+    return removed
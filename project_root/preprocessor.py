@@ -1,10 +1,14 @@
 # preprocessor.py
 
+import itertools
 import os
 import logging
+import posixpath
+import zipfile
 from docx import Document
 from docx.oxml.ns import qn
 from lxml import etree
+from media_store import IMAGE_DIR, image_path_for, store_image
 
 # 初始化日志
 log_file = os.path.join("logs", "preprocessor.log")
@@ -17,100 +21,225 @@ logging.basicConfig(
     encoding="utf-8"
 )
 
-def preprocess_document(input_path):
+_DOC_XML  = "word/document.xml"
+_RELS_XML = "word/_rels/document.xml.rels"
+_REL_NS   = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_W_P      = qn('w:p')
+_W_BODY   = qn('w:body')
+_M_OMATH  = qn('m:oMath')
+_A_BLIP   = qn('a:blip')
+_R_EMBED  = qn('r:embed')
+
+
+def _render_paragraph(p, load_image, ids, store=store_image):
+    """
+    按文档顺序遍历单个 w:p 的 XML 节点，拼接带占位符的段落文本。
+    遇到图片 / 公式时立即分配 temp_id，先产出 ('media', 记录)，
+    占位符同时写入文本，因此公式与 [MATH_n] 一一对应，无需二次匹配；
+    段落非空时最后产出 ('paragraph', 文本)。
+
+    load_image(rel_id) -> (blob, ext) 或 None
+    ids：temp_id 计数器（itertools.count），整篇文档共用
+    store(blob, ext) -> 路径：图片落盘函数；只需路径、不写盘时传 image_path_for
+    """
+    parts = []
+    for child in p.iter():
+        tag = child.tag.lower() if isinstance(child.tag, str) else ""
+        # 文本节点（含公式内的 m:t）
+        if tag.endswith("}t") and child.text:
+            parts.append(child.text)
+        # 换行
+        elif tag.endswith("}br"):
+            parts.append("\n")
+        # 图片占位：检测 drawing 中的 <a:blip> 嵌入关系
+        elif child.tag == _A_BLIP:
+            image = load_image(child.get(_R_EMBED))
+            if image is None:
+                continue
+            blob, ext = image
+            temp_id = next(ids)
+            # 内容寻址存储：同一张图片无论出现多少次只落盘一次
+            img_path = store(blob, ext or ".png")
+            logging.info(f"[preprocessor] 提取图片 temp_id={temp_id}, path={img_path}")
+            yield 'media', {'temp_id': temp_id, 'type': 'image', 'path': img_path}
+            parts.append(f"[IMAGE_{temp_id}]")
+        # 公式：记录与占位符同时生成
+        elif child.tag == _M_OMATH:
+            temp_id = next(ids)
+            mathml = etree.tostring(child, encoding="unicode")
+            logging.info(f"[preprocessor] 提取公式 temp_id={temp_id}")
+            yield 'media', {'temp_id': temp_id, 'type': 'mathml', 'content': mathml}
+            parts.append(f"[MATH_{temp_id}]")
+        # 制表符
+        elif tag.endswith("}tab"):
+            parts.append("\t")
+
+    paragraph_text = "".join(parts).strip()
+    if paragraph_text:
+        yield 'paragraph', paragraph_text
+
+
+def _iter_body_paragraphs(parent):
+    """
+    按文档顺序产出 parent 下所有“顶层”段落：包括表格单元格、内容控件里的段落，
+    但不深入段落内部（文本框里的段落随外层段落一起渲染）。
+    """
+    for child in parent:
+        if child.tag == _W_P:
+            yield child
+        else:
+            yield from _iter_body_paragraphs(child)
+
+
+def preprocess_document(input_path, write_media=True):
     """
     读取 input_path 指定的 docx 文档，
-    按段落提取图片和公式，并在段落文本中插入占位符 [IMAGE_id] / [MATH_id]，
+    按文档顺序（含表格）单遍遍历正文，提取图片和公式，
+    并在段落文本中插入占位符 [IMAGE_id] / [MATH_id]，temp_id 按出现顺序分配，
     返回：
       {
-        'paragraphs': ['段落1文本…[IMAGE_1]…', …],
+        'paragraphs': ['段落1文本…[MATH_1]…', …],
         'media': [
-          {'temp_id':1, 'type':'image', 'path':'media/images/img_1.png'},
-          {'temp_id':2, 'type':'mathml', 'content':'<m:oMath>…</m:oMath>'},
+          {'temp_id':1, 'type':'mathml', 'content':'<m:oMath>…</m:oMath>'},
+          {'temp_id':2, 'type':'image', 'path':'media/images/<sha256>.png'},
           …
         ]
       }
+    write_media=False 时只计算图片路径、不写入媒体库（用于预检等只读场景）。
     """
     if not os.path.exists(input_path):
         logging.error(f"预处理：文件不存在: {input_path}")
         return {'paragraphs': [], 'media': []}
 
     doc = Document(input_path)
-    media = []
-    temp_id = 1
-
-    # 准备 media/images 目录
-    image_dir = os.path.join("media", "images")
-    os.makedirs(image_dir, exist_ok=True)
-
-    # 先提取所有 MathML 公式到 media（与原逻辑一致）
-    body = doc.element.body
-    for oMath in body.iterfind(f".//{qn('m:oMath')}"):
-        mathml = etree.tostring(oMath, encoding="unicode")
-        media.append({
-            'temp_id': temp_id,
-            'type': 'mathml',
-            'content': mathml
-        })
-        logging.info(f"[preprocessor] 提取公式 temp_id={temp_id}")
-        temp_id += 1
-
-    # 构建带占位符的段落列表
-    paragraphs = []
-    for para in doc.paragraphs:
-        parts = []
-        # 遍历段落 XML 节点
-        for child in para._element.iter():
-            tag = child.tag.lower()
-            # 文本节点
-            if tag.endswith("}t") and child.text:
-                parts.append(child.text)
-            # 换行
-            elif tag.endswith("}br"):
-                parts.append("\n")
-            # 图片占位：检测 drawing 中的 <a:blip> 嵌入关系
-            elif child.tag == qn('a:blip'):
-                # 获取 relationship id
-                rel_id = child.get(qn('r:embed'))
-                if rel_id and rel_id in doc.part.rels:
-                    rel = doc.part.rels[rel_id]
-                    blob = rel.target_part.blob
-                    # 根据 partname 获取扩展名
-                    ext = os.path.splitext(rel.target_part.partname)[1] or ".png"
-                    img_name = f"img_{temp_id}{ext}"
-                    img_path = os.path.join(image_dir, img_name)
-                    # 写入文件
-                    with open(img_path, "wb") as f:
-                        f.write(blob)
-                    media.append({
-                        'temp_id': temp_id,
-                        'type': 'image',
-                        'path': img_path
-                    })
-                    logging.info(f"[preprocessor] 提取图片 temp_id={temp_id}, path={img_path}")
-                    # 在文本中插入占位符
-                    parts.append(f"[IMAGE_{temp_id}]")
-                    temp_id += 1
-            # 公式占位符（如果有其它 MathML 场景）
-            elif tag.endswith("}omath"):
-                # 找到尚未用到的 mathml
-                unused = [m for m in media if m['type']=='mathml' and 'used' not in m]
-                if unused:
-                    m = unused[0]
-                    parts.append(f"[MATH_{m['temp_id']}]")
-                    m['used'] = True
-            # 制表符
-            elif tag.endswith("}tab"):
-                parts.append("\t")
-
-        paragraph_text = "".join(parts).strip()
-        if paragraph_text:
-            paragraphs.append(paragraph_text)
+    rels = doc.part.rels
+    store = store_image if write_media else image_path_for
+    if write_media:
+        os.makedirs(IMAGE_DIR, exist_ok=True)
+
+    def load_image(rel_id):
+        rel = rels.get(rel_id) if rel_id else None
+        if rel is None or rel.is_external:
+            return None
+        return rel.target_part.blob, os.path.splitext(rel.target_part.partname)[1]
+
+    paragraphs, media = [], []
+    ids = itertools.count(1)
+    for p in _iter_body_paragraphs(doc.element.body):
+        for kind, payload in _render_paragraph(p, load_image, ids, store):
+            if kind == 'media':
+                media.append(payload)
+            else:
+                paragraphs.append(payload)
 
     logging.info(f"预处理：生成 {len(paragraphs)} 个带占位符段落，提取媒体 {len(media)} 条")
     return {'paragraphs': paragraphs, 'media': media}
 
 
+# ---------------- 流式预处理 ----------------
+
+def _read_image_rels(zf):
+    """
+    读取 document.xml.rels，返回 {rId: zip 内部件路径}，只保留内嵌（非外链）关系。
+    """
+    if _RELS_XML not in zf.namelist():
+        return {}
+    rels = {}
+    root = etree.fromstring(zf.read(_RELS_XML))
+    for rel in root.iter(f"{_REL_NS}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            part = target.lstrip("/")
+        else:
+            part = posixpath.normpath(posixpath.join("word", target))
+        rels[rel.get("Id")] = part
+    return rels
+
+
+def iter_document(input_path, write_media=True, on_position=None):
+    """
+    流式预处理：把 .docx 当作 zip 打开，用 lxml iterparse 逐段解析 word/document.xml，
+    处理完的元素立即清理，不构建 python-docx Document，内存占用与文档大小无关。
+
+    按文档顺序逐条产出事件：
+      ('media', {'temp_id':1, 'type':'mathml', 'content':'<m:oMath>…</m:oMath>'})
+      ('media', {'temp_id':2, 'type':'image', 'path':'media/images/<sha256>.png'})
+      ('paragraph', '段落文本…[MATH_1]…[IMAGE_2]…')
+    同一段落内的媒体事件总是先于该段落产出，段落内容与 preprocess_document 一致。
+    write_media=False 时只计算图片路径、不写入媒体库（用于预检等只读场景）。
+    on_position(已读字节, 总字节)：每处理完一个段落回调 document.xml 的读取位置，用于汇报进度。
+    """
+    if not os.path.exists(input_path):
+        logging.error(f"流式预处理：文件不存在: {input_path}")
+        return
+
+    store = store_image if write_media else image_path_for
+    if write_media:
+        os.makedirs(IMAGE_DIR, exist_ok=True)
+
+    ids = itertools.count(1)
+    n_paras = n_media = 0
+    with zipfile.ZipFile(input_path) as zf:
+        rels = _read_image_rels(zf)
+        names = set(zf.namelist())
+
+        def load_image(rel_id):
+            part = rels.get(rel_id)
+            if not part or part not in names:
+                return None
+            return zf.read(part), os.path.splitext(part)[1]
+
+        body = None
+        depth = 0  # 当前所处 w:p 的嵌套层数（文本框内的段落属于外层段落）
+
+        total = zf.getinfo(_DOC_XML).file_size
+        with zf.open(_DOC_XML) as fp:
+            for event, elem in etree.iterparse(fp, events=("start", "end")):
+                if event == "start":
+                    if elem.tag == _W_P:
+                        depth += 1
+                    elif elem.tag == _W_BODY:
+                        body = elem
+                    continue
+
+                if elem.tag == _W_P:
+                    depth -= 1
+                    if depth == 0:
+                        for kind, payload in _render_paragraph(elem, load_image, ids, store):
+                            if kind == 'media':
+                                n_media += 1
+                            else:
+                                n_paras += 1
+                            yield kind, payload
+                        if on_position:
+                            on_position(fp.tell(), total)
+
+                # 释放已处理完的 body 直接子元素（段落、表格等），保持内存平稳
+                if body is not None and elem.getparent() is body:
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del body[0]
+
+    logging.info(f"流式预处理：产出 {n_paras} 个带占位符段落，提取媒体 {n_media} 条")
+
+
+def stream_paragraphs(events, media_catalog, sink=None):
+    """
+    拆分 iter_document 的事件流：媒体记录登记到 media_catalog（temp_id → 元数据），
+    只把段落文本继续往下游产出，可直接交给 utils.process_docx_from_paragraphs。
+    sink：可选列表，顺带收集产出的段落（供预处理缓存使用）。
+    """
+    for kind, payload in events:
+        if kind == 'media':
+            media_catalog[payload['temp_id']] = payload
+        else:
+            if sink is not None:
+                sink.append(payload)
+            yield payload
+
+
 if __name__ == "__main__":
     result = preprocess_document("test_questions.docx")
     print(f"段落数量：{len(result['paragraphs'])}, 媒体数量：{len(result['media'])}")
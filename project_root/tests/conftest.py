@@ -0,0 +1,67 @@
+# tests/conftest.py
+
+import io
+import os
+import sys
+import zlib
+import struct
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database.db_manager as db  # noqa: E402
+
+
+def _png(color):
+    raw = b''.join(b'\x00' + bytes(color) * 2 for _ in range(2))
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', 2, 2, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def build_bank(path, n_codes=3):
+    """
+    生成测试题库：每个认定点依次为 2 道单选、1 道多选、1 道判断（题型交错，文档顺序与题型顺序不同），
+    每个认定点的多选题带一张各不相同的图片。共 n_codes * 4 题，题干互不相同。
+    """
+    from docx import Document
+    from docx.shared import Mm
+
+    doc = Document()
+    k = 1
+    for i in range(n_codes):
+        code = f"BG{i:03d}"
+        for j in range(2):
+            doc.add_paragraph(f"{k}.[T]{code} 5 1 5")
+            doc.add_paragraph(f"单选题干{i}-{j}")
+            doc.add_paragraph("A.选项一\tB.选项二")
+            doc.add_paragraph("C.选项三\tD.选项四[T/]")
+            doc.add_paragraph("[D]A[D/]")
+            k += 1
+        doc.add_paragraph(f"{k}.[T]{code} 5 2 5")
+        p = doc.add_paragraph(f"多选题干{i}")
+        p.add_run().add_picture(io.BytesIO(_png((i % 256, 0, 0))), width=Mm(5))
+        doc.add_paragraph("A.甲\tB.乙\tC.丙\tD.丁[T/]")
+        doc.add_paragraph("[D]AB[D/]")
+        k += 1
+        doc.add_paragraph(f"{k}.[T]{code} 5 3 5")
+        doc.add_paragraph(f"判断题干{i}[T/]")
+        doc.add_paragraph("[D]√[D/]")
+        k += 1
+    doc.save(path)
+    return path
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """在临时目录中使用独立的 questions.db、媒体库与预处理缓存。"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "questions.db"))
+    db.init_db()
+    yield tmp_path
+    db.close_connection()
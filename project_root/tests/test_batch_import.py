@@ -0,0 +1,21 @@
+# tests/test_batch_import.py
+
+import database.db_manager as db
+from batch_import import import_batch
+from conftest import build_bank
+
+
+def test_incremental_refuses_several_files_for_one_level(workdir):
+    build_bank("a.docx", n_codes=2)
+    build_bank("b.docx", n_codes=3)
+    build_bank("c.docx", n_codes=1)
+    tasks = [
+        {"file": "a.docx", "job": "电工", "level": "高级工"},
+        {"file": "b.docx", "job": "电工", "level": "高级工"},
+        {"file": "c.docx", "job": "电工", "level": "技师"},
+    ]
+    summary = import_batch(tasks, workers=1, on_existing="incremental")
+
+    status = {e["file"]: e["status"] for e in summary["files"]}
+    assert status == {"a.docx": "failed", "b.docx": "failed", "c.docx": "imported"}
+    assert db.count_questions(db.get_level_id(db.get_job_id("电工"), "高级工")) == 0
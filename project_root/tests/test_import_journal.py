@@ -0,0 +1,139 @@
+# tests/test_import_journal.py
+
+import os
+import time
+from collections import Counter
+
+import pytest
+
+import database.db_manager as db
+from pipeline import ImportPipeline
+from conftest import build_bank
+
+
+def _questions(level_id):
+    return [tuple(row) for row in db.get_connection().execute(
+        "SELECT question_type, recognition_code, content_text FROM questions "
+        "WHERE level_id = ? ORDER BY id", (level_id,)
+    )]
+
+
+def _crash_after(monkeypatch, n_batches):
+    """第 n_batches 个检查点之后的写入抛出异常，模拟导入中途崩溃。"""
+    orig = db.bulk_insert_questions
+    calls = [0]
+
+    def failing(*args, **kwargs):
+        calls[0] += 1
+        if calls[0] > n_batches:
+            raise RuntimeError("模拟崩溃")
+        return orig(*args, **kwargs)
+
+    monkeypatch.setattr(db, "bulk_insert_questions", failing)
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+@pytest.mark.parametrize("mode", ["run", "run_pipelined"])
+def test_resume_writes_every_question_once(workdir, monkeypatch, mode, use_cache):
+    path = build_bank("bank.docx", n_codes=4)
+    job_id = db.get_job_id("测试")
+    ref_level = db.get_level_id(job_id, "初级工")
+    level_id = db.get_level_id(job_id, "高级工")
+
+    # 参照导入（use_cache 时顺带写入预处理缓存，续传时命中缓存）
+    getattr(ImportPipeline(path, ref_level, use_cache=use_cache), mode)()
+    expected = _questions(ref_level)
+
+    with monkeypatch.context() as m:
+        _crash_after(m, 1)
+        with pytest.raises(RuntimeError):
+            getattr(ImportPipeline(path, level_id, use_cache=use_cache, checkpoint_size=5), mode)()
+    journal = db.get_import_journal(level_id)
+    assert journal["stage"] == "persist" and journal["committed"] == 5
+
+    pipeline = ImportPipeline(path, level_id, use_cache=use_cache, checkpoint_size=5)
+    getattr(pipeline, mode)()
+    assert pipeline.resumed == 5
+    assert db.get_import_journal(level_id)["stage"] == "done"
+
+    got = _questions(level_id)
+    assert all(n == 1 for n in Counter(got).values())
+    assert got == expected
+
+
+class _FailingHook:
+    """第 fail_at 题时抛出异常的校验钩子，模拟解析阶段崩溃。"""
+
+    def __init__(self, fail_at):
+        self.fail_at = fail_at
+        self.n = 0
+
+    def on_item(self, qdict):
+        self.n += 1
+        if self.n == self.fail_at:
+            raise RuntimeError("解析崩溃")
+
+    def on_error(self, msg):
+        pass
+
+
+def test_parse_crash_keeps_journal_open_and_resumes(workdir):
+    path = build_bank("bank.docx", n_codes=4)
+    job_id = db.get_job_id("测试")
+    ref_level = db.get_level_id(job_id, "初级工")
+    level_id = db.get_level_id(job_id, "高级工")
+    ImportPipeline(path, ref_level).run_pipelined()
+    expected = _questions(ref_level)
+
+    pipeline = ImportPipeline(path, level_id, checkpoint_size=5, batch_size=1,
+                              validators=[_FailingHook(12)])
+    with pytest.raises(RuntimeError):
+        pipeline.run_pipelined()
+    journal = db.get_import_journal(level_id)
+    assert journal["stage"] == "persist"
+    assert db.count_questions(level_id) == journal["committed"] < len(expected)
+
+    ImportPipeline(path, level_id, checkpoint_size=5).run_pipelined()
+    assert db.get_import_journal(level_id)["stage"] == "done"
+    assert _questions(level_id) == expected
+
+
+def test_resume_keeps_images_of_uncommitted_questions(workdir, monkeypatch):
+    path = build_bank("bank.docx", n_codes=3)
+    level_id = db.get_level_id(db.get_job_id("测试"), "高级工")
+
+    # 第一个检查点之前崩溃：图片已写入媒体库，但还没有任何题目引用
+    with monkeypatch.context() as m:
+        _crash_after(m, 0)
+        with pytest.raises(RuntimeError):
+            ImportPipeline(path, level_id, checkpoint_size=5).run()
+    hour_ago = time.time() - 3600
+    for name in os.listdir(os.path.join("media", "images")):
+        os.utime(os.path.join("media", "images", name), (hour_ago, hour_ago))
+
+    ImportPipeline(path, level_id, checkpoint_size=5).run()
+    paths = [row[0] for row in db.get_connection().execute("SELECT image_path FROM question_images")]
+    assert len(paths) == 3
+    assert all(os.path.exists(p) for p in paths)
+
+
+def test_collect_orphan_images_skips_referenced_and_recent(workdir):
+    path = build_bank("bank.docx", n_codes=2)
+    level_id = db.get_level_id(db.get_job_id("测试"), "高级工")
+    ImportPipeline(path, level_id).run()
+
+    orphan = os.path.join("media", "images", "0" * 64 + ".png")
+    recent = os.path.join("media", "images", "1" * 64 + ".png")
+    for p in (orphan, recent):
+        with open(p, "wb") as f:
+            f.write(b"x")
+    hour_ago = time.time() - 3600
+    os.utime(orphan, (hour_ago, hour_ago))
+    for name in os.listdir(os.path.join("media", "images")):
+        if name != os.path.basename(recent):
+            os.utime(os.path.join("media", "images", name), (hour_ago, hour_ago))
+
+    assert db.collect_orphan_images() == 1
+    assert not os.path.exists(orphan) and os.path.exists(recent)
+    paths = [row[0] for row in db.get_connection().execute("SELECT image_path FROM question_images")]
+    assert all(os.path.exists(p) for p in paths)
@@ -0,0 +1,49 @@
+# tests/test_pipelined.py
+
+import pytest
+
+import database.db_manager as db
+from pipeline import ImportPipeline
+from conftest import build_bank
+
+
+class _FailingHook:
+    """第 fail_at 题时抛出异常的校验钩子，模拟解析线程上的任意错误。"""
+
+    def __init__(self, fail_at):
+        self.fail_at = fail_at
+        self.n = 0
+
+    def on_item(self, qdict):
+        self.n += 1
+        if self.n == self.fail_at:
+            raise RuntimeError("钩子出错")
+
+    def on_error(self, msg):
+        pass
+
+
+def test_hook_error_rolls_back_pipelined_import(workdir):
+    path = build_bank("bank.docx", n_codes=4)
+    level_id = db.get_level_id(db.get_job_id("测试"), "高级工")
+
+    pipeline = ImportPipeline(path, level_id, checkpoint_size=None, validators=[_FailingHook(7)])
+    with pytest.raises(RuntimeError):
+        pipeline.run_pipelined()
+    assert db.count_questions(level_id) == 0
+
+
+def test_pipelined_import_uses_document_order(workdir):
+    path = build_bank("bank.docx", n_codes=2)
+    job_id = db.get_job_id("测试")
+    for level in ("初级工", "中级工"):   # 第二次命中预处理缓存
+        ImportPipeline(path, db.get_level_id(job_id, level)).run_pipelined()
+    orders = [
+        [row[0] for row in db.get_connection().execute(
+            "SELECT content_text FROM questions WHERE level_id = ? ORDER BY id",
+            (db.get_level_id(job_id, level),)
+        )]
+        for level in ("初级工", "中级工")
+    ]
+    assert orders[0] == orders[1]
+    assert [t.split("题干")[0] for t in orders[0][:4]] == ["单选", "单选", "多选", "判断"]
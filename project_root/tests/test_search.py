@@ -0,0 +1,15 @@
+# tests/test_search.py
+
+import database.db_manager as db
+from pipeline import ImportPipeline
+from conftest import build_bank
+
+
+def test_empty_type_filter_matches_nothing_in_search_and_browse(workdir):
+    level_id = db.get_level_id(db.get_job_id("测试"), "高级工")
+    ImportPipeline(build_bank("bank.docx", n_codes=2), level_id).run()
+
+    assert db.search_question_ids("题干", level_id, types=[]) == []
+    assert db.fetch_question_ids(level_id, types=[]) == []
+    assert len(db.search_question_ids("题干", level_id, types=None)) == 8
+    assert len(db.search_question_ids("题干", level_id, types=["判断"])) == 2
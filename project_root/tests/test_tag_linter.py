@@ -0,0 +1,16 @@
+# tests/test_tag_linter.py
+
+import pytest
+
+from validator.tag_linter import lint_document, lint_paragraphs
+
+
+def test_missing_file_raises(workdir):
+    with pytest.raises(FileNotFoundError):
+        lint_document("nonexist.docx")
+
+
+def test_document_without_headers_is_an_issue():
+    issues, n_paras, n_blocks = lint_paragraphs(["试题说明", "没有题头的段落"])
+    assert (n_paras, n_blocks) == (2, 0)
+    assert [issue["kind"] for issue in issues] == ["header"]
@@ -1,25 +1,34 @@
 # ui_app/checkable_list_widget.py
 
-from PyQt6.QtWidgets import QListWidget, QListWidgetItem
+from PyQt6.QtWidgets import QListView
 from PyQt6.QtCore import Qt
 
-class CheckableListWidget(QListWidget):
+class CheckableListView(QListView):
+    """
+    可“刷选”的勾选列表：按下切换一项，按住拖动把经过的项设为同一状态。
+    勾选状态通过 model().setData(..., CheckStateRole) 写回模型（见 QuestionListModel）。
+    """
     def __init__(self, parent=None):
         super().__init__(parent)
         # 禁用原生的行选中高亮
-        self.setSelectionMode(QListWidget.SelectionMode.NoSelection)
+        self.setSelectionMode(QListView.SelectionMode.NoSelection)
+        # 行高一致，滚动时无需逐行测量
+        self.setUniformItemSizes(True)
         # 打开拖拽时的自动滚动
         self.setAutoScroll(True)
         # 当前正在“刷”向的状态：Qt.Checked / Qt.Unchecked / None
         self._painting_state = None
 
+    def _set_state(self, index, state):
+        self.model().setData(index, state, Qt.ItemDataRole.CheckStateRole)
+
     def mousePressEvent(self, event):
-        item = self.itemAt(event.pos())
-        if isinstance(item, QListWidgetItem):
+        index = self.indexAt(event.pos())
+        if index.isValid():
             # 先读取之前的状态，再切换到相反状态
-            prev = item.checkState()
+            prev = index.data(Qt.ItemDataRole.CheckStateRole)
             new_state = Qt.CheckState.Unchecked if prev == Qt.CheckState.Checked else Qt.CheckState.Checked
-            item.setCheckState(new_state)
+            self._set_state(index, new_state)
             # 记录下来，后续拖拽时都按这个状态来
             self._painting_state = new_state
             # 阻止基类再次切换
@@ -31,9 +40,9 @@ class CheckableListWidget(QListWidget):
     def mouseMoveEvent(self, event):
         if self._painting_state is not None:
             # 拖动时，如果在某个 item 上，就把它设为同样的勾选状态
-            item = self.itemAt(event.pos())
-            if isinstance(item, QListWidgetItem):
-                item.setCheckState(self._painting_state)
+            index = self.indexAt(event.pos())
+            if index.isValid():
+                self._set_state(index, self._painting_state)
 
             # 自动滚动：当鼠标接近顶部/底部时，滚动列表
             margin = 20
@@ -1,26 +1,31 @@
 import sys
 import os
 import logging
-from collections import defaultdict
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QLineEdit, QComboBox,
-    QPushButton, QTextEdit, QListWidgetItem, QFileDialog,
+    QPushButton, QTextEdit, QFileDialog,
     QVBoxLayout, QHBoxLayout, QTabWidget, QMessageBox,
     QProgressBar, QCheckBox, QFormLayout
 )
-from PyQt6.QtCore import Qt, QThread, QTimer
+from PyQt6.QtCore import QThread, QTimer
 from ui_utils import apply_dark_theme, apply_light_theme
 
 from config.requirements import EXPECT_COUNTS
+from preprocess_cache import file_digest
 from database.db_manager import (
     init_db, get_job_id, get_level_id,
     has_questions, count_questions, delete_questions_by_level,
-    fetch_questions_by_level, fetch_jobs
+    get_import_journal, discard_import,
+    fetch_jobs, search_questions,
+    search_question_ids, count_search_results,
+    fetch_question_page, fetch_question_ids, count_questions_by_type
 )
 from ui_app.worker import ParseWorker
 from ui_app.worker_export import ExportWorker
 from ui_app.preview_widget import PreviewWidget
-from ui_app.checkable_list_widget import CheckableListWidget
+from ui_app.checkable_list_widget import CheckableListView
+from ui_app.question_list_model import QuestionListModel
+from validator.tag_linter import lint_document
 
 # 确保 templates 目录存在
 os.makedirs("templates", exist_ok=True)
@@ -46,10 +51,7 @@ class MainWindow(QMainWindow):
         self.current_level_text = ""
         self.current_level_id = None
 
-        # 进度条假计时器 & 色相计时器
-        self.fake_timer = QTimer(self)
-        self.fake_timer.setInterval(150)
-        self.fake_timer.timeout.connect(self._on_fake_tick)
+        # 进度条色相计时器
         self.hue_timer = QTimer(self)
         self.hue_timer.setInterval(50)
         self.hue_timer.timeout.connect(self._on_hue_tick)
@@ -111,6 +113,15 @@ class MainWindow(QMainWindow):
         r2.addWidget(self.file_label)
         r2.addStretch()
 
+        lint_btn = QPushButton("检查标签")
+        lint_btn.setFixedHeight(32)
+        lint_btn.clicked.connect(self.lint_file)
+        r2.addWidget(lint_btn)
+
+        self.dry_run_cb = QCheckBox("试运行")
+        self.dry_run_cb.setToolTip("只解析并校验，不写图片、不写数据库")
+        r2.addWidget(self.dry_run_cb)
+
         parse_btn = QPushButton("开始解析")
         parse_btn.setFixedHeight(32)
         parse_btn.clicked.connect(self.start_parsing)
@@ -159,16 +170,43 @@ class MainWindow(QMainWindow):
             self.file_label.setText(os.path.basename(path))
             self.log_output.append(f"[INFO] 已选择文件：{path}")
 
+    def lint_file(self):
+        """
+        导入前预检：一次线性扫描检查标签配对、题头、选项与答案格式，不写数据库。
+        """
+        if not getattr(self, 'selected_file', None):
+            self.log_output.append("[ERROR] 未选择文件")
+            return
+        try:
+            rep = lint_document(self.selected_file)
+        except Exception as e:
+            self.log_output.append(f"[ERROR] 预检失败：{e}")
+            return
+        self.log_output.append(
+            f"[INFO] 预检完成：{rep['paragraphs']} 段，{rep['blocks']} 题，"
+            f"{len(rep['issues'])} 处问题（{rep['elapsed']:.2f}s）"
+        )
+        for issue in rep["issues"]:
+            self.log_output.append(f"[WARN] {issue['message']}")
+
     def start_parsing(self):
         if not getattr(self, 'selected_file', None):
             self.log_output.append("[ERROR] 未选择文件")
             return
 
+        lvl = self.level_combo.currentText().strip()
+        if self.dry_run_cb.isChecked():
+            # 试运行不需要工种、不检查已有题库，只解析并按所选级别校验
+            self.tabs.setEnabled(False)
+            self.hue_timer.start()
+            self.log_output.append(f"[INFO] 试运行：按 {lvl} 标准解析并校验，不写入数据库")
+            self._start_worker(ParseWorker(self.selected_file, None, level_name=lvl, dry_run=True))
+            return
+
         self.tabs.setEnabled(False)
         init_db()
 
         job = self.job_input.text().strip()
-        lvl = self.level_combo.currentText().strip()
         if not job:
             QMessageBox.warning(self, "缺少工种名称", "请先输入“工种名称”再继续")
             self.tabs.setEnabled(True)
@@ -180,34 +218,91 @@ class MainWindow(QMainWindow):
         self.current_level_text = lvl
         self.current_level_id = lid
 
+        # 上次导入中断（崩溃、写库出错）：同一文件可从断点续传，否则先丢弃已写入的部分
+        journal = get_import_journal(lid)
+        if journal and journal["stage"] != "done":
+            same = journal["file_digest"] == file_digest(self.selected_file)
+            box = QMessageBox(self)
+            box.setIcon(QMessageBox.Icon.Warning)
+            box.setWindowTitle("上次导入未完成")
+            box.setText(
+                f"{job} 工种 {lvl} 级别的上次导入未完成："
+                f"{os.path.basename(journal['file_path'] or '')} 已写入 {journal['committed']} 题"
+                f"（{journal['updated_at']}）。\n"
+                + ("继续导入：跳过已写入的题目，从断点续传；\n" if same else "所选文件与上次不同，无法续传；\n")
+                + "放弃：删除上次已写入的部分，再按常规流程导入。"
+            )
+            btn_resume = box.addButton("继续导入", QMessageBox.ButtonRole.AcceptRole) if same else None
+            btn_discard = box.addButton("放弃", QMessageBox.ButtonRole.DestructiveRole)
+            box.addButton("取消", QMessageBox.ButtonRole.RejectRole)
+            box.exec()
+            clicked = box.clickedButton()
+            if btn_resume is not None and clicked is btn_resume:
+                self.log_output.append(f"[INFO] 断点续传：跳过已写入的 {journal['committed']} 题")
+                self.hue_timer.start()
+                # 按上次的写库顺序续传：流水线模式按文档顺序，分阶段 / 批量导入按题型顺序
+                self._start_worker(ParseWorker(
+                    self.selected_file, lid, level_name=lvl,
+                    pipelined=journal["write_order"] == "document"
+                ))
+                return
+            if clicked is btn_discard:
+                removed = discard_import(lid)
+                self.log_output.append(f"[INFO] 已放弃上次未完成的导入：删除 {removed} 题")
+            else:
+                self.log_output.append("[INFO] 用户取消上传新题库")
+                self.tabs.setEnabled(True)
+                return
+
+        incremental = False
         if has_questions(lid):
             old = count_questions(lid)
-            reply = QMessageBox.question(
-                self, "确认删除旧题库",
-                f"{job} 工种已有 {lvl} 级别题库（共 {old} 题），删除后才能上传新题库，是否继续？",
-                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            box = QMessageBox(self)
+            box.setIcon(QMessageBox.Icon.Question)
+            box.setWindowTitle("已有题库")
+            box.setText(
+                f"{job} 工种已有 {lvl} 级别题库（共 {old} 题）。\n"
+                f"增量更新：只改动有变化的题目，未变化的题目保留原编号；\n"
+                f"删除重建：删除旧题库后重新导入。"
             )
-            if reply != QMessageBox.StandardButton.Yes:
+            btn_inc = box.addButton("增量更新", QMessageBox.ButtonRole.AcceptRole)
+            btn_del = box.addButton("删除重建", QMessageBox.ButtonRole.DestructiveRole)
+            box.addButton("取消", QMessageBox.ButtonRole.RejectRole)
+            box.exec()
+            clicked = box.clickedButton()
+            if clicked is btn_inc:
+                incremental = True
+                self.log_output.append(f"[INFO] 增量更新已有题库（原 {old} 题）")
+            elif clicked is btn_del:
+                delete_questions_by_level(lid)
+                new = count_questions(lid)
+                self.log_output.append(
+                    f"[INFO] 已删除旧题库：共删除 {old - new} 题（原 {old} 题，现 {new} 题）"
+                )
+            else:
                 self.log_output.append("[INFO] 用户取消上传新题库")
                 self.tabs.setEnabled(True)
                 return
-            delete_questions_by_level(lid)
-            new = count_questions(lid)
-            self.log_output.append(
-                f"[INFO] 已删除旧题库：共删除 {old - new} 题（原 {old} 题，现 {new} 题）"
-            )
 
         self.hue_timer.start()
-        self.fake_timer.stop()
 
+        # 全新导入走流水线模式，边解析边写库；增量更新需要完整解析结果，仍分阶段执行
+        self._start_worker(ParseWorker(
+            self.selected_file, lid, incremental=incremental, level_name=lvl,
+            pipelined=not incremental
+        ))
+
+    def _start_worker(self, worker):
         # 启动解析线程
         self.thread = QThread()
-        self.worker = ParseWorker(self.selected_file, lid)
+        self.worker = worker
         self.worker.moveToThread(self.thread)
         self.thread.started.connect(self.worker.run)
         self.worker.progress.connect(self.update_progress)
         # 新增：接收逐条解析错误并输出到日志
         self.worker.warning.connect(lambda msg: self.log_output.append(msg))
+        # 逐题预览只显示在状态栏，不写入日志（大题库有成千上万条）
+        self.worker.preview.connect(self.status_label.setText)
         self.worker.finished.connect(self.on_finished)
         self.worker.error.connect(self.on_error)
         self.worker.finished.connect(self.thread.quit)
@@ -218,30 +313,13 @@ class MainWindow(QMainWindow):
         self.thread.start()
 
     def update_progress(self, value: int, message: str):
-        if value < 35:
-            self.progress_bar.setValue(value)
-            self.percent_label.setText(f"{value}%")
-        elif value == 35:
-            self.progress_bar.setValue(35)
-            self.percent_label.setText("35%")
-            self.fake_timer.start()
-        else:
-            self.fake_timer.stop()
-            self.progress_bar.setValue(100)
-            self.percent_label.setText("100%")
+        # 进度值由流水线各阶段的真实边界给出，直接显示
+        self.progress_bar.setValue(value)
+        self.percent_label.setText(f"{value}%")
         self.status_label.setText(message)
         if value < 100:
             self.log_output.append(f"[INFO] {message} ({value}%)")
 
-    def _on_fake_tick(self):
-        cur = int(self.percent_label.text().rstrip("%"))
-        if cur < 95:
-            cur += 1
-            self.progress_bar.setValue(cur)
-            self.percent_label.setText(f"{cur}%")
-        else:
-            self.fake_timer.stop()
-
     def _on_hue_tick(self):
         self.current_hue = (self.current_hue + 5) % 360
         self.progress_bar.setStyleSheet(
@@ -250,12 +328,12 @@ class MainWindow(QMainWindow):
 
     def on_finished(self, summary: dict):
         self.tabs.setEnabled(True)
-        self.fake_timer.stop()
         self.hue_timer.stop()
         self.progress_bar.setValue(100)
         self.percent_label.setText("100%")
-        self.status_label.setText("解析完成")
-        self.log_output.append("[INFO] 解析完成 (100%)")
+        dry_run = summary.get("dry_run", False)
+        self.status_label.setText("试运行完成" if dry_run else "解析完成")
+        self.log_output.append("[INFO] 试运行完成，未写入数据库 (100%)" if dry_run else "[INFO] 解析完成 (100%)")
 
         # 汇总日志
         self.log_output.append("[INFO] 解析结果汇总：")
@@ -271,20 +349,18 @@ class MainWindow(QMainWindow):
             ok, err = info.get("count", 0), len(info.get("errors", []))
             self.log_output.append(f"{type_map[key]}：成功 {ok} 题，失败 {err} 题")
 
-        # 判断题校验
-        qs_all = fetch_questions_by_level(self.current_level_id)
-        jd_qs = [q for q in qs_all if q["question_type"] == "判断"]
-        groups = defaultdict(list)
-        for q in jd_qs:
-            groups[q["recognition_code"]].append(q)
-        if groups:
-            self.log_output.append("[ERROR] —— 判断题 校验错误 ——")
-            for code, group in sorted(groups.items()):
-                answers = [q["answer"] for q in group]
-                if len(answers) == 2 and answers[0] == answers[1]:
-                    self.log_output.append(
-                        f"[ERROR] 解析错误：判断题{code} 两题答案都为'{answers[0]}'"
-                    )
+        # 题量校验：导入后已对整个级别做过一次分组校验（试运行时只校验本文件），逐条问题已作为警告输出
+        report = summary.get("report")
+        if report and report["issues"]:
+            self.log_output.append(
+                f"[ERROR] —— 题量校验：{report['codes']} 个认定点中 "
+                f"{len(report['failed_codes'])} 个不符合要求，共 {len(report['issues'])} 条问题 ——"
+            )
+        elif report:
+            self.log_output.append(f"[INFO] 题量校验通过：共 {report['codes']} 个认定点")
+
+        if dry_run:
+            return
 
         # 刷新导出列表
         jobs = fetch_jobs()
@@ -296,7 +372,6 @@ class MainWindow(QMainWindow):
 
     def on_error(self, msg: str):
         self.tabs.setEnabled(True)
-        self.fake_timer.stop()
         self.hue_timer.stop()
         self.log_output.append(f"[ERROR] {msg}")
         QMessageBox.critical(self, "错误", f"发生异常：{msg}")
@@ -342,15 +417,22 @@ class MainWindow(QMainWindow):
             cb_row.addWidget(cb)
         ll.addLayout(cb_row)
 
-        # 认定点搜索
+        # 全文搜索：认定点 / 题干 / 选项 / 解析 / 评分标准
+        search_row = QHBoxLayout()
         self.search_le2 = QLineEdit()
-        self.search_le2.setPlaceholderText("按认定点搜索…")
-        ll.addWidget(self.search_le2)
-
-        # 可勾选列表
-        self.q_list2 = CheckableListWidget()
+        self.search_le2.setPlaceholderText("按认定点、题干、选项、解析搜索…")
+        search_row.addWidget(self.search_le2, 1)
+        self.search_all2 = QCheckBox("跨工种")
+        self.search_all2.setToolTip("勾选后在所有工种、级别中搜索")
+        search_row.addWidget(self.search_all2)
+        ll.addLayout(search_row)
+
+        # 可勾选列表（虚拟化：滚动时按页从数据库取数）
+        self.q_model2 = QuestionListModel(self)
+        self.q_list2 = CheckableListView()
+        self.q_list2.setModel(self.q_model2)
         ll.addWidget(self.q_list2, 1)
-        self.q_list2.itemChanged.connect(self._update_summary)
+        self.q_model2.checkedChanged.connect(self._update_summary)
 
         # 全选/反选/清空
         btns = QHBoxLayout()
@@ -396,7 +478,7 @@ class MainWindow(QMainWindow):
         h.addLayout(right, 5)
 
         # 绑定刷新信号
-        widgets = [self.job_cb2, self.level_cb2, self.search_le2] + [
+        widgets = [self.job_cb2, self.level_cb2, self.search_le2, self.search_all2] + [
             getattr(self, f"chk_{n}") for n in ["单选", "多选", "判断", "简答", "计算"]
         ]
         for w in widgets:
@@ -412,29 +494,17 @@ class MainWindow(QMainWindow):
 
     # ---------------- 全选 / 反选 / 清空 ----------------
     def _select_all2(self):
-        for i in range(self.q_list2.count()):
-            self.q_list2.item(i).setCheckState(Qt.CheckState.Checked)
+        self.q_model2.set_all_checked(True)
 
     def _invert2(self):
-        for i in range(self.q_list2.count()):
-            it = self.q_list2.item(i)
-            it.setCheckState(
-                Qt.CheckState.Unchecked
-                if it.checkState() == Qt.CheckState.Checked
-                else Qt.CheckState.Checked
-            )
+        self.q_model2.invert_checked()
 
     def _clear2(self):
-        for i in range(self.q_list2.count()):
-            self.q_list2.item(i).setCheckState(Qt.CheckState.Unchecked)
+        self.q_model2.set_all_checked(False)
 
     # ---------------- 导出 ----------------
     def _on_export2(self):
-        codes = [
-            self.q_list2.item(i).data(Qt.ItemDataRole.UserRole)
-            for i in range(self.q_list2.count())
-            if self.q_list2.item(i).checkState() == Qt.CheckState.Checked
-        ]
+        codes = self.q_model2.checked_ids()
         if not codes:
             QMessageBox.warning(self, "未选题目", "请先勾选至少一条题目再导出。")
             return
@@ -475,40 +545,37 @@ class MainWindow(QMainWindow):
 
     # ---------------- 重新加载 & 统计 ----------------
     def _reload2(self):
-        self.q_list2.clear()
         job = self.job_cb2.currentText().strip()
         lvl = self.level_cb2.currentText().strip()
-        qs = fetch_questions_by_level(get_level_id(get_job_id(job), lvl))
-        self.current_qs = qs
-        self.filtered_qs = []
-
-        for q in qs:
-            key = q["question_type"]
-            if not getattr(self, f"chk_{key}").isChecked():
-                continue
-            code = q["recognition_code"]
-            if self.search_le2.text() and self.search_le2.text() not in code:
-                continue
-            self.filtered_qs.append(q)
-            text = f"{code}  {q['content_text'][:50]}"
-            item = QListWidgetItem(text)
-            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
-            item.setCheckState(Qt.CheckState.Checked)
-            item.setData(Qt.ItemDataRole.UserRole, q["id"])
-            self.q_list2.addItem(item)
-
-        self._update_summary()
+        level_id = get_level_id(get_job_id(job), lvl)
+        types = [n for n in ["单选", "多选", "判断", "简答", "计算"]
+                 if getattr(self, f"chk_{n}").isChecked()]
+        keyword = self.search_le2.text().strip()
+
+        if keyword:
+            # 有关键词时走 FTS5 全文检索，按相关度排序，用 offset 分页
+            scope = None if self.search_all2.isChecked() else level_id
+            self.q_model2.set_source(
+                lambda last, offset, limit: search_questions(
+                    keyword, level_id=scope, types=types, limit=limit, offset=offset),
+                lambda: search_question_ids(keyword, level_id=scope, types=types),
+                count_search_results(keyword, level_id=scope, types=types)
+            )
+        else:
+            # 按 id 游标分页，题型过滤下推到 SQL
+            self.q_model2.set_source(
+                lambda last, offset, limit: fetch_question_page(
+                    level_id, types=types, after_id=last["id"] if last else 0, limit=limit),
+                lambda: fetch_question_ids(level_id, types=types),
+                count_questions_by_type(level_id, types=types)
+            )
 
     def _update_summary(self):
         counts = {"单选":0, "多选":0, "判断":0, "简答":0, "计算":0}
-        for q in self.filtered_qs:
-            typ = q.get("question_type")
+        for typ, n in self.q_model2.type_counts.items():
             if typ in counts:
-                counts[typ] += 1
-        sel = sum(
-            1 for i in range(self.q_list2.count())
-            if self.q_list2.item(i).checkState() == Qt.CheckState.Checked
-        )
+                counts[typ] += n
+        sel = self.q_model2.checked_count()
         disp_str = "，".join(f"{k}{v}" for k, v in counts.items())
         self.summary_label.setText(f"{disp_str}；已选 {sel} 题")
 
@@ -0,0 +1,136 @@
+# ui_app/question_list_model.py
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, pyqtSignal
+
+
+class QuestionListModel(QAbstractListModel):
+    """
+    导出页题目列表的虚拟化模型：视图滚动到底时通过 canFetchMore / fetchMore 按页取数，
+    不会一次把整个级别的题目读进内存、也不为每题创建 QListWidgetItem。
+
+    勾选状态用“默认状态 + 例外 id 集合”表示：
+      默认全选时集合里记录被取消的 id，默认全不选时记录被勾选的 id，
+    因此全选 / 清空 / 反选都是 O(1)，未加载的题目同样有确定的勾选状态。
+    """
+    PAGE_SIZE = 200
+
+    checkedChanged = pyqtSignal()  # 勾选集合变化（单题或批量）
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._fetch_page = None
+        self._fetch_ids = None
+        self._exhausted = True
+        self.type_counts = {}
+        self._default_checked = True
+        self._exceptions = set()
+
+    def set_source(self, fetch_page, fetch_ids, type_counts):
+        """
+        切换数据源并重置勾选状态（默认全选）。
+        fetch_page(last_row, offset, limit) -> 下一页行 dict 列表，last_row 为已加载的最后一行或 None
+        fetch_ids() -> 全部匹配题目的 id 列表（按列表顺序）
+        type_counts：{题型: 题数}，用于统计与计算已选数量
+        """
+        self.beginResetModel()
+        self._rows = []
+        self._fetch_page = fetch_page
+        self._fetch_ids = fetch_ids
+        self._exhausted = fetch_page is None
+        self.type_counts = dict(type_counts)
+        self._default_checked = True
+        self._exceptions = set()
+        self.endResetModel()
+        self.checkedChanged.emit()
+
+    # ---------------- 懒加载 ----------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        last = self._rows[-1] if self._rows else None
+        page = self._fetch_page(last, len(self._rows), self.PAGE_SIZE)
+        if len(page) < self.PAGE_SIZE:
+            self._exhausted = True
+        if not page:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    # ---------------- 显示与勾选 ----------------
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsUserCheckable
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        q = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{q['recognition_code']}  {(q['content_text'] or '')[:50]}"
+        if role == Qt.ItemDataRole.CheckStateRole:
+            return Qt.CheckState.Checked if self.is_checked(q["id"]) else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.UserRole:
+            return q["id"]
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.CheckStateRole or not index.isValid():
+            return False
+        checked = Qt.CheckState(value) == Qt.CheckState.Checked
+        qid = self._rows[index.row()]["id"]
+        if checked == self.is_checked(qid):
+            return True
+        if checked == self._default_checked:
+            self._exceptions.discard(qid)
+        else:
+            self._exceptions.add(qid)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.CheckStateRole])
+        self.checkedChanged.emit()
+        return True
+
+    def is_checked(self, qid):
+        return (qid in self._exceptions) != self._default_checked
+
+    def set_all_checked(self, checked):
+        self._default_checked = checked
+        self._exceptions.clear()
+        self._emit_check_changed()
+
+    def invert_checked(self):
+        # 翻转默认状态即可，例外集合含义随之翻转
+        self._default_checked = not self._default_checked
+        self._emit_check_changed()
+
+    def _emit_check_changed(self):
+        if self._rows:
+            self.dataChanged.emit(
+                self.index(0), self.index(len(self._rows) - 1),
+                [Qt.ItemDataRole.CheckStateRole]
+            )
+        self.checkedChanged.emit()
+
+    def total_count(self):
+        return sum(self.type_counts.values())
+
+    def checked_count(self):
+        if self._default_checked:
+            return self.total_count() - len(self._exceptions)
+        return len(self._exceptions)
+
+    def checked_ids(self):
+        """
+        返回全部已勾选题目的 id（含尚未加载到视图的题目），顺序同列表。
+        """
+        if not self._fetch_ids:
+            return []
+        return [qid for qid in self._fetch_ids() if self.is_checked(qid)]
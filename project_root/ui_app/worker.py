@@ -1,101 +1,65 @@
 # ui_app/worker.py
 
-import os
 from PyQt6.QtCore import QObject, pyqtSignal
-from parse_manager import process_document
-from preprocessor import preprocess_document
-from utils import process_docx_from_paragraphs
-from parser import single_choice, multiple_choice, judgment, short_answer, calculation
+import parse_manager  # noqa: F401  导入即完成日志与数据库初始化
+from pipeline import ImportPipeline, SECTION_NAMES
+from database.db_manager import close_connection
 
 class ParseWorker(QObject):
     """
     后台解析题库并写入数据库的 Worker。
+    只驱动一次 ImportPipeline（预处理 → 分段 → 解析 → 校验 → 写库，或三个阶段并发的流水线模式），
+    进度直接取自各阶段的真实边界。
     - progress: 发射 (0-100, 文本) 用于更新进度条和日志
     - warning:  发射 str(msg) 用于解析错误的警告
+    - preview:  发射 str(msg) 写库时逐题预览（流水线模式下第一批题目在全文解析完之前即可看到）
     - finished: 发射 dict(summary) 完成后传递写库摘要
     - error:    发射 str(msg) 异常时传递错误信息
     """
     progress = pyqtSignal(int, str)
     warning  = pyqtSignal(str)       # 新增：用于逐条发出解析错误
+    preview  = pyqtSignal(str)
     finished = pyqtSignal(dict)
     error    = pyqtSignal(str)
 
-    def __init__(self, file_path: str, level_id: int):
+    def __init__(self, file_path: str, level_id: int, incremental: bool = False,
+                 level_name: str = None, max_errors: int = None, pipelined: bool = False,
+                 dry_run: bool = False):
         super().__init__()
         self.file_path = file_path
         self.level_id = level_id
+        self.incremental = incremental  # True：增量导入，只改动有差异的题目
+        self.level_name = level_name    # 用于题量校验
+        self.max_errors = max_errors    # 解析阶段错误达到上限即中止，不写库
+        self.pipelined = pipelined      # True：读取、解析、写库并发进行（增量导入时不生效）
+        self.dry_run = dry_run          # True：只解析与校验，不写图片、不写数据库
 
     def run(self):
         try:
-            # 1. 预处理
-            self.progress.emit(5, "正在预处理文档…")
-            pre = preprocess_document(self.file_path)
-            paragraphs    = pre.get('paragraphs', [])
-            media_catalog = pre.get('media', {})
+            pipeline = ImportPipeline(
+                self.file_path, self.level_id,
+                level_name=self.level_name,
+                incremental=self.incremental,
+                progress=self.progress.emit,
+                preview=self.preview.emit,
+                max_errors=self.max_errors,
+                dry_run=self.dry_run,
+            )
+            summary = pipeline.run_pipelined() if self.pipelined else pipeline.run()
 
-            # 2. 分段
-            self.progress.emit(10, "正在按题型分段…")
-            sections = process_docx_from_paragraphs(paragraphs)
+            # 逐条发出解析与校验 warning
+            for key, name in SECTION_NAMES.items():
+                for e in summary.get(key, {}).get("errors", []):
+                    self.warning.emit(f"[警告] {name}题解析错误：{e}")
+            for e in summary.get("validation", []):
+                self.warning.emit(f"[警告] 题量校验：{e}")
 
-            # 3. 各题型解析（仅收集 errors，不立即输出）
-            parsers = [
-                ("单选", single_choice.parse,   "single_choice"),
-                ("多选", multiple_choice.parse, "multiple_choice"),
-                ("判断", judgment.parse,        "judgment"),
-                ("简答", short_answer.parse,     "short_answer"),
-                ("计算", calculation.parse,     "calculation"),
-            ]
-            total = len(parsers)
-            all_errors = {}  # 暂存所有解析阶段的错误
-            for idx, (name, func, key) in enumerate(parsers, start=1):
-                pct = 10 + int(25 * idx / total)
-                self.progress.emit(pct, f"正在解析{name}…")
-                items, errors = func(
-                    sections.get(key, []),
-                    self.level_id,
-                    {m['temp_id']: m for m in media_catalog}
-                )
-                all_errors[key] = errors
-                # 不在此处输出 errors，避免重复
-
-            # 4. 写库阶段
-            self.progress.emit(35, "正在写入数据库…")
-            summary = process_document(self.file_path, self.level_id)
-
-            # 5. 合并解析阶段的 errors 到 summary 并去重
-            for key, errs in all_errors.items():
-                existing = summary.get(key, {}).get("errors", [])
-                combined = errs + existing
-                unique = []
-                for e in combined:
-                    if e not in unique:
-                        unique.append(e)
-                if key in summary:
-                    summary[key]["errors"] = unique
-                else:
-                    summary[key] = {"count": 0, "errors": unique}
-
-            # 5.1 逐条发出 warning
-            type_map = {
-                "single_choice":   "单选",
-                "multiple_choice": "多选",
-                "judgment":        "判断",
-                "short_answer":    "简答",
-                "calculation":     "计算"
-            }
-            for key, info in summary.items():
-                for e in info.get("errors", []):
-                    self.warning.emit(f"[警告] {type_map[key]}题解析错误：{e}")
-
-            # 6. 写库阶段统计
-            for key, info in summary.items():
-                name = type_map.get(key, key)
-                cnt  = info.get("count", 0)
-                self.progress.emit(35, f"已写入{name}{cnt}题")
-
-            # 7. 完成
-            self.progress.emit(100, "解析完成")
+            # 完成
+            self.progress.emit(100, "试运行完成" if self.dry_run else "解析完成")
             self.finished.emit(summary)
 
         except Exception as e:
             self.error.emit(str(e))
+        finally:
+            # 本线程的数据库连接随 Worker 结束一并关闭
+            close_connection()
@@ -1,11 +1,10 @@
 import os
 import re
-import sqlite3
 from PyQt6.QtCore import QObject, pyqtSignal
 from docxtpl import DocxTemplate, InlineImage
 from docx import Document
 from docx.shared import Mm
-from database.db_manager import fetch_questions_by_ids, DB_PATH  # 确保 DB_PATH 在 db_manager.py 中导出
+from database.db_manager import fetch_questions_by_ids, close_connection
 
 class ExportWorker(QObject):
     """
@@ -22,6 +21,13 @@ class ExportWorker(QObject):
         self.opts = opts
 
     def run(self):
+        # 本线程使用自己的数据库连接，结束时关闭
+        try:
+            self._export()
+        finally:
+            close_connection()
+
+    def _export(self):
         # 1. 确保输出目录存在
         out_dir = "output"
         os.makedirs(out_dir, exist_ok=True)
@@ -32,48 +38,19 @@ class ExportWorker(QObject):
         self.progress.emit(5, "加载模板…")
         doc = DocxTemplate(tpl_path)
 
-        # 3. 从数据库取题（仅 questions 表字段）
+        # 3. 从数据库取题（题目、图片路径、公式内容一次取回）
         self.progress.emit(10, "读取题目详情…")
-        records = fetch_questions_by_ids(self.codes)
-
+        # 题目记录只读，渲染用的上下文在记录基础上另建 dict
         # —— 新增：清理所有 [IMAGE_n] 占位符，避免在 content_text 中残留 —— 
-        for rec in records:
-            rec["content_text"] = re.sub(r"\[IMAGE_\d+\]", "", rec.get("content_text", ""))
+        records = [
+            dict(rec, content_text=re.sub(r"\[IMAGE_\d+\]", "", rec.get("content_text") or ""))
+            for rec in fetch_questions_by_ids(self.codes)
+        ]
 
-        # 3.1 额外从 question_images 与 question_formulas 拉数据
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
         if not self.codes:
-            conn.close()
             return
 
-        placeholders = ",".join("?" for _ in self.codes)
-
-        # 拉图片路径
-        cursor.execute(
-            f"SELECT question_id, image_path FROM question_images WHERE question_id IN ({placeholders})",
-            self.codes
-        )
-        img_rows = cursor.fetchall()
-        img_map = {}
-        for qid, path in img_rows:
-            # 确保使用正斜杠（替换反斜杠）
-            path = path.replace("\\", "/")
-            img_map.setdefault(qid, []).append(path)
-
-        # 拉公式（存的是 MathML 内容，若你有公式图片路径也可改成相应字段）
-        cursor.execute(
-            f"SELECT question_id, content FROM question_formulas WHERE question_id IN ({placeholders})",
-            self.codes
-        )
-        math_rows = cursor.fetchall()
-        math_map = {}
-        for qid, content in math_rows:
-            math_map.setdefault(qid, []).append(content)
-
-        conn.close()
-
-        # 3.2 生成 options、InlineImage 列表
+        # 3.1 生成 options、InlineImage 列表
         #    假设你的 media 目录在项目根
         project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
         media_dir    = os.path.join(project_root, "media")
@@ -91,7 +68,9 @@ class ExportWorker(QObject):
 
             # 图片 InlineImage 列表
             rec["images"] = []
-            for rel in img_map.get(qid, []):
+            for rel in rec["image_paths"]:
+                # 确保使用正斜杠（替换反斜杠）
+                rel = rel.replace("\\", "/")
                 # 兼容绝对与相对路径
                 path = rel if os.path.isabs(rel) else os.path.join(media_dir, os.path.normpath(rel))
                 if os.path.exists(path):
@@ -101,7 +80,7 @@ class ExportWorker(QObject):
 
             # 公式：如果内容是 MathML，这里暂时只能把内容原样注入上下文
             # 如果你有公式图片，请同 images 一样处理
-            rec["maths"] = math_map.get(qid, [])
+            rec["maths"] = rec["formula_image_paths"]
 
             # 实时预览部分 - 发送预览信号
             preview_text = f"题目 {qid}: {rec.get('content_text', '')[:50]}"
@@ -3,6 +3,85 @@
 import re
 import logging
 
+from parser.lexer import QuestionBlock, parse_header, media_refs
+
+# 题型代码到 sections 键的映射
+SECTION_BY_CODE = {
+    "1": "single_choice",
+    "2": "multiple_choice",
+    "3": "judgment",
+    "4": "short_answer",
+    "5": "calculation"
+}
+
+# 题块起始：题号 + [T]（允许题号与 [T] 之间有空格）
+_BLOCK_START = re.compile(r'\d+\.\s*\[T\]')
+# 正则：匹配形如 "800.[T]BG010 5 1 5"（字段由任意空白分隔）
+_HEADER_TYPE = re.compile(r'^\s*\d+\.\s*\[T\]\s*\S+\s+\d+\s+([1-5])\s+\d+')
+
+
+def _dispatch_block(idx, chunk_lines, first_para, last_para):
+    """
+    根据题块首行识别题型并解析题头、收集媒体引用，返回 QuestionBlock；
+    无法识别题型时记录警告并返回 None。
+    """
+    first_line = chunk_lines[0]
+    m = _HEADER_TYPE.match(first_line)
+    if not m:
+        logging.warning(f"第 {idx} 块无法识别题型代码，头行：{first_line!r}")
+        return None
+
+    code = m.group(1)
+    sec_key = SECTION_BY_CODE.get(code)
+    if not sec_key:
+        logging.warning(f"第 {idx} 块题型代码 {code} 未映射，头行：{first_line!r}")
+        return None
+
+    header, rec_code = parse_header(first_line)
+    return QuestionBlock(idx, sec_key, header, rec_code, first_para, last_para,
+                         tuple(chunk_lines), media_refs(chunk_lines))
+
+
+def iter_question_blocks(paragraphs):
+    """
+    逐段消费段落（可以是生成器），每凑齐一个题块就产出 QuestionBlock。
+    只缓存当前题块的行，不会把整篇文档拼成一个字符串。
+    题号 + [T] 出现在行中间时，从该处切开，前半截归上一题块。
+    """
+    chunk = []
+    first = last = 0
+    idx = 0
+    for pidx, p in enumerate(paragraphs):
+        txt = p.text if hasattr(p, 'text') else str(p)
+        txt = txt.strip()
+        if not txt:
+            continue
+
+        for line in txt.splitlines():
+            starts = [m.start() for m in _BLOCK_START.finditer(line)] if '[T]' in line else []
+            if not starts:
+                chunk.append(line)
+                last = pidx
+                continue
+            if starts[0] > 0:
+                chunk.append(line[:starts[0]])
+                last = pidx
+            for begin, end in zip(starts, starts[1:] + [len(line)]):
+                if chunk:
+                    idx += 1
+                    block = _dispatch_block(idx, chunk, first, last)
+                    if block:
+                        yield block
+                chunk = [line[begin:end]]
+                first = last = pidx
+
+    if chunk:
+        idx += 1
+        block = _dispatch_block(idx, chunk, first, last)
+        if block:
+            yield block
+
+
 def process_docx_from_paragraphs(paragraphs):
     r"""
     按 [T] 标签里的题型代码对题目块分段归类，支持五种题型：
@@ -13,63 +92,18 @@ def process_docx_from_paragraphs(paragraphs):
       5 => 计算题(calculation)
 
     实现思路：
-    1. 将所有段落（Paragraph 或 str）转为纯文本，并过滤空行
-    2. 用正向零宽断言 (?m)(?=\d+\.\s*\[T\]) 按题号分割出题块
-    3. 每块取第一行，匹配题型代码
-    4. 根据代码分发到对应 sections
+    1. 逐个读取段落（Paragraph、str 或生成器产出的文本），过滤空行
+    2. 遇到 "题号.[T]" 即开始新题块（见 iter_question_blocks）
+    3. 每块取第一行，匹配题型代码并解析题头，生成 QuestionBlock
+    4. 根据代码分发到对应 sections（题型键 → QuestionBlock 列表）
     """
     logging.info("开始按题型分割文档内容（基于[T]标签）")
 
-    # 1. 收集所有非空文本行
-    lines = []
-    for p in paragraphs:
-        txt = p.text if hasattr(p, 'text') else str(p)
-        txt = txt.strip()
-        if txt:
-            lines.append(txt)
-    text = "\n".join(lines)
-
-    # 2. 分割成若干题块（允许题号与 [T] 之间有空格）
-    blocks = re.split(r'(?m)(?=\d+\.\s*\[T\])', text)
-    blocks = [blk for blk in blocks if blk.strip()]
-
-    # 3. 准备存放容器
-    sections = {
-        "single_choice":   [],
-        "multiple_choice": [],
-        "judgment":        [],
-        "short_answer":    [],
-        "calculation":     []
-    }
-    # 题型代码到 sections 键的映射
-    mapping = {
-        "1": "single_choice",
-        "2": "multiple_choice",
-        "3": "judgment",
-        "4": "short_answer",
-        "5": "calculation"
-    }
-    # 正则：匹配形如 "800.[T]BG010 5 1 5"（字段由任意空白分隔）
-    pattern = re.compile(r'^\s*\d+\.\s*\[T\]\s*\S+\s+\d+\s+([1-5])\s+\d+')
-
-    # 4. 逐块匹配并分发
-    for idx, blk in enumerate(blocks, start=1):
-        chunk_lines = blk.splitlines()
-        first_line = chunk_lines[0]
-        m = pattern.match(first_line)
-        if not m:
-            logging.warning(f"第 {idx} 块无法识别题型代码，头行：{first_line!r}")
-            continue
-
-        code = m.group(1)
-        sec_key = mapping.get(code)
-        if not sec_key:
-            logging.warning(f"第 {idx} 块题型代码 {code} 未映射，头行：{first_line!r}")
-            continue
-
-        sections[sec_key].append(chunk_lines)
+    sections = {key: [] for key in SECTION_BY_CODE.values()}
+    for block in iter_question_blocks(paragraphs):
+        sections[block.section].append(block)
 
-    # 5. 打印各题型数量，便于验证
+    # 打印各题型数量，便于验证
     for key, lst in sections.items():
         logging.info(f"[DEBUG] 分割后 {key} 共 {len(lst)} 道题")
 
@@ -1,48 +1,221 @@
 # validator/requirements_validator.py
 
 from config.requirements import EXPECT_COUNTS
-from collections import defaultdict
+from database.db_manager import fetch_code_stats, count_codes
+
+# 参与题量校验的题型；统计记录中对应的字段名
+REQUIRED_TYPES = {"单选": "single", "多选": "multiple", "判断": "judgment"}
+
+
+def _issue(code, kind, message, question_type=None, expected=None, actual=None):
+    return {
+        "code":          code,
+        "kind":          kind,    # config / count / judgment_true / judgment_false / missing_explanation
+        "question_type": question_type,
+        "expected":      expected,
+        "actual":        actual,
+        "message":       message,
+    }
+
+
+def _code_issues(st, exp):
+    """
+    对单个认定点的汇总统计检查题量、判断题 √ / × 与 × 题解析，返回问题列表。
+    st：含 recognition_code, single, multiple, judgment, true_count, false_count, false_unexplained
+    """
+    rec = st["recognition_code"]
+    issues = []
+    for qt, field in REQUIRED_TYPES.items():
+        actual, expected = st[field], exp.get(qt, 0)
+        if actual != expected:
+            issues.append(_issue(
+                rec, "count", f"认定点 {rec}: {qt} 数量不符，期望 {expected}，现为 {actual}",
+                question_type=qt, expected=expected, actual=actual
+            ))
+
+    if exp.get("判断", 0) > 0:
+        if st["true_count"] < 1:
+            issues.append(_issue(
+                rec, "judgment_true", f"认定点 {rec}: 判断题中“√”题数不足",
+                question_type="判断", expected=1, actual=st["true_count"]
+            ))
+        if st["false_count"] < 1:
+            issues.append(_issue(
+                rec, "judgment_false", f"认定点 {rec}: 判断题中“×”题数不足",
+                question_type="判断", expected=1, actual=st["false_count"]
+            ))
+        missing = st["false_unexplained"]
+        if missing:
+            suffix = f"（{missing} 题）" if missing > 1 else ""
+            issues.append(_issue(
+                rec, "missing_explanation", f"认定点 {rec}: 判断题“×”题缺少解析{suffix}",
+                question_type="判断", expected=0, actual=missing
+            ))
+    return issues
+
+
+def _report(level_name, codes, issues):
+    """
+    结构化校验报告：
+      {'level_name', 'codes': 检查的认定点数, 'failed_codes': [有问题的认定点…],
+       'issues': [{'code', 'kind', 'question_type', 'expected', 'actual', 'message'}, …],
+       'messages': [文本…]}
+    """
+    return {
+        "level_name":   level_name,
+        "codes":        codes,
+        "failed_codes": list(dict.fromkeys(i["code"] for i in issues if i["code"])),
+        "issues":       issues,
+        "messages":     [i["message"] for i in issues],
+    }
+
+
+def _config_report(level_name):
+    issue = _issue(None, "config", f"未配置级别 {level_name} 的题量标准，跳过校验")
+    return _report(level_name, 0, [issue])
+
+
+def validate_level(level_id, level_name):
+    """
+    校验整个级别题库：一条 GROUP BY（读 level_stats）按认定点汇总，
+    不满足 EXPECT_COUNTS 的认定点直接由 SQL 的 HAVING 筛出，Python 只处理有问题的认定点。
+    返回结构化报告（见 _report）。
+    """
+    exp = EXPECT_COUNTS.get(level_name)
+    if exp is None:
+        return _config_report(level_name)
+    issues = []
+    for st in fetch_code_stats(level_id, expected=exp):
+        issues += _code_issues(st, exp)
+    return _report(level_name, count_codes(level_id), issues)
+
+
+def _empty_stats(code):
+    return {"recognition_code": code, "single": 0, "multiple": 0, "judgment": 0,
+            "true_count": 0, "false_count": 0, "false_unexplained": 0}
+
+
+def _accumulate(st, q, field):
+    st[field] += 1
+    if field == "judgment":
+        ans = q.get("answer")
+        if ans == "√":
+            st["true_count"] += 1
+        elif ans == "×":
+            st["false_count"] += 1
+            if not q.get("answer_explanation"):
+                st["false_unexplained"] += 1
+
+
+def validate_items(qs, level_name):
+    """
+    校验尚未写库的题目（解析结果）：单遍扫描按认定点累计与 level_stats 相同的统计，
+    再套用同一套规则。qs：dict 或 QuestionRecord 的可迭代对象。返回结构化报告。
+    """
+    exp = EXPECT_COUNTS.get(level_name)
+    if exp is None:
+        return _config_report(level_name)
+
+    stats = {}
+    for q in qs:
+        field = REQUIRED_TYPES.get(q["question_type"])
+        if field is None:
+            continue
+        code = q["recognition_code"]
+        st = stats.get(code)
+        if st is None:
+            st = stats[code] = _empty_stats(code)
+        _accumulate(st, q, field)
+
+    issues = []
+    for code in sorted(stats):
+        issues += _code_issues(stats[code], exp)
+    return _report(level_name, len(stats), issues)
+
 
 def validate_recognition(qs, level_name):
     """
     针对同一认定点码（recognition_code）及指定级别，校验题量和判断题真/假及解析要求。
-    qs: list of dict, each dict 包含 keys: recognition_code, question_type, answer, answer_explanation
+    qs: list of dict 或 QuestionRecord（按 dict 方式读取），包含 keys: recognition_code, question_type, answer, answer_explanation
     level_name: "初级工"、"中级工" 等
-    返回错误信息列表。
+    返回错误信息列表。整级校验请用 validate_level / validate_items。
     """
-    errors = []
-    rec = qs[0]["recognition_code"] if qs else "未知"
-    # 1. 拿到期望配置
     exp = EXPECT_COUNTS.get(level_name)
     if exp is None:
-        errors.append(f"未配置级别 {level_name} 的题量标准，跳过校验")
-        return errors
-
-    # 2. 统计各题型数量
-    counts = defaultdict(int)
+        return _config_report(level_name)["messages"]
+    st = _empty_stats(qs[0]["recognition_code"] if qs else "未知")
     for q in qs:
-        counts[q["question_type"]] += 1
+        field = REQUIRED_TYPES.get(q["question_type"])
+        if field:
+            _accumulate(st, q, field)
+    return [i["message"] for i in _code_issues(st, exp)]
 
-    # 3. 数量校验
-    for qt in ["单选", "多选", "判断"]:
-        actual = counts.get(qt, 0)
-        expected = exp.get(qt, 0)
-        if actual != expected:
-            errors.append(f"认定点 {rec}: {qt} 数量不符，期望 {expected}，现为 {actual}")
-
-    # 4. 判断题真/假及解析校验
-    jd_expected = exp.get("判断", 0)
-    if jd_expected > 0:
-        jds    = [q for q in qs if q["question_type"] == "判断"]
-        trues  = [q for q in jds if q.get("answer") == "√"]
-        falses = [q for q in jds if q.get("answer") == "×"]
-
-        if len(trues) < 1:
-            errors.append(f"认定点 {rec}: 判断题中“√”题数不足")
-        if len(falses) < 1:
-            errors.append(f"认定点 {rec}: 判断题中“×”题数不足")
-        for q in falses:
-            if not q.get("answer_explanation"):
-                errors.append(f"认定点 {rec}: 判断题“×”题缺少解析")
 
-    return errors
+# ---------------- 流式校验 ----------------
+
+class ValidationAborted(Exception):
+    """流式校验的错误数达到上限，导入应在写库前中止。"""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+class StreamingValidator:
+    """
+    挂在解析阶段的流式校验器：解析器每产出一题调用 on_item，每记录一条错误调用 on_error。
+    按认定点累计与 validate_items 相同的统计，能立即判定的问题（解析错误、某题型超出期望题数）
+    当场计入错误；错误数达到 max_errors 时抛出 ValidationAborted，此时尚未写库。
+    题数不足、√ / × 缺失等只能在全部题目到齐后判断，由 finish() 补齐并返回结构化报告。
+    level_name 未配置 EXPECT_COUNTS 时只统计解析错误。
+    """
+
+    def __init__(self, level_name=None, max_errors=None):
+        self.level_name = level_name
+        self.expected = EXPECT_COUNTS.get(level_name) if level_name else None
+        self.max_errors = max_errors
+        self.stats = {}
+        self.errors = []     # 流式阶段已判定的问题文本（解析错误 + 超出题数）
+        self._over = set()   # 已报过超出题数的 (认定点, 题型)
+
+    def _add_error(self, message):
+        self.errors.append(message)
+        if self.max_errors is not None and len(self.errors) >= self.max_errors:
+            raise ValidationAborted(
+                f"错误数已达上限 {self.max_errors}，已中止导入（未写入数据库）：{message}",
+                self.finish()
+            )
+
+    def on_error(self, message):
+        self._add_error(message)
+
+    def on_item(self, q):
+        qt = q["question_type"]
+        field = REQUIRED_TYPES.get(qt)
+        if field is None:
+            return
+        code = q["recognition_code"]
+        st = self.stats.get(code)
+        if st is None:
+            st = self.stats[code] = _empty_stats(code)
+        _accumulate(st, q, field)
+
+        if self.expected is not None:
+            expected = self.expected.get(qt, 0)
+            if st[field] > expected and (code, qt) not in self._over:
+                self._over.add((code, qt))
+                self._add_error(f"认定点 {code}: {qt} 超出期望题数 {expected}")
+
+    def finish(self):
+        """
+        返回结构化报告（格式同 validate_items），另附 'stream_errors'：流式阶段记录的问题文本。
+        """
+        if self.expected is None:
+            report = _config_report(self.level_name) if self.level_name else _report(None, 0, [])
+        else:
+            issues = []
+            for code in sorted(self.stats):
+                issues += _code_issues(self.stats[code], self.expected)
+            report = _report(self.level_name, len(self.stats), issues)
+        report["stream_errors"] = list(self.errors)
+        return report
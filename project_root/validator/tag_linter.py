@@ -0,0 +1,224 @@
+# validator/tag_linter.py
+
+import os
+import re
+import time
+
+from utils import SECTION_BY_CODE
+
+# 题块起始：题号 + [T]（与 utils.iter_question_blocks 的切分规则一致）
+_BLOCK_START = re.compile(r'\d+\.\s*\[T\]')
+# 完整题头："12.[T]BG010 5 1 5"
+_HEADER = re.compile(r'^\s*(\d+)\.\s*\[T\]\s*([A-Z]{2}\d{3})\s+(\d+)\s+(\d+)\s+(\d+)')
+# 题头里的认定点（题头格式错误时尽量取出来便于定位）
+_HEADER_CODE = re.compile(r'\[T\]\s*([A-Z]{2}\d{3})')
+# 开始 / 结束标签
+_TAG = re.compile(r'\[(T|D|S)(/?)\]')
+# 选项："A." / "A、"
+_OPTION = re.compile(r'^([A-D])[、\.]')
+
+# 各题型的答案格式
+_ANSWER_RULES = {
+    "1": (re.compile(r"[A-D]"), "单选答案应为单个字母 A–D"),
+    "2": (re.compile(r"[A-D]{2,}"), "多选答案应为两个及以上字母 A–D"),
+    "3": (re.compile(r"[√×]"), "判断答案应为 √ 或 ×"),
+}
+
+
+def _issue(paragraph, code, kind, message, where=None):
+    if where is None:
+        where = f"第 {paragraph + 1} 段" if paragraph is not None else "文末"
+    label = f" [{code}]" if code else ""
+    return {
+        "paragraph": paragraph,   # 预处理后段落的下标（从 0 开始）
+        "code":      code,
+        "kind":      kind,        # header / type_code / tag / option / answer
+        "message":   f"{where}{label}: {message}",
+    }
+
+
+class _Block:
+    """一个题块的扫描状态。"""
+    __slots__ = ("start", "code", "qtype", "open_tag", "open_at", "texts", "seen", "options")
+
+    def __init__(self, start):
+        self.start = start
+        self.code = None
+        self.qtype = None
+        self.open_tag = None
+        self.open_at = None
+        self.texts = {"T": [], "D": [], "S": []}
+        self.seen = set()
+        self.options = []
+
+
+def _scan_segment(block, seg, idx, issues):
+    """
+    扫描题块中的一段文本：配对开始 / 结束标签，把标签内的文本归入对应缓冲，
+    按制表符切开的片段顺带识别选项字母。
+    """
+    pos = 0
+    for m in _TAG.finditer(seg):
+        if block.open_tag:
+            block.texts[block.open_tag].append(seg[pos:m.start()])
+        tag, closing = m.group(1), m.group(2)
+        if not closing:
+            if block.open_tag:
+                issues.append(_issue(
+                    idx, block.code, "tag",
+                    f"[{block.open_tag}]（第 {block.open_at + 1} 段）未闭合就出现了 [{tag}]"
+                ))
+            block.open_tag, block.open_at = tag, idx
+            block.seen.add(tag)
+        else:
+            if block.open_tag != tag:
+                if block.open_tag:
+                    issues.append(_issue(
+                        idx, block.code, "tag",
+                        f"[{block.open_tag}]（第 {block.open_at + 1} 段）未闭合，却出现了 [{tag}/]"
+                    ))
+                else:
+                    issues.append(_issue(idx, block.code, "tag", f"多余的结束标签 [{tag}/]"))
+            block.open_tag = block.open_at = None
+        pos = m.end()
+    if block.open_tag:
+        block.texts[block.open_tag].append(seg[pos:])
+    # 选项按制表符切分识别（与 parser/single_choice.py 相同）
+    for part in seg.strip().split("\t"):
+        m = _OPTION.match(part)
+        if m:
+            block.options.append((m.group(1), idx))
+
+
+def _finish_block(block, issues):
+    """
+    题块结束时的检查：未闭合标签、缺少题干 / 答案、选项字母、答案格式。
+    """
+    code = block.code
+    if block.open_tag:
+        issues.append(_issue(
+            block.open_at, code, "tag",
+            f"[{block.open_tag}] 到题块结束仍未闭合，后续段落会被吞入该标签"
+        ))
+    if "D" not in block.seen:
+        issues.append(_issue(block.start, code, "tag", "缺少答案标签 [D]…[D/]"))
+    if block.qtype is None:
+        return
+
+    letters = [letter for letter, _ in block.options]
+    if block.qtype in ("1", "2"):
+        if not letters:
+            issues.append(_issue(block.start, code, "option", "未找到选项（应为 A. / A、 开头）"))
+        else:
+            seen = set()
+            for letter, idx in block.options:
+                if letter in seen:
+                    issues.append(_issue(idx, code, "option", f"选项 {letter} 重复"))
+                seen.add(letter)
+            expected = "ABCD"[:len(seen)]
+            if "".join(sorted(seen)) != expected:
+                issues.append(_issue(
+                    block.start, code, "option",
+                    f"选项字母不连续：{''.join(sorted(seen))}（应为 {expected}）"
+                ))
+
+    if "D" not in block.seen:
+        return
+    answer = "".join(block.texts["D"]).strip()
+    rule = _ANSWER_RULES.get(block.qtype)
+    if rule:
+        pattern, hint = rule
+        if not pattern.fullmatch(answer):
+            issues.append(_issue(block.start, code, "answer", f"{hint}，实际 '{answer}'"))
+        elif block.qtype in ("1", "2") and letters:
+            missing = sorted(set(answer) - set(letters))
+            if missing:
+                issues.append(_issue(
+                    block.start, code, "answer", f"答案 {answer} 含有不存在的选项 {''.join(missing)}"
+                ))
+    elif not answer:
+        issues.append(_issue(block.start, code, "answer", "答案为空"))
+
+
+def lint_paragraphs(paragraphs):
+    """
+    对预处理后的段落做一次线性扫描，检查：
+      - 题头格式（题号.[T]认定点 级别 题型 难度）与题型代码 1–5
+      - [T]/[T/]、[D]/[D/]、[S]/[S/] 配对（漏写结束标签会吞掉后续段落）
+      - 选择题的选项字母（A 起连续、不重复）
+      - 答案格式（单选单个字母、多选多个字母、判断 √/×，且字母须在选项中）
+    paragraphs：段落文本的可迭代对象（可以是生成器）。
+    返回 (问题列表, 段落数, 题块数)；问题为 {'paragraph', 'code', 'kind', 'message'}。
+    """
+    issues = []
+    block = None
+    n_paras = n_blocks = 0
+
+    for idx, para in enumerate(paragraphs):
+        n_paras += 1
+        text = para.text if hasattr(para, 'text') else str(para)
+        for line in text.strip().splitlines():
+            starts = [m.start() for m in _BLOCK_START.finditer(line)]
+            if not starts or starts[0] > 0:
+                # 题块中间的普通行（或题头前的残段）；首个题头之前的说明文字不检查
+                seg = line[:starts[0]] if starts else line
+                if block is not None:
+                    _scan_segment(block, seg, idx, issues)
+            for begin, end in zip(starts, starts[1:] + [len(line)]):
+                if block is not None:
+                    _finish_block(block, issues)
+                seg = line[begin:end]
+                block = _Block(idx)
+                n_blocks += 1
+                m = _HEADER.match(seg)
+                if m:
+                    block.code = m.group(2)
+                    qtype = m.group(4)
+                    if qtype in SECTION_BY_CODE:
+                        block.qtype = qtype
+                    else:
+                        issues.append(_issue(idx, block.code, "type_code", f"题型代码 {qtype} 不在 1–5 之间"))
+                else:
+                    mc = _HEADER_CODE.search(seg)
+                    block.code = mc.group(1) if mc else None
+                    issues.append(_issue(
+                        idx, block.code, "header",
+                        f"题头格式错误（应为“题号.[T]认定点 级别 题型 难度”）：{seg[:40]!r}"
+                    ))
+                # 题头里的 [T] 作为题干的开始标签参与配对
+                _scan_segment(block, seg[seg.index("[T]"):], idx, issues)
+
+    if block is not None:
+        _finish_block(block, issues)
+    else:
+        # 一个题头都没有：导入时会报“未识别到题目”，预检不能当作通过
+        issues.append(_issue(
+            None, None, "header",
+            "未找到任何题头（应为“题号.[T]认定点 级别 题型 难度”），文档中没有可导入的题目",
+            where="全文"
+        ))
+    return issues, n_paras, n_blocks
+
+
+def lint_document(file_path):
+    """
+    预检 Word 文档：流式预处理（不写媒体库、不碰数据库）后调用 lint_paragraphs。
+    返回 {'file', 'paragraphs', 'blocks', 'issues', 'elapsed'}；文件不存在时抛出 FileNotFoundError。
+    """
+    from preprocessor import iter_document
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"文件不存在: {file_path}")
+    started = time.perf_counter()
+    paragraphs = (
+        payload for kind, payload in iter_document(file_path, write_media=False)
+        if kind == 'paragraph'
+    )
+    issues, n_paras, n_blocks = lint_paragraphs(paragraphs)
+    return {
+        "file":       file_path,
+        "paragraphs": n_paras,
+        "blocks":     n_blocks,
+        "issues":     issues,
+        "elapsed":    time.perf_counter() - started,
+    }